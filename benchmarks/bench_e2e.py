@@ -0,0 +1,216 @@
+"""Offline end-to-end benchmark: HostAgent -> Carfax -> PayStabl -> x402 endpoint.
+
+Starts the stubs from e2e_stubs.py and the real Carfax and PayStabl servers
+(each on a scripted model), then drives the real HostAgent in this process
+with `--requests` VIN lookups, `--concurrency` at a time. Reports latency
+percentiles, throughput and a per-hop breakdown rebuilt from the trace spans
+every agent writes (see agent_common/tracing.py).
+
+    python benchmarks/bench_e2e.py --requests 200 --concurrency 16
+    python benchmarks/bench_e2e.py --direct        # structured Carfax request, no Carfax LLM turn
+    python benchmarks/bench_e2e.py --repeat-vins 4 # only 4 distinct VINs: exercises the report cache
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+import httpx
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.abspath(os.path.join(HERE, ".."))
+_VIN_CHARS = "ABCDEFGHJKLMNPRSTUVWXYZ0123456789"
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def random_vin(rnd: random.Random) -> str:
+    return "".join(rnd.choice(_VIN_CHARS) for _ in range(17))
+
+
+def start(args: List[str], env: Dict[str, str], log_path: str) -> subprocess.Popen:
+    log = open(log_path, "w")
+    return subprocess.Popen([sys.executable, os.path.join(HERE, "e2e_stubs.py"), *args], env=env, stdout=log, stderr=log)
+
+
+async def wait_ready(url: str, procs: List[subprocess.Popen], timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(timeout=2) as client:
+        while time.monotonic() < deadline:
+            if any(p.poll() is not None for p in procs):
+                raise RuntimeError(f"a benchmark process exited before {url} was ready (see its log)")
+            try:
+                if (await client.get(url)).is_success:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise TimeoutError(f"{url} not ready after {timeout}s")
+
+
+async def drive(host, queries: List[tuple[str, str]], concurrency: int) -> tuple[List[float], int, float]:
+    """Run (query, vin) pairs; a request succeeds when its final answer contains the VIN."""
+    sem = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def one(query: str, vin: str) -> None:
+        nonlocal errors
+        async with sem:
+            t0 = time.perf_counter()
+            done = False
+            try:
+                async for item in host.stream(query, session_id=os.urandom(8).hex()):
+                    if item.get("is_task_complete"):
+                        done = vin in (item.get("content") or "")
+            except Exception as e:
+                print(f"request failed: {type(e).__name__}: {e}", file=sys.stderr)
+            if done:
+                latencies.append(time.perf_counter() - t0)
+            else:
+                errors += 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(q, v) for q, v in queries))
+    return latencies, errors, time.perf_counter() - t0
+
+
+def hop_breakdown(trace_file: str) -> Dict[str, List[float]]:
+    from agent_common.tracing import load_spans
+
+    hops: Dict[str, List[float]] = defaultdict(list)
+    if os.path.exists(trace_file):
+        for s in load_spans(trace_file):
+            hops[f"{s['service']}:{s['name']}"].append(s["end"] - s["start"])
+    return hops
+
+
+def report(latencies: List[float], errors: int, wall: float, hops: Dict[str, List[float]], as_json: bool) -> None:
+    summary = {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "wall_s": wall,
+        "rps": len(latencies) / wall if wall else 0.0,
+        "latency_ms": {f"p{q}": percentile(latencies, q) * 1000 for q in (50, 95, 99)},
+        "hops_ms": {
+            name: {"n": len(d), **{f"p{q}": percentile(d, q) * 1000 for q in (50, 95, 99)}}
+            for name, d in sorted(hops.items())
+        },
+    }
+    if as_json:
+        print(json.dumps(summary, indent=2))
+        return
+    lat = summary["latency_ms"]
+    print(f"requests={summary['requests']} errors={errors} wall={wall:.2f}s rps={summary['rps']:.1f}")
+    print(f"end-to-end   p50={lat['p50']:8.1f}ms p95={lat['p95']:8.1f}ms p99={lat['p99']:8.1f}ms")
+    print(f"{'hop':<36}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, row in summary["hops_ms"].items():
+        print(f"{name:<36}{row['n']:>6}{row['p50']:>10.1f}{row['p95']:>10.1f}{row['p99']:>10.1f}")
+
+
+async def main(args: argparse.Namespace) -> None:
+    work = tempfile.mkdtemp(prefix="bench-e2e-")
+    stub_port, carfax_port, paystabl_port = free_port(), free_port(), free_port()
+    stub = f"http://127.0.0.1:{stub_port}"
+    trace_file = os.path.join(work, "traces.jsonl")
+    env = {
+        **os.environ,
+        "GOOGLE_API_KEY": os.getenv("GOOGLE_API_KEY", "offline-benchmark"),
+        "BENCH_LLM_DELAY": str(args.llm_delay),
+        "BENCH_UPSTREAM_DELAY": str(args.upstream_delay),
+        "BENCH_PAYMENT_DELAY": str(args.payment_delay),
+        "BENCH_REPORT_KB": str(args.report_kb),
+        "CARFAX_MODEL": "scripted-carfax",
+        "PAYSTABL_MODEL": "scripted-paystabl",
+        "HOST_MODEL": "scripted-host",
+        "CARFAX_REPORT_URL": stub + "/report?vin={vin}",
+        "CARFAX_HOST": "127.0.0.1",
+        "CARFAX_PORT": str(carfax_port),
+        "PAYSTABL_HOST": "127.0.0.1",
+        "PAYSTABL_PORT": str(paystabl_port),
+        "PAYSTABL_CARD_URL": f"http://127.0.0.1:{paystabl_port}",
+        "PAYSTABL_MCP_URL": stub + "/mcp",
+        "PAYSTABL_MCP_TRANSPORT": args.mcp_transport,
+        "A2A_TRACE_EXPORTER": "jsonl",
+        "A2A_TRACE_FILE": trace_file,
+        "A2A_BLOB_DIR": os.path.join(work, "blobs"),
+        "HOST_CARD_CACHE": os.path.join(work, "agent_cards.json"),
+        "HOST_METRICS_PORT": "0",
+        "AGENT_STORE": "memory",
+    }
+    procs = [start(["stubs", "--port", str(stub_port)], env, os.path.join(work, "stubs.log"))]
+    try:
+        await wait_ready(stub + "/healthz", procs)
+        procs.append(start(["agent", "paystabl_agent", "--port", str(paystabl_port)], env, os.path.join(work, "paystabl.log")))
+        procs.append(start(["agent", "carfax_agent", "--port", str(carfax_port)], env, os.path.join(work, "carfax.log")))
+        for port in (paystabl_port, carfax_port):
+            await wait_ready(f"http://127.0.0.1:{port}/.well-known/agent.json", procs)
+
+        # The host reads its configuration at import time, so import it only now.
+        os.environ.update(env)
+        logging.getLogger("google_adk").setLevel(logging.ERROR)
+        sys.path.insert(0, HERE)
+        sys.path.insert(0, os.path.join(ROOT, "host_agent_adk"))
+        import e2e_stubs  # noqa: F401,E402  (registers the scripted model)
+        from host.agent import HostAgent  # noqa: E402
+
+        host = await HostAgent.create([f"http://127.0.0.1:{paystabl_port}", f"http://127.0.0.1:{carfax_port}"])
+        rnd = random.Random(args.seed)
+        pool = [random_vin(rnd) for _ in range(args.repeat_vins or args.requests + args.warmup)]
+        vins = [pool[i % len(pool)] for i in range(args.requests + args.warmup)]
+        template = '{{"vin": "{}"}}' if args.direct else "Fetch the vehicle report for VIN {} and extract its fields."
+        queries = [(template.format(v), v) for v in vins]
+
+        if args.warmup:
+            await drive(host, queries[: args.warmup], args.concurrency)
+        if os.path.exists(trace_file):
+            os.truncate(trace_file, 0)  # breakdown covers the measured requests only
+        latencies, errors, wall = await drive(host, queries[args.warmup:], args.concurrency)
+        await asyncio.sleep(0.5)  # let the agents flush their last spans
+        report(latencies, errors, wall, hop_breakdown(trace_file), args.json)
+        print(f"logs and traces: {work}", file=sys.stderr)
+    finally:
+        for p in procs:
+            p.terminate()
+        for p in procs:
+            try:
+                p.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                p.kill()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark of the three-agent chain.")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=4)
+    parser.add_argument("--repeat-vins", type=int, default=0, help="distinct VINs to cycle through (0 = all unique)")
+    parser.add_argument("--direct", action="store_true", help="send Carfax a structured request (no Carfax LLM)")
+    parser.add_argument("--llm-delay", type=float, default=0.05, help="seconds per scripted model call")
+    parser.add_argument("--upstream-delay", type=float, default=0.02, help="seconds per report endpoint hit")
+    parser.add_argument("--payment-delay", type=float, default=0.1, help="seconds per fake payment settlement")
+    parser.add_argument("--report-kb", type=int, default=8)
+    parser.add_argument("--mcp-transport", choices=["http", "stdio", "auto"], default="http")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    asyncio.run(main(parser.parse_args()))
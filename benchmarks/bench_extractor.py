@@ -0,0 +1,108 @@
+"""Throughput benchmark: single-pass vehicle extractor vs. the previous regex grabs.
+
+    python benchmarks/bench_extractor.py --sizes 64 256 1024 --repeat 20
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "carfax_agent"))
+
+from vehicle_extractor import VehicleFieldExtractor, extract_fields  # noqa: E402
+
+
+def baseline_extract(raw: str) -> dict:
+    """The previous `extract_vehicle_fields`: five uncompiled re.search passes."""
+    def grab(pattern, text):
+        m = re.search(pattern, text, re.I)
+        return m.group(1).strip() if m else None
+
+    vin = grab(r"\bVIN[:\s]*([A-HJ-NPR-Z0-9]{11,17})\b", raw)
+    make = grab(r"\bMake[:\s]*([A-Za-z0-9\- ]{2,30})\b", raw) or grab(r"\b([A-Z][a-z]+)\s+[A-Z][a-z]+\b", raw)
+    model = grab(r"\bModel[:\s]*([A-Za-z0-9\- ]{2,30})\b", raw)  # text argument was missing upstream
+    year = grab(r"\b(20\d{2}|19\d{2})\b", raw)
+    mileage = grab(r"\b(\d{1,3}(?:,\d{3})*)\s*(?:miles|mi)\b", raw)
+    return {"vin": vin, "make": make, "model": model, "year": year, "mileage": mileage, "raw_len": len(raw)}
+
+
+_WORDS = "the vehicle history report service record owner title accident inspection dealer".split()
+
+
+def synthetic_page(size_kb: int, seed: int = 0) -> str:
+    """HTML report of roughly `size_kb` KiB with script noise up front and the fields near the end."""
+    rnd = random.Random(seed)
+    parts = ["<html><head><title>vehicle history report</title>"]
+    parts.append("<script>" + "var x=1; // VIN: AAAAAAAAAAAAAAAAA 1999 " * 200 + "</script>")
+    parts.append("<style>" + ".row{color:#333}" * 200 + "</style></head><body>")
+    filler = []
+    while sum(map(len, filler)) < size_kb * 1024:
+        filler.append(
+            "<tr><td class=\"c\">" + " ".join(rnd.choice(_WORDS) for _ in range(12)) + "</td></tr>\n"
+        )
+    parts.append("<table>" + "".join(filler) + "</table>")
+    parts.append(
+        "<table><tr><th>VIN</th><td>JHMGE8H58DC009182</td></tr>"
+        "<tr><th>Make:</th><td>Honda</td></tr><tr><th>Model:</th><td>Fit</td></tr>"
+        "<tr><th>Year</th><td>2013</td></tr><tr><th>Odometer</th><td>45,123 miles</td></tr></table>"
+        "</body></html>"
+    )
+    return "".join(parts)
+
+
+def _bench(fn, arg, repeat: int) -> float:
+    fn(arg)  # warm-up (pattern compilation)
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(arg)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def _streamed(chunk_size: int):
+    def run(data: bytes) -> dict:
+        view = memoryview(data)
+        ex = VehicleFieldExtractor()
+        for i in range(0, len(view), chunk_size):
+            ex.feed(view[i:i + chunk_size])
+        return ex.result()
+    return run
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[64, 256, 1024], help="page sizes in KiB")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--chunk", type=int, default=64 * 1024, help="chunk size for the streamed run")
+    args = parser.parse_args()
+
+    print(f"{'size':>8} {'variant':<24} {'best ms':>9} {'MB/s':>9} {'speedup':>8}")
+    for size in args.sizes:
+        page = synthetic_page(size)
+        data = page.encode("utf-8")
+        mb = len(data) / 1e6
+        expected = {k: v for k, v in extract_fields(page).items() if k != "raw_len"}
+        variants = [
+            ("baseline (5x re.search)", baseline_extract, page),
+            ("single-pass str", extract_fields, page),
+            ("single-pass bytes", extract_fields, data),
+            ("single-pass memoryview", extract_fields, memoryview(data)),
+            (f"streamed {args.chunk // 1024}KiB chunks", _streamed(args.chunk), data),
+        ]
+        base = None
+        for name, fn, arg in variants:
+            secs = _bench(fn, arg, args.repeat)
+            base = base or secs
+            print(f"{size:>6}KB {name:<24} {secs * 1e3:>9.3f} {mb / secs:>9.1f} {base / secs:>7.1f}x")
+            if fn is not baseline_extract:
+                got = {k: v for k, v in fn(arg).items() if k != "raw_len"}
+                assert got == expected, (name, got, expected)
+        print(f"{'':>8} baseline fields: {baseline_extract(page)}")
+        print(f"{'':>8} single-pass fields: {expected}")
+
+
+if __name__ == "__main__":
+    main()
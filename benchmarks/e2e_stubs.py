@@ -0,0 +1,272 @@
+"""Local stand-ins for the services the three-agent chain depends on.
+
+* a fake x402 report endpoint (``GET /report?vin=``): 402 without an
+  ``X-PAYMENT`` header, an HTML report with it;
+* a fake PayStabl MCP server (``POST /mcp``) speaking the plain JSON-RPC
+  the stdio bridge forwards (and that the streamable-HTTP client accepts),
+  whose ``pay_x402_api`` pays by re-requesting the URL with ``X-PAYMENT``;
+* ``ScriptedLlm``, an ADK model registered for ``scripted-<agent>`` names
+  that replays the tool calls each agent would make, after a fixed delay.
+
+Run as a process by bench_e2e.py:
+
+    python benchmarks/e2e_stubs.py stubs --port 9400
+    python benchmarks/e2e_stubs.py agent carfax_agent --port 10004
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, Callable, Dict, List, Optional
+
+import httpx
+import uvicorn
+from google.adk.models import LlmRequest, LlmResponse
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.registry import LLMRegistry
+from google.genai import types
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import HTMLResponse, JSONResponse, PlainTextResponse, Response
+from starlette.routing import Route
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+BENCH_LLM_DELAY = float(os.getenv("BENCH_LLM_DELAY", "0.05"))
+BENCH_UPSTREAM_DELAY = float(os.getenv("BENCH_UPSTREAM_DELAY", "0.02"))
+BENCH_PAYMENT_DELAY = float(os.getenv("BENCH_PAYMENT_DELAY", "0.1"))
+BENCH_REPORT_KB = int(os.getenv("BENCH_REPORT_KB", "8"))
+
+_VIN_RE = re.compile(r"\b([A-HJ-NPR-Z0-9]{17})\b")
+_URL_RE = re.compile(r"https?://[^\s'\"}]+")
+
+
+# --- fake x402 endpoint and MCP payment server -------------------------------
+
+def report_page(vin: str, size_kb: int = BENCH_REPORT_KB) -> str:
+    filler = "<tr><td>service record inspection owner title</td></tr>\n" * max(1, size_kb * 1024 // 52)
+    return (
+        "<html><head><title>vehicle history report</title></head><body>"
+        f"<table>{filler}</table>"
+        f"<table><tr><th>VIN</th><td>{vin}</td></tr><tr><th>Make:</th><td>Honda</td></tr>"
+        "<tr><th>Model:</th><td>Fit</td></tr><tr><th>Year</th><td>2013</td></tr>"
+        "<tr><th>Odometer</th><td>45,123 miles</td></tr></table></body></html>"
+    )
+
+
+_REQUIREMENTS = {"scheme": "exact", "network": "base-sepolia", "maxAmountRequired": "1000", "maxTimeoutSeconds": 60}
+
+
+async def report(request: Request) -> Response:
+    await asyncio.sleep(BENCH_UPSTREAM_DELAY)
+    if "x-payment" not in request.headers:
+        return JSONResponse(
+            {"x402Version": 1, "accepts": [_REQUIREMENTS]},
+            status_code=402,
+        )
+    return HTMLResponse(report_page(request.query_params.get("vin", "UNKNOWN")))
+
+
+_TOOLS = [
+    {
+        "name": "pay_x402_api",
+        "description": "Pay an x402-protected URL and return its body.",
+        "inputSchema": {
+            "type": "object",
+            "properties": {"url": {"type": "string"}, "agent_token": {"type": "string"}},
+            "required": ["url"],
+        },
+    },
+    {"name": "get_balance", "description": "Wallet balance.", "inputSchema": {"type": "object", "properties": {}}},
+    {
+        "name": "get_payment_history",
+        "description": "Recent payments.",
+        "inputSchema": {"type": "object", "properties": {}},
+    },
+]
+
+
+def _text_result(text: str, is_error: bool = False) -> dict:
+    return {"content": [{"type": "text", "text": text}], "isError": is_error}
+
+
+async def _call_tool(client: httpx.AsyncClient, name: str, args: dict) -> dict:
+    if name == "pay_x402_api":
+        await asyncio.sleep(BENCH_PAYMENT_DELAY)  # settlement
+        r = await client.get(args["url"], headers={"X-PAYMENT": "bench-receipt"})
+        result = _text_result(r.text, is_error=not r.is_success)
+        # The proof and its terms, so PayStabl can replay it (see receipt_cache.py).
+        result["structuredContent"] = {"payment": "bench-receipt", "paymentRequirements": _REQUIREMENTS}
+        return result
+    if name == "get_balance":
+        return _text_result(json.dumps({"balance": "100.00", "currency": "USDC"}))
+    if name == "get_payment_history":
+        return _text_result(json.dumps({"payments": []}))
+    return _text_result(f"unknown tool {name}", is_error=True)
+
+
+def create_stub_app() -> Starlette:
+    client = httpx.AsyncClient(timeout=30)
+
+    @asynccontextmanager
+    async def lifespan(app):
+        yield
+        await client.aclose()
+
+    async def mcp(request: Request) -> Response:
+        msg = await request.json()
+        if "id" not in msg:  # notification
+            return Response(status_code=202)
+        method, params = msg.get("method"), msg.get("params") or {}
+        if method == "initialize":
+            result = {
+                "protocolVersion": params.get("protocolVersion", "2025-03-26"),
+                "capabilities": {"tools": {}},
+                "serverInfo": {"name": "bench-paystabl", "version": "0"},
+            }
+        elif method == "tools/list":
+            result = {"tools": _TOOLS}
+        elif method == "tools/call":
+            result = await _call_tool(client, params.get("name"), params.get("arguments") or {})
+        elif method == "ping":
+            result = {}
+        else:
+            return JSONResponse({"jsonrpc": "2.0", "id": msg["id"], "error": {"code": -32601, "message": method}})
+        return JSONResponse({"jsonrpc": "2.0", "id": msg["id"], "result": result})
+
+    async def healthz(request: Request) -> Response:
+        return PlainTextResponse("ok")
+
+    return Starlette(
+        routes=[
+            Route("/report", report, methods=["GET"]),
+            Route("/mcp", mcp, methods=["POST"]),
+            Route("/healthz", healthz, methods=["GET"]),
+        ],
+        lifespan=lifespan,
+    )
+
+
+# --- scripted model -----------------------------------------------------------
+
+def _call(name: str, **args) -> types.Content:
+    return types.Content(role="model", parts=[types.Part(function_call=types.FunctionCall(name=name, args=args))])
+
+
+def _say(text: str) -> types.Content:
+    return types.Content(role="model", parts=[types.Part(text=text)])
+
+
+def _last_turn(contents: List[types.Content]) -> tuple[Optional[str], Optional[types.FunctionResponse]]:
+    """(user text of the current turn, latest function response in it, if any)."""
+    text, response = None, None
+    for content in contents:
+        for part in content.parts or []:
+            if content.role == "user" and part.text:
+                text, response = part.text, None
+            elif part.function_response:
+                response = part.function_response
+    return text, response
+
+
+def _mcp_text(result) -> Optional[str]:
+    """Text of an MCP CallToolResult, whether dumped to a dict or not."""
+    if hasattr(result, "model_dump"):
+        result = result.model_dump(mode="json")
+    if isinstance(result, dict) and result.get("content"):
+        return result["content"][0].get("text", "")
+    return None
+
+
+def _response_text(response: types.FunctionResponse) -> str:
+    body = response.response or {}
+    result = body.get("result", body)
+    text = _mcp_text(result)
+    if text is not None:
+        return text
+    return result if isinstance(result, str) else json.dumps(result, default=str)
+
+
+def _host_script(text: str, response: Optional[types.FunctionResponse]) -> types.Content:
+    if response is None:
+        return _call("send_message", agent_name="Carfax Agent", task=text)
+    return _say(_response_text(response))
+
+
+def _carfax_script(text: str, response: Optional[types.FunctionResponse]) -> types.Content:
+    if response is None:
+        match = _VIN_RE.search(text or "")
+        vin = match.group(1) if match else "JHMGE8H58DC009182"
+        return _call("paid_fetch_async", url=os.environ["CARFAX_REPORT_URL"].format(vin=vin))
+    if response.name == "paid_fetch_async":
+        return _call("extract_vehicle_fields", raw=_response_text(response))
+    return _say(_response_text(response))
+
+
+def _paystabl_script(text: str, response: Optional[types.FunctionResponse]) -> types.Content:
+    if response is None:
+        match = _URL_RE.search(text or "")
+        return _call("pay_x402_api", url=match.group(0) if match else "")
+    return _say(_response_text(response))
+
+
+_SCRIPTS: Dict[str, Callable[[str, Optional[types.FunctionResponse]], types.Content]] = {
+    "host": _host_script,
+    "carfax": _carfax_script,
+    "paystabl": _paystabl_script,
+}
+
+
+class ScriptedLlm(BaseLlm):
+    """Replays each agent's expected tool calls; `scripted-<host|carfax|paystabl>`."""
+
+    @classmethod
+    def supported_models(cls) -> list[str]:
+        return [r"scripted-.*"]
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        await asyncio.sleep(BENCH_LLM_DELAY)
+        text, response = _last_turn(llm_request.contents)
+        script = _SCRIPTS[self.model.split("-", 1)[1]]
+        yield LlmResponse(content=script(text, response))
+
+
+LLMRegistry.register(ScriptedLlm)
+
+
+# --- process entry points -----------------------------------------------------
+
+def serve_agent(agent_dir: str, host: str, port: int) -> None:
+    """Run an agent's `server.create_app()` in this process (so the scripted model is registered)."""
+    path = os.path.join(ROOT, agent_dir)
+    sys.path.insert(0, path)
+    os.chdir(path)
+    import server  # noqa: E402  (the agent's own flat-imported server module)
+
+    uvicorn.run(server.create_app(), host=host, port=port, log_level="warning")
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="role", required=True)
+    stubs = sub.add_parser("stubs")
+    stubs.add_argument("--host", default="127.0.0.1")
+    stubs.add_argument("--port", type=int, required=True)
+    agent = sub.add_parser("agent")
+    agent.add_argument("agent_dir", choices=["carfax_agent", "paystabl_agent"])
+    agent.add_argument("--host", default="127.0.0.1")
+    agent.add_argument("--port", type=int, required=True)
+    args = parser.parse_args(argv)
+    if args.role == "stubs":
+        uvicorn.run(create_stub_app(), host=args.host, port=args.port, log_level="warning")
+    else:
+        serve_agent(args.agent_dir, args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
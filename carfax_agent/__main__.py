@@ -1,60 +1,51 @@
-import logging, uvicorn, os
-from a2a.server.apps import A2AStarletteApplication
-from a2a.server.request_handlers import DefaultRequestHandler
-from a2a.server.tasks import InMemoryTaskStore
-from a2a.types import AgentCapabilities, AgentCard, AgentSkill
-from google.adk.artifacts import InMemoryArtifactService
-from google.adk.memory.in_memory_memory_service import InMemoryMemoryService
-from google.adk.runners import Runner
-from google.adk.sessions import InMemorySessionService
-from agent import create_agent
-from dotenv import load_dotenv
-from agent_executor import CarfaxAgentExecutor
+import argparse, logging, os
+import uvicorn
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def main():
-    host, port = "localhost", 10004  # Carfax Agent
-    capabilities = AgentCapabilities(streaming=True)
-    skills = [
-        AgentSkill(
-            id="paid_fetch",
-            name="Paid Fetch",
-            description="Fetch a carfax listing given a vin number. If 402, pay via PayStabl and return raw body. Only use this url: https://proxy402.com/rZ0Or4VKA9?vin=JHMGE8H58DC009182 and replace vin with the actual vin.",
-            tags=["x402", "payments", "fetch"],
-            examples=["paid_fetch { 'url': 'https://proxy402.com/rZ0Or4VKA9?vin=JHMGE8H58DC009182' }"],
-        ),
-        AgentSkill(
-            id="extract_vehicle_fields",
-            name="Extract Vehicle Fields",
-            description="Extract VIN/make/model/year/mileage from raw page text.",
-            tags=["parse", "vehicle"],
-            examples=["extract_vehicle_fields { 'raw': '<html...>' }"],
-        ),
-    ]
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Carfax A2A agent server")
+    parser.add_argument("--host", default=os.getenv("CARFAX_HOST", "localhost"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("CARFAX_PORT", "10004")))
+    parser.add_argument("--public-url", default=os.getenv("CARFAX_PUBLIC_URL", ""),
+                        help="URL advertised in the agent card (default: http://<host>:<port>/)")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("CARFAX_WORKERS", "1")),
+                        help="worker processes; >1 shares tasks, sessions and finished reports through SQLite, "
+                             "but not fetches in flight, and tasks/cancel and tasks/resubscribe need sticky "
+                             "routing (see README)")
+    parser.add_argument("--store", choices=["memory", "sqlite"], default=os.getenv("AGENT_STORE"),
+                        help="task/session store (default: memory for one worker, sqlite for several)")
+    parser.add_argument("--graceful-timeout", type=float, default=float(os.getenv("CARFAX_GRACEFUL_TIMEOUT", "30")),
+                        help="seconds to let in-flight requests finish on shutdown")
+    return parser.parse_args(argv)
 
-    agent_card = AgentCard(
-        name="Carfax Agent",
-        description="Fetches listing pages (x402-aware) and extracts key vehicle fields.",
-        url=f"http://{host}:{port}/",
-        version="1.0.0",
-        defaultInputModes=["text/plain", "application/json"],
-        defaultOutputModes=["application/json", "text/plain"],
-        capabilities=capabilities,
-        skills=skills,
+def main(argv=None):
+    args = parse_args(argv)
+    workers = max(1, args.workers)
+    store = args.store or ("sqlite" if workers > 1 else "memory")
+    if workers > 1 and store == "memory":
+        logger.warning("--store memory with %d workers: tasks are not shared between workers", workers)
+    if workers > 1:
+        # Single-flight is per process: only finished reports are shared, through CARFAX_CACHE_DB.
+        logger.warning("%d workers: concurrent requests for the same report on different workers each pay", workers)
+        # A running task's queue lives in the worker executing it.
+        logger.warning("%d workers: tasks/cancel and tasks/resubscribe only reach a running task "
+                       "if the load balancer routes them to the worker running it", workers)
+    # Read at import time by the app modules, in this process and in every worker.
+    os.environ.update(CARFAX_HOST=args.host, CARFAX_PORT=str(args.port), AGENT_STORE=store)
+    if args.public_url:
+        os.environ["CARFAX_PUBLIC_URL"] = args.public_url
+    if workers > 1:
+        os.environ.setdefault("CARFAX_CACHE_DB", "carfax_cache.db")
+    uvicorn.run(
+        "server:create_app",
+        factory=True,
+        host=args.host,
+        port=args.port,
+        workers=workers,
+        timeout_graceful_shutdown=args.graceful_timeout,
     )
 
-    runner = Runner(
-        app_name=agent_card.name,
-        agent=create_agent(),
-        artifact_service=InMemoryArtifactService(),
-        session_service=InMemorySessionService(),
-        memory_service=InMemoryMemoryService(),
-    )
-    handler = DefaultRequestHandler(agent_executor=CarfaxAgentExecutor(runner), task_store=InMemoryTaskStore())
-    app = A2AStarletteApplication(agent_card=agent_card, http_handler=handler)
-    uvicorn.run(app.build(), host=host, port=port)
-
 if __name__ == "__main__":
     main()
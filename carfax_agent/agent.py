@@ -1,80 +1,289 @@
-import os, re, requests
-from typing import Optional, Dict, Any
+import asyncio, hashlib, logging, os, re, uuid
+from contextvars import ContextVar
+from typing import Optional, Dict, Any, AsyncIterator, List
+from urllib.parse import urlsplit
 from google.adk.agents.llm_agent import Agent as LlmAgent
 from google.adk.tools import FunctionTool
 
+from agent_common import deadline, http_client, set_service, tracing
+from agent_common.blob_store import blob_store
+from agent_common.http_client import get_async_client
+from agent_common.llm_cache import llm_cache
+from agent_common.metrics import a2a_send_seconds, after_model, after_tool, before_model, before_tool, gauge, stage_seconds, timed
+from agent_common.session_compaction import session_compactor
 
+from report_cache import cache_key, report_cache, url_vin
+from single_flight import SingleFlight
+from vehicle_extractor import VehicleFieldExtractor, extract_fields
+
+
+logger = logging.getLogger(__name__)
+set_service("carfax")
+http_client.configure("CARFAX")
 
 PAYSTABL_CARD_URL = os.getenv("PAYSTABL_CARD_URL", "http://localhost:10002")
+CARFAX_REPORT_URL = os.getenv("CARFAX_REPORT_URL", "https://proxy402.com/rZ0Or4VKA9?vin={vin}")
+BATCH_CONCURRENCY = int(os.getenv("CARFAX_BATCH_CONCURRENCY", "8"))
+CARFAX_MODEL = os.getenv("CARFAX_MODEL", "gemini-2.0-flash")
+CARFAX_LLM_CACHE = os.getenv("CARFAX_LLM_CACHE", "true").lower() not in ("0", "false", "no")
+_VIN_RE = re.compile(r"^[A-HJ-NPR-Z0-9]{11,17}$")
+
+
+def _origin(url: str) -> str:
+    parts = urlsplit(url.strip())
+    return f"{parts.scheme}://{parts.netloc}".lower()
+
+
+# paid_fetch only fetches (and pays for) URLs on the report origin, plus any
+# extra origins listed in CARFAX_ALLOWED_ORIGINS (comma-separated).
+ALLOWED_ORIGINS = frozenset(
+    [_origin(CARFAX_REPORT_URL)]
+    + [_origin(o) for o in os.getenv("CARFAX_ALLOWED_ORIGINS", "").split(",") if o.strip()]
+)
+
+# PayStabl queues "batch" work behind "interactive" work (see paystabl_agent/admission.py).
+a2a_priority: ContextVar[str] = ContextVar("a2a_priority", default="interactive")
+
+# One in-flight fetch / payment per (normalized report key, paying wallet).
+fetch_flight = SingleFlight("paid_fetch")
+pay_flight = SingleFlight("pay402_and_fetch")
+gauge("paid_fetch_in_flight", "Report fetches in flight (after single-flight collapsing).", fetch_flight.in_flight)
+gauge("payments_in_flight", "PayStabl payments in flight.", pay_flight.in_flight)
+
+async def _a2a_cancel_task_async(agent_base_url: str, task_id: str) -> None:
+    """Best-effort A2A `tasks/cancel` so the remote agent stops its LLM/MCP work too."""
+    request = {"jsonrpc": "2.0", "id": str(uuid.uuid4()), "method": "tasks/cancel", "params": {"id": task_id}}
+    try:
+        await get_async_client().post(agent_base_url.rstrip("/") + "/", json=request, timeout=5)
+    except Exception as e:
+        logger.debug("tasks/cancel %s on %s failed: %s", task_id, agent_base_url, e)
+
 
-def _a2a_simple_task(agent_base_url: str, message: str, timeout: int = 90) -> str:
-    """Minimal A2A /tasks/simple client expecting first text part back."""
-    import requests
-    url = agent_base_url.rstrip("/") + "/tasks/simple"
-    r = requests.post(url, json={"message": message}, timeout=timeout)
+async def _a2a_simple_task_async(agent_base_url: str, message: str, timeout: int = 90) -> str:
+    """A2A `message/send` over the shared pooled client, returning the first text (or blob URI) part.
+
+    The task id is chosen here so that, if this call is cancelled, the remote
+    task can be cancelled as well.
+    """
+    timeout = deadline.timeout(timeout, "PayStabl call")  # before paying, not after
+    task_id = str(uuid.uuid4())
+    request = {
+        "jsonrpc": "2.0",
+        "id": str(uuid.uuid4()),
+        "method": "message/send",
+        "params": {"message": {
+            "role": "user",
+            "parts": [{"kind": "text", "text": message}],
+            "messageId": str(uuid.uuid4()),
+            "taskId": task_id,
+            "contextId": task_id,
+        }},
+    }
+    try:
+        with tracing.span("a2a.send", target=agent_base_url, task_id=task_id), \
+                a2a_send_seconds.time(target=agent_base_url, method="message/send"):
+            # The remote agent continues this trace under the a2a.send span, within our deadline.
+            request["params"]["message"]["metadata"] = deadline.inject(tracing.inject({"priority": a2a_priority.get()}))
+            r = await get_async_client().post(agent_base_url.rstrip("/") + "/", json=request, timeout=timeout)
+    except asyncio.CancelledError:
+        # Shielded so the cancel request itself survives our own cancellation.
+        await asyncio.shield(_a2a_cancel_task_async(agent_base_url, task_id))
+        raise
     r.raise_for_status()
     if r.headers.get("content-type","").startswith("application/json"):
         data = r.json()
+        status = (data.get("result") or {}).get("status") or {}
+        if status.get("state") in ("rejected", "failed", "canceled"):
+            # Not a body: do not let it reach the report cache.
+            parts = (status.get("message") or {}).get("parts") or [{}]
+            raise RuntimeError(f"{agent_base_url} task {status['state']}: {parts[0].get('text', '')}")
         try:
             for art in data["result"]["artifacts"]:
                 for part in art.get("parts", []):
-                    if part.get("type") == "text" and part.get("text"):
+                    if (part.get("type") == "text" or part.get("kind") == "text") and part.get("text"):
                         return part["text"]
+                    # Large bodies arrive as a blob handle; pass the handle on, not the bytes.
+                    if part.get("kind") == "file" and part.get("file", {}).get("uri"):
+                        return part["file"]["uri"]
         except Exception:
             pass
     return r.text
 
 
-def paid_fetch(url: str, agent_token: Optional[str] = None) -> str:
-    """GET url; if 402 (x402), call PayStabl Agent to pay and fetch; return raw body."""
-    url = "https://proxy402.com/rZ0Or4VKA9?vin=JHMGE8H58DC009182"
-    r = requests.get(url, validate_certs=True, timeout=30)
-    
-    if r.status_code != 402:
-        return r.text
-    
+def _remember_report(url: str, key: str, body: str, from_origin: bool = False) -> None:
+    """Cache `body` only if it is the report that was asked for.
+
+    PayStabl answers with whatever its model said, which may be a payment
+    error rather than the page. For a VIN URL the body must be a report for
+    that VIN (its fields are cached along with it); other URLs are cached
+    only when the origin itself answered 2xx.
+    """
+    vin = url_vin(url)
+    if vin is None:
+        if from_origin:
+            report_cache.put(key, body)
+        return
+    try:
+        fields = _extract_blob(body) if blob_store.is_blob_uri(body) else extract_fields(body)
+    except Exception as e:  # an unreadable blob is returned as is, just not cached
+        logger.info("not caching %s: %s", key, e)
+        return
+    if (fields.get("vin") or "").upper() != vin:
+        logger.info("not caching %s: body is not a report for %s", key, vin)
+        return
+    report_cache.put(key, body)
+    report_cache.put_fields(body, fields)
+
+
+def _payer(agent_token: Optional[str]) -> str:
+    """Short, non-reversible id of the wallet that pays for a fetch (tokens never go into keys or logs)."""
+    token = agent_token or os.getenv("AGENT_TOKEN") or ""
+    return hashlib.sha256(token.encode()).hexdigest()[:16]
+
+
+@timed("payment")
+async def _pay402_and_fetch_async(url: str, agent_token: Optional[str] = None) -> str:
     token = agent_token or os.getenv("AGENT_TOKEN")
     payload = {"url": url , "agent_token": token}
     msg = f"pay402_and_fetch {payload}"
-    return _a2a_simple_task(PAYSTABL_CARD_URL, msg)
-paid_fetch_tool = FunctionTool(func=paid_fetch)
+    return await pay_flight.do(
+        f"pay:{cache_key(url)}:{_payer(token)}",
+        lambda: _a2a_simple_task_async(PAYSTABL_CARD_URL, msg),
+    )
+
 
+async def _paid_fetch_uncached(url: str, key: str, agent_token: Optional[str]) -> str:
+    cached = report_cache.get(key)  # a previous flight may have just filled it
+    if cached is not None:
+        return cached.body
+    with tracing.span("fetch", url=url), stage_seconds.time(stage="fetch"):
+        r = await get_async_client().get(url, timeout=deadline.timeout(30, "report fetch"))
+
+    if r.status_code != 402:
+        if r.is_success:
+            _remember_report(url, key, r.text, from_origin=True)
+        return r.text
+
+    body = await _pay402_and_fetch_async(url, agent_token)
+    _remember_report(url, key, body)
+    return body
+
+
+async def fetch_report_body(url: str, agent_token: Optional[str] = None) -> str:
+    """Raw body (or blob URI, if PayStabl stored it out of band) for url, paying a 402 if needed."""
+    key = cache_key(url)
+    cached = report_cache.get(key)
+    if cached is not None:
+        return cached.body
+    # Only callers paying from the same wallet share a flight; another wallet's
+    # caller pays for its own fetch (a finished, cached report is shared by all).
+    return await fetch_flight.do(f"{key}:{_payer(agent_token)}", lambda: _paid_fetch_uncached(url, key, agent_token))
+
+
+async def paid_fetch_async(url: str, agent_token: Optional[str] = None) -> str:
+    """GET url without blocking the event loop; if 402 (x402), pay via PayStabl Agent.
+
+    Returns the raw body, or a `file://` blob URI in its place when the body is large.
+    Raises ValueError, before anything is fetched or paid, for a URL outside ALLOWED_ORIGINS.
+    """
+    if _origin(url) not in ALLOWED_ORIGINS:
+        raise ValueError(f"{_origin(url)} is not an allowed report origin (see CARFAX_ALLOWED_ORIGINS)")
+    return blob_store.spill(await fetch_report_body(url, agent_token))
+paid_fetch_async_tool = FunctionTool(func=paid_fetch_async)
+
+def _extract_blob(uri: str) -> Dict[str, Any]:
+    extractor = VehicleFieldExtractor()
+    for chunk in blob_store.iter_chunks(uri):
+        extractor.feed(chunk)
+    return extractor.result()
+
+@timed("extract")
 def extract_vehicle_fields(raw: str) -> Dict[str, Any]:
-    """Very light extractor—good enough for demo. Improve as needed."""
-    def grab(pattern, text):
-        m = re.search(pattern, text, re.I)
-        return m.group(1).strip() if m else None
-
-    # naive grabs
-    vin = grab(r"\bVIN[:\s]*([A-HJ-NPR-Z0-9]{11,17})\b", raw)
-    make = grab(r"\bMake[:\s]*([A-Za-z0-9\- ]{2,30})\b", raw) or grab(r"\b([A-Z][a-z]+)\s+[A-Z][a-z]+\b", raw)
-    model = grab(r"\bModel[:\s]*([A-Za-z0-9\- ]{2,30})\b")
-    year = grab(r"\b(20\d{2}|19\d{2})\b", raw)
-    mileage = grab(r"\b(\d{1,3}(?:,\d{3})*)\s*(?:miles|mi)\b", raw)
-
-    return {
-        "vin": vin,
-        "make": make,
-        "model": model,
-        "year": year,
-        "mileage": mileage,
-        "raw_len": len(raw),
-    }
+    """Extract VIN, make, model, year and mileage from a raw report page (text or HTML) or its blob URI."""
+    cached = report_cache.get_fields(raw)
+    if cached is not None:
+        return cached
+    fields = _extract_blob(raw) if blob_store.is_blob_uri(raw) else extract_fields(raw)
+    report_cache.put_fields(raw, fields)
+    return fields
 extract_vehicle_fields_tool = FunctionTool(func=extract_vehicle_fields)
+
+def vin_report_url(vin: str) -> str:
+    return CARFAX_REPORT_URL.format(vin=vin)
+
+async def lookup_vehicle(vin: str, agent_token: Optional[str] = None) -> Dict[str, Any]:
+    """Fetch and extract a single VIN. Errors are returned in the result, never raised."""
+    if not isinstance(vin, str):
+        return {"vin": vin, "status": "error", "error": "invalid VIN"}
+    vin = vin.strip().upper()
+    if not _VIN_RE.match(vin):
+        return {"vin": vin, "status": "error", "error": "invalid VIN"}
+    try:
+        raw = await fetch_report_body(vin_report_url(vin), agent_token)
+        fields = extract_vehicle_fields(raw)
+    except Exception as e:
+        return {"vin": vin, "status": "error", "error": f"{type(e).__name__}: {e}"}
+    return {"vin": vin, "status": "ok", "fields": fields}
+
+async def iter_vehicle_lookups(
+    vins: List[str], concurrency: Optional[int] = None, agent_token: Optional[str] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """Yield per-VIN lookup results in completion order, at most `concurrency` in flight."""
+    sem = asyncio.Semaphore(max(1, concurrency or BATCH_CONCURRENCY))
+
+    async def one(vin: str) -> Dict[str, Any]:
+        a2a_priority.set("batch")  # this task's own context copy
+        async with sem:
+            return await lookup_vehicle(vin, agent_token)
+
+    # Strings are deduplicated; anything else (null, numbers) gets its own per-VIN error.
+    vins = [v.strip().upper() if isinstance(v, str) else v for v in vins]
+    unique = list(dict.fromkeys(v for v in vins if isinstance(v, str))) + [v for v in vins if not isinstance(v, str)]
+    tasks = [asyncio.ensure_future(one(v)) for v in unique]
+    try:
+        for fut in asyncio.as_completed(tasks):
+            yield await fut
+    finally:
+        for t in tasks:
+            t.cancel()
+
+async def batch_vehicle_lookup(vins: List[str], concurrency: Optional[int] = None) -> Dict[str, Any]:
+    """Fetch and extract many VINs concurrently; returns per-VIN results and errors."""
+    results = [r async for r in iter_vehicle_lookups(vins, concurrency)]
+    errors = sum(1 for r in results if r["status"] != "ok")
+    return {"results": results, "ok": len(results) - errors, "errors": errors}
+batch_vehicle_lookup_tool = FunctionTool(func=batch_vehicle_lookup)
+
 INSTRUCTION = """
 You are the Carfax Agent. Your job:
-1) Fetch listing/VIN pages (use `paid_fetch`). If the page is 402-paywalled, `paid_fetch` will route payment via PayStabl.
+1) Fetch listing/VIN pages (use `paid_fetch_async`). If the page is 402-paywalled, `paid_fetch_async` will route payment via PayStabl.
+   Large pages come back as a `file://` URI; pass it to `extract_vehicle_fields` unchanged, do not try to read it.
 2) Extract VIN, make, model, year, and mileage with `extract_vehicle_fields`.
+   For several VINs at once, use `batch_vehicle_lookup` (fetch + extract in one call).
 3) Return a concise JSON summary. No extra commentary.
 """
 
-def create_agent() -> LlmAgent:
+def create_agent(use_llm_cache: bool = CARFAX_LLM_CACHE) -> LlmAgent:
+    before_model_callbacks = [deadline.before_model, session_compactor]
+    after_model_callbacks = [after_model]
+    if use_llm_cache:
+        # After compaction, so the key covers the compacted request (see agent_common/llm_cache.py).
+        before_model_callbacks.append(llm_cache.lookup)
+        after_model_callbacks.append(llm_cache.store)
+    # Timing last: a cached answer skips after_model, so it must not start a timing either.
+    before_model_callbacks.append(before_model)
     return LlmAgent(
-        model="gemini-2.0-flash",
+        model=CARFAX_MODEL,
         name="Carfax_Agent",
         instruction=INSTRUCTION,
         tools=[
-            paid_fetch_tool,
+            paid_fetch_async_tool,
             extract_vehicle_fields_tool,
-        ]
+            batch_vehicle_lookup_tool,
+        ],
+        # Long contexts replay only recent turns verbatim (see agent_common/session_compaction.py).
+        before_model_callback=before_model_callbacks,
+        after_model_callback=after_model_callbacks,
+        before_tool_callback=[before_tool, tracing.before_tool],
+        after_tool_callback=[after_tool, tracing.after_tool],
     )
\ No newline at end of file
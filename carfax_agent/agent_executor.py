@@ -1,23 +1,43 @@
-import logging
+import asyncio, inspect, logging
 from collections.abc import AsyncGenerator
+from contextlib import aclosing
+from typing import Any
 from a2a.server.agent_execution import AgentExecutor
 from a2a.server.agent_execution.context import RequestContext
 from a2a.server.events.event_queue import EventQueue
 from a2a.server.tasks import TaskUpdater
 from a2a.types import (
-    FilePart, FileWithBytes, FileWithUri, Part, TaskState, TextPart, UnsupportedOperationError,
+    DataPart, FilePart, FileWithBytes, FileWithUri, Part, TaskNotCancelableError, TaskState, TextPart,
 )
 from a2a.utils.errors import ServerError
 from google.adk import Runner
 from google.adk.events import Event
 from google.genai import types
 
+from agent_common import deadline, tracing
+from agent_common.blob_store import blob_store
+from agent_common.metrics import gauge, stage_seconds
+from agent_common.session_compaction import session_compactor
+
+from agent import iter_vehicle_lookups
+from direct_dispatch import DirectRequest, parse_direct_request
+
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
+async def _emit(result: Any) -> None:
+    """TaskUpdater methods are plain calls in a2a-sdk 0.2.5 and coroutines from 0.2.6."""
+    if inspect.isawaitable(result):
+        await result
+
+_TERMINAL_STATES = (TaskState.completed, TaskState.canceled, TaskState.failed, TaskState.rejected)
+
 class CarfaxAgentExecutor(AgentExecutor):
     def __init__(self, runner: Runner):
         self.runner = runner
+        # task_id -> the asyncio task running execute(), so cancel() can tear it down.
+        self._running_tasks: dict[str, asyncio.Task] = {}
+        gauge("running_tasks", "A2A tasks currently executing.", lambda: len(self._running_tasks))
 
     def _run_agent(self, session_id: str, new_message: types.Content) -> AsyncGenerator[Event, None]:
         return self.runner.run_async(session_id=session_id, user_id="carfax_agent", new_message=new_message)
@@ -26,19 +46,57 @@ class CarfaxAgentExecutor(AgentExecutor):
         session_obj = await self._upsert_session(session_id)
         session_id = session_obj.id
 
-        async for event in self._run_agent(session_id, new_message):
-            if event.is_final_response():
-                parts = convert_genai_parts_to_a2a(event.content.parts if event.content and event.content.parts else [])
-                task_updater.add_artifact(parts)
-                task_updater.complete()
-                break
-            if not event.get_function_calls():
-                task_updater.update_status(
-                    TaskState.working,
-                    message=task_updater.new_agent_message(
-                        convert_genai_parts_to_a2a(event.content.parts if event.content and event.content.parts else [])
-                    ),
-                )
+        invocation_id = None
+        # aclosing: a cancelled task also closes the generator and the LLM/tool calls under it.
+        async with aclosing(self._run_agent(session_id, new_message)) as events:
+            async for event in events:
+                invocation_id = event.invocation_id
+                if event.is_final_response():
+                    parts = convert_genai_parts_to_a2a(event.content.parts if event.content and event.content.parts else [])
+                    await _emit(task_updater.add_artifact(parts))
+                    await _emit(task_updater.complete())
+                    break
+                if not event.get_function_calls():
+                    await _emit(task_updater.update_status(
+                        TaskState.working,
+                        message=task_updater.new_agent_message(
+                            convert_genai_parts_to_a2a(event.content.parts if event.content and event.content.parts else [])
+                        ),
+                    ))
+        if invocation_id:
+            logger.debug("session %s compaction stats: %s", session_id, session_compactor.stats(invocation_id))
+
+    async def _process_direct(self, request: DirectRequest, task_updater: TaskUpdater) -> None:
+        """Run a structured tool call without the LLM and emit its result as the artifact."""
+        try:
+            with stage_seconds.time(stage=f"direct:{request.name}"):
+                if request.name == "batch_vehicle_lookup":
+                    await self._process_batch(request.args, task_updater)
+                    return
+                result = await request.run()
+        except Exception as e:
+            logger.warning("direct %s failed: %s", request.name, e)
+            await _emit(task_updater.failed(message=task_updater.new_agent_message(
+                [Part(root=TextPart(text=f"{request.name} failed: {type(e).__name__}: {e}"))]
+            )))
+            return
+        part = text_or_blob_part(result) if isinstance(result, str) else Part(root=DataPart(data=result))
+        await _emit(task_updater.add_artifact([part], name=request.name))
+        await _emit(task_updater.complete())
+
+    async def _process_batch(self, request: dict, task_updater: TaskUpdater) -> None:
+        """Stream one artifact per VIN as it completes, then a summary artifact."""
+        ok = errors = 0
+        async for result in iter_vehicle_lookups(request["vins"], request.get("concurrency")):
+            if result["status"] == "ok":
+                ok += 1
+            else:
+                errors += 1
+            await _emit(task_updater.add_artifact([Part(root=DataPart(data=result))], name=f"vin:{result['vin']}"))
+        await _emit(task_updater.add_artifact(
+            [Part(root=DataPart(data={"ok": ok, "errors": errors}))], name="batch_summary",
+        ))
+        await _emit(task_updater.complete())
 
     async def execute(self, context: RequestContext, event_queue: EventQueue):
         if not context.task_id or not context.context_id:
@@ -48,17 +106,45 @@ class CarfaxAgentExecutor(AgentExecutor):
 
         updater = TaskUpdater(event_queue, context.task_id, context.context_id)
         if not context.current_task:
-            updater.submit()
-        updater.start_work()
+            await _emit(updater.submit())
+        await _emit(updater.start_work())
 
-        await self._process_request(
-            types.UserContent(parts=convert_a2a_parts_to_genai(context.message.parts)),
-            context.context_id,
-            updater,
-        )
+        self._running_tasks[context.task_id] = asyncio.current_task()
+        remote_parent = tracing.extract(context.message.metadata)
+        budget = deadline.extract(context.message.metadata)
+        try:
+            # The caller's remaining budget bounds everything below, PayStabl included.
+            with tracing.span("execute", remote_parent, task_id=context.task_id, context_id=context.context_id), \
+                    deadline.scope(budget):
+                async with deadline.enforce(f"task {context.task_id}"):
+                    direct = parse_direct_request(context.message.parts)
+                    if direct is not None:
+                        await self._process_direct(direct, updater)
+                        return
+
+                    await self._process_request(
+                        types.UserContent(parts=convert_a2a_parts_to_genai(context.message.parts)),
+                        context.context_id,
+                        updater,
+                    )
+        except deadline.DeadlineExceeded as e:
+            logger.warning("abandoning task %s: %s", context.task_id, e)
+            await _emit(updater.failed(message=updater.new_agent_message(
+                [Part(root=TextPart(text=f"Carfax gave up: {e}"))]
+            )))
+        finally:
+            self._running_tasks.pop(context.task_id, None)
 
     async def cancel(self, context: RequestContext, event_queue: EventQueue):
-        raise ServerError(error=UnsupportedOperationError())
+        """Cancel the running execute() for this task; in-flight fetches and PayStabl calls unwind with it."""
+        running = self._running_tasks.pop(context.task_id, None)
+        if running is None:
+            if context.current_task and context.current_task.status.state in _TERMINAL_STATES:
+                raise ServerError(error=TaskNotCancelableError())
+        elif not running.done():
+            running.cancel()
+        updater = TaskUpdater(event_queue, context.task_id, context.context_id)
+        await _emit(updater.update_status(TaskState.canceled, final=True))
 
     async def _upsert_session(self, session_id: str):
         session = await self.runner.session_service.get_session(
@@ -72,6 +158,12 @@ class CarfaxAgentExecutor(AgentExecutor):
             raise RuntimeError(f"Failed to get or create session: {session_id}")
         return session
 
+def text_or_blob_part(text: str) -> Part:
+    """A bare blob URI travels as a FileWithUri handle, anything else as text."""
+    if blob_store.is_blob_uri(text.strip()):
+        return Part(root=FilePart(file=FileWithUri(uri=text.strip(), mimeType="text/html")))
+    return Part(root=TextPart(text=text))
+
 def convert_a2a_parts_to_genai(parts: list[Part]) -> list[types.Part]:
     return [convert_a2a_part_to_genai(p) for p in parts]
 
@@ -80,6 +172,9 @@ def convert_a2a_part_to_genai(part: Part) -> types.Part:
     if isinstance(root, TextPart):
         return types.Part(text=root.text)
     if isinstance(root, FilePart):
+        if isinstance(root.file, FileWithUri) and blob_store.is_blob_uri(root.file.uri):
+            # The model cannot open local blobs; it gets the handle and hands it to the tools.
+            return types.Part(text=root.file.uri)
         if isinstance(root.file, FileWithUri):
             return types.Part(file_data=types.FileData(file_uri=root.file.uri, mime_type=root.file.mimeType))
         if isinstance(root.file, FileWithBytes):
@@ -91,7 +186,7 @@ def convert_genai_parts_to_a2a(parts: list[types.Part]) -> list[Part]:
     out: list[Part] = []
     for p in parts or []:
         if p.text:
-            out.append(Part(root=TextPart(text=p.text)))
+            out.append(text_or_blob_part(p.text))
         elif p.file_data and p.file_data.file_uri:
             out.append(Part(root=FilePart(file=FileWithUri(uri=p.file_data.file_uri, mimeType=p.file_data.mime_type))))
         elif p.inline_data and p.inline_data.data:
@@ -0,0 +1,110 @@
+import ast
+import json
+import os
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from a2a.types import DataPart, Part, TextPart
+
+from agent import batch_vehicle_lookup, extract_vehicle_fields, lookup_vehicle, paid_fetch_async
+
+# Set CARFAX_DIRECT_DISPATCH=false to send everything through the LLM again.
+DIRECT_DISPATCH = os.getenv("CARFAX_DIRECT_DISPATCH", "true").lower() not in ("0", "false", "no")
+
+
+async def _extract(raw: str) -> Dict[str, Any]:
+    return extract_vehicle_fields(raw)
+
+
+@dataclass(frozen=True)
+class Command:
+    """A tool that can be called without the LLM, with its argument schema."""
+    handler: Callable[..., Awaitable[Any]]
+    required: Dict[str, Tuple[type, ...]]
+    optional: Dict[str, Tuple[type, ...]]
+
+    def validate(self, args: Dict[str, Any]) -> bool:
+        for key, kinds in self.required.items():
+            if not isinstance(args.get(key), kinds):
+                return False
+        for key, value in args.items():
+            if key in self.required:
+                continue
+            kinds = self.optional.get(key)
+            if kinds is None or (value is not None and not isinstance(value, kinds)):
+                return False
+        return True
+
+
+COMMANDS: Dict[str, Command] = {
+    "paid_fetch": Command(paid_fetch_async, {"url": (str,)}, {"agent_token": (str,)}),
+    "paid_fetch_async": Command(paid_fetch_async, {"url": (str,)}, {"agent_token": (str,)}),
+    "extract_vehicle_fields": Command(_extract, {"raw": (str,)}, {}),
+    "vehicle_lookup": Command(lookup_vehicle, {"vin": (str,)}, {"agent_token": (str,)}),
+    "batch_vehicle_lookup": Command(batch_vehicle_lookup, {"vins": (list,)}, {"concurrency": (int,)}),
+}
+
+# Bare JSON objects (no command word) are routed by their distinguishing key.
+_IMPLICIT = (("vins", "batch_vehicle_lookup"), ("vin", "vehicle_lookup"), ("url", "paid_fetch"), ("raw", "extract_vehicle_fields"))
+
+
+@dataclass(frozen=True)
+class DirectRequest:
+    name: str
+    args: Dict[str, Any]
+
+    async def run(self) -> Any:
+        return await COMMANDS[self.name].handler(**self.args)
+
+
+def _parse_args(text: str) -> Optional[Any]:
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    try:
+        return ast.literal_eval(text)
+    except (ValueError, SyntaxError, MemoryError, RecursionError):
+        return None
+
+
+def _match(name: Optional[str], args: Any) -> Optional[DirectRequest]:
+    if name == "batch_vehicle_lookup" and isinstance(args, list):
+        args = {"vins": args}
+    if not isinstance(args, dict):
+        return None
+    if name is None:
+        name = next((cmd for key, cmd in _IMPLICIT if key in args), None)
+        if name is None:
+            return None
+    command = COMMANDS.get(name)
+    if command is None or not command.validate(args):
+        return None
+    return DirectRequest(name, dict(args))
+
+
+def parse_direct_request(parts: list[Part]) -> Optional[DirectRequest]:
+    """Recognize `<tool> {json-or-dict}`, a bare JSON object, or a data part.
+
+    Anything that does not match a declared command schema returns None and
+    goes to the LLM as before.
+    """
+    if not DIRECT_DISPATCH:
+        return None
+    for part in parts:
+        root = part.root
+        if isinstance(root, DataPart):
+            request = _match(root.data.get("command") if isinstance(root.data.get("command"), str) else None,
+                             {k: v for k, v in root.data.items() if k != "command"})
+            if request is not None:
+                return request
+        elif isinstance(root, TextPart):
+            text = root.text.strip()
+            if text.startswith("{"):
+                request = _match(None, _parse_args(text))
+            else:
+                name, _, rest = text.partition(" ")
+                request = _match(name, _parse_args(rest.strip())) if name in COMMANDS else None
+            if request is not None:
+                return request
+    return None
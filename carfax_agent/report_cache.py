@@ -0,0 +1,249 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from agent_common.metrics import cache_requests_total
+
+logger = logging.getLogger(__name__)
+
+REPORT_CACHE_TTL = float(os.getenv("CARFAX_CACHE_TTL", "3600"))
+REPORT_CACHE_MAX_BYTES = int(os.getenv("CARFAX_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+REPORT_CACHE_DB = os.getenv("CARFAX_CACHE_DB", "")  # empty -> memory only
+
+
+def url_vin(url: str) -> Optional[str]:
+    """The VIN a report URL asks for (its `vin` query param), normalized, if any."""
+    for name, value in parse_qsl(urlsplit(url.strip()).query, keep_blank_values=True):
+        if name.lower() == "vin" and value.strip():
+            return value.strip().upper()
+    return None
+
+
+def cache_key(url: str) -> str:
+    """Canonical report URL: lower-case scheme and host, sorted params, upper-case VIN, no fragment.
+
+    Scheme and host stay in the key, so two report providers (or an endpoint
+    and its stub) never share entries.
+    """
+    parts = urlsplit(url.strip())
+    query = [
+        (name, value.strip().upper() if name.lower() == "vin" else value)
+        for name, value in parse_qsl(parts.query, keep_blank_values=True)
+    ]
+    return urlunsplit((
+        parts.scheme.lower(),
+        parts.netloc.lower(),
+        parts.path or "/",
+        urlencode(sorted(query)),
+        "",
+    ))
+
+
+def body_digest(body: str) -> str:
+    return hashlib.sha1(body.encode("utf-8", "surrogatepass")).hexdigest()
+
+
+@dataclass
+class CachedReport:
+    key: str
+    body: str
+    digest: str
+    stored_at: float
+    fields: Optional[Dict[str, Any]] = None
+    size: int = 0
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    disk_hits: int = 0
+    evictions: int = 0
+    expirations: int = 0
+
+
+class ReportCache:
+    """TTL cache of raw report bodies and their extracted fields.
+
+    Memory tier is an LRU bounded by total body bytes; the optional SQLite
+    tier (``db_path``) keeps entries across restarts.
+    """
+
+    def __init__(self, ttl: float = REPORT_CACHE_TTL, max_bytes: int = REPORT_CACHE_MAX_BYTES,
+                 db_path: Optional[str] = None):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, CachedReport]" = OrderedDict()
+        self._by_digest: Dict[str, str] = {}
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self._stats = CacheStats()
+        self._db: Optional[sqlite3.Connection] = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS reports ("
+                " key TEXT PRIMARY KEY, digest TEXT NOT NULL, body TEXT NOT NULL,"
+                " fields TEXT, stored_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS reports_digest ON reports(digest)")
+
+    def _fresh(self, stored_at: float) -> bool:
+        return self.ttl <= 0 or (time.time() - stored_at) < self.ttl
+
+    # ---- memory tier -------------------------------------------------------
+
+    def _remember(self, entry: CachedReport) -> None:
+        self._forget(entry.key)
+        if entry.size > self.max_bytes:
+            return  # too large for memory; disk tier only
+        self._entries[entry.key] = entry
+        self._by_digest[entry.digest] = entry.key
+        self._bytes += entry.size
+        while self._bytes > self.max_bytes and self._entries:
+            _, old = self._entries.popitem(last=False)
+            self._drop_index(old)
+            self._stats.evictions += 1
+
+    def _forget(self, key: str) -> None:
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._drop_index(old)
+
+    def _drop_index(self, entry: CachedReport) -> None:
+        self._bytes -= entry.size
+        if self._by_digest.get(entry.digest) == entry.key:
+            del self._by_digest[entry.digest]
+
+    # ---- disk tier ---------------------------------------------------------
+
+    def _row_to_entry(self, row) -> CachedReport:
+        key, digest, body, fields, stored_at = row
+        return CachedReport(
+            key=key, body=body, digest=digest, stored_at=stored_at,
+            fields=json.loads(fields) if fields else None,
+            size=len(body.encode("utf-8", "surrogatepass")),
+        )
+
+    def _load(self, where: str, arg: str) -> Optional[CachedReport]:
+        if self._db is None:
+            return None
+        row = self._db.execute(
+            f"SELECT key, digest, body, fields, stored_at FROM reports WHERE {where} = ?"
+            " ORDER BY stored_at DESC LIMIT 1",
+            (arg,),
+        ).fetchone()
+        if row is None:
+            return None
+        entry = self._row_to_entry(row)
+        if not self._fresh(entry.stored_at):
+            self._db.execute("DELETE FROM reports WHERE key = ?", (entry.key,))
+            self._stats.expirations += 1
+            return None
+        self._stats.disk_hits += 1
+        self._remember(entry)
+        return entry
+
+    def _store(self, entry: CachedReport) -> None:
+        if self._db is None:
+            return
+        try:
+            self._db.execute(
+                "INSERT OR REPLACE INTO reports (key, digest, body, fields, stored_at) VALUES (?, ?, ?, ?, ?)",
+                (entry.key, entry.digest, entry.body,
+                 json.dumps(entry.fields) if entry.fields is not None else None, entry.stored_at),
+            )
+        except sqlite3.Error as e:
+            logger.warning("report cache: failed to persist %s: %s", entry.key, e)
+
+    # ---- public API --------------------------------------------------------
+
+    def get(self, key: str) -> Optional[CachedReport]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not self._fresh(entry.stored_at):
+                self._forget(key)
+                self._stats.expirations += 1
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+            else:
+                entry = self._load("key", key)
+            if entry is None:
+                self._stats.misses += 1
+            else:
+                self._stats.hits += 1
+            cache_requests_total.inc(cache="report", result="miss" if entry is None else "hit")
+            return entry
+
+    def put(self, key: str, body: str) -> CachedReport:
+        with self._lock:
+            digest = body_digest(body)
+            entry = CachedReport(
+                key=key, body=body, digest=digest, stored_at=time.time(),
+                size=len(body.encode("utf-8", "surrogatepass")),
+            )
+            self._remember(entry)
+            self._store(entry)
+            return entry
+
+    def get_fields(self, body: str) -> Optional[Dict[str, Any]]:
+        """Return cached extraction results for this exact body, if any."""
+        with self._lock:
+            digest = body_digest(body)
+            key = self._by_digest.get(digest)
+            entry = self._entries.get(key) if key else None
+            if entry is None:
+                entry = self._load("digest", digest)
+            if entry is None or entry.fields is None or not self._fresh(entry.stored_at):
+                self._stats.misses += 1
+                cache_requests_total.inc(cache="fields", result="miss")
+                return None
+            self._stats.hits += 1
+            cache_requests_total.inc(cache="fields", result="hit")
+            return dict(entry.fields)
+
+    def put_fields(self, body: str, fields: Dict[str, Any]) -> None:
+        with self._lock:
+            digest = body_digest(body)
+            key = self._by_digest.get(digest)
+            entry = self._entries.get(key) if key else None
+            if entry is None:
+                entry = self._load("digest", digest)
+            if entry is None:
+                # Body did not come through paid_fetch; cache it under its digest.
+                entry = self.put(f"sha1:{digest}", body)
+            entry.fields = dict(fields)
+            self._store(entry)
+
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            self._forget(key)
+            if self._db is not None:
+                self._db.execute("DELETE FROM reports WHERE key = ?", (key,))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            s = self._stats
+            return {
+                "hits": s.hits,
+                "misses": s.misses,
+                "disk_hits": s.disk_hits,
+                "evictions": s.evictions,
+                "expirations": s.expirations,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+report_cache = ReportCache(db_path=REPORT_CACHE_DB or None)
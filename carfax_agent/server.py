@@ -0,0 +1,90 @@
+import asyncio, logging, os
+from contextlib import asynccontextmanager
+from a2a.server.apps import A2AStarletteApplication
+from a2a.server.request_handlers import DefaultRequestHandler
+from a2a.types import AgentCapabilities, AgentCard, AgentSkill
+from google.adk.memory.in_memory_memory_service import InMemoryMemoryService
+from google.adk.runners import Runner
+from agent import create_agent
+from dotenv import load_dotenv
+from agent_executor import CarfaxAgentExecutor
+from agent_common.blob_store import blob_store
+from agent_common.http_client import aclose_async_client
+from agent_common.metrics import add_metrics_route
+from agent_common.sqlite_store import create_stores
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def create_app():
+    """Build the Carfax A2A Starlette app (uvicorn app factory; one instance per worker)."""
+    host = os.getenv("CARFAX_HOST", "localhost")
+    port = int(os.getenv("CARFAX_PORT", "10004"))  # Carfax Agent
+    # A bind address like 0.0.0.0 is not reachable; CARFAX_PUBLIC_URL is what callers use.
+    public_url = os.getenv("CARFAX_PUBLIC_URL") or f"http://{'localhost' if host in ('0.0.0.0', '::', '') else host}:{port}/"
+    capabilities = AgentCapabilities(streaming=True)
+    skills = [
+        AgentSkill(
+            id="paid_fetch",
+            name="Paid Fetch",
+            description="Fetch a carfax listing given a vin number. If 402, pay via PayStabl and return raw body. Only use this url: https://proxy402.com/rZ0Or4VKA9?vin=JHMGE8H58DC009182 and replace vin with the actual vin.",
+            tags=["x402", "payments", "fetch"],
+            examples=["paid_fetch { 'url': 'https://proxy402.com/rZ0Or4VKA9?vin=JHMGE8H58DC009182' }"],
+        ),
+        AgentSkill(
+            id="extract_vehicle_fields",
+            name="Extract Vehicle Fields",
+            description="Extract VIN/make/model/year/mileage from raw page text.",
+            tags=["parse", "vehicle"],
+            examples=["extract_vehicle_fields { 'raw': '<html...>' }"],
+        ),
+        AgentSkill(
+            id="vehicle_lookup",
+            name="Vehicle Lookup",
+            description="Fetch (paying via PayStabl if 402) and extract vehicle fields for one VIN. Structured requests like this are executed directly without the LLM.",
+            tags=["x402", "vehicle"],
+            examples=["vehicle_lookup { 'vin': 'JHMGE8H58DC009182' }", "{ \"vin\": \"JHMGE8H58DC009182\" }"],
+        ),
+        AgentSkill(
+            id="batch_vehicle_lookup",
+            name="Batch Vehicle Lookup",
+            description="Fetch and extract vehicle fields for a list of VINs concurrently. Each VIN is streamed back as its own artifact as soon as it completes; failures are reported per VIN.",
+            tags=["x402", "vehicle", "batch"],
+            examples=["batch_vehicle_lookup { 'vins': ['JHMGE8H58DC009182', '1HGCM82633A004352'], 'concurrency': 8 }"],
+        ),
+    ]
+
+    agent_card = AgentCard(
+        name="Carfax Agent",
+        description="Fetches listing pages (x402-aware) and extracts key vehicle fields.",
+        url=public_url,
+        version="1.0.0",
+        defaultInputModes=["text/plain", "application/json"],
+        defaultOutputModes=["application/json", "text/plain"],
+        capabilities=capabilities,
+        skills=skills,
+    )
+
+    # AGENT_STORE=sqlite keeps tasks/sessions/artifacts in carfax_agent.db (see agent_common/sqlite_store.py).
+    stores = create_stores(default_db="carfax_agent.db")
+    runner = Runner(
+        app_name=agent_card.name,
+        agent=create_agent(),
+        artifact_service=stores.artifact_service,
+        session_service=stores.session_service,
+        memory_service=InMemoryMemoryService(),
+    )
+    handler = DefaultRequestHandler(agent_executor=CarfaxAgentExecutor(runner), task_store=stores.task_store)
+
+    @asynccontextmanager
+    async def lifespan(app):
+        compaction = asyncio.create_task(stores.compaction_loop())
+        blob_gc = asyncio.create_task(blob_store.gc_loop())
+        yield
+        compaction.cancel()
+        blob_gc.cancel()
+        await aclose_async_client()
+        stores.close()
+
+    app = A2AStarletteApplication(agent_card=agent_card, http_handler=handler)
+    return add_metrics_route(app.build(lifespan=lifespan))
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The agent runs from its own directory with flat imports (`import agent`); do the same here.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,81 @@
+import asyncio
+
+from a2a.types import Part, TaskState, TextPart
+
+import agent
+import agent_executor
+from agent_executor import CarfaxAgentExecutor
+from direct_dispatch import DirectRequest, parse_direct_request
+
+
+class RecordingUpdater:
+    """Stands in for TaskUpdater; records the calls the executor makes."""
+
+    def __init__(self):
+        self.artifacts = []
+        self.state = TaskState.working
+        self.message = None
+
+    def add_artifact(self, parts, name=None):
+        self.artifacts.append((name, parts))
+
+    def complete(self):
+        self.state = TaskState.completed
+
+    def failed(self, message=None):
+        self.state = TaskState.failed
+        self.message = message
+
+    def new_agent_message(self, parts):
+        return parts
+
+
+def test_batch_failure_fails_the_task(monkeypatch):
+    async def broken(vins, concurrency=None):
+        raise RuntimeError("boom")
+        yield  # pragma: no cover
+
+    monkeypatch.setattr(agent_executor, "iter_vehicle_lookups", broken)
+    updater = RecordingUpdater()
+    executor = CarfaxAgentExecutor(runner=None)
+    asyncio.run(executor._process_direct(DirectRequest("batch_vehicle_lookup", {"vins": ["X"]}), updater))
+    assert updater.state == TaskState.failed
+    assert "boom" in updater.message[0].root.text
+
+
+def test_batch_streams_results_and_summary(monkeypatch):
+    async def lookups(vins, concurrency=None):
+        for vin in vins:
+            yield {"vin": vin, "status": "ok" if vin != "BAD" else "error"}
+
+    monkeypatch.setattr(agent_executor, "iter_vehicle_lookups", lookups)
+    updater = RecordingUpdater()
+    executor = CarfaxAgentExecutor(runner=None)
+    asyncio.run(executor._process_direct(DirectRequest("batch_vehicle_lookup", {"vins": ["A", "BAD"]}), updater))
+    assert updater.state == TaskState.completed
+    assert [name for name, _ in updater.artifacts] == ["vin:A", "vin:BAD", "batch_summary"]
+    assert updater.artifacts[-1][1][0].root.data == {"ok": 1, "errors": 1}
+
+
+def test_paid_fetch_refuses_other_origins_before_fetching(monkeypatch):
+    fetched = []
+
+    async def fetch(url, agent_token=None):
+        fetched.append(url)
+        return "body"
+
+    monkeypatch.setattr(agent, "fetch_report_body", fetch)
+    executor = CarfaxAgentExecutor(runner=None)
+    for text in ('{"url": "https://evil.example/r?vin=X"}', 'paid_fetch {"url": "https://proxy402.com@evil.example/"}'):
+        request = parse_direct_request([Part(root=TextPart(text=text))])
+        updater = RecordingUpdater()
+        asyncio.run(executor._process_direct(request, updater))
+        assert updater.state == TaskState.failed
+        assert "not an allowed report origin" in updater.message[0].root.text
+    assert fetched == []
+
+    request = parse_direct_request([Part(root=TextPart(text=f'paid_fetch {{"url": "{agent.vin_report_url("X")}"}}'))])
+    updater = RecordingUpdater()
+    asyncio.run(executor._process_direct(request, updater))
+    assert updater.state == TaskState.completed
+    assert fetched == [agent.vin_report_url("X")]
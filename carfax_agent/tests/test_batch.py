@@ -0,0 +1,43 @@
+import asyncio
+
+from a2a.types import Part, TextPart
+
+import agent
+from direct_dispatch import parse_direct_request
+
+GOOD = "JHMGE8H58DC009182"
+
+
+def _text(text):
+    return [Part(root=TextPart(text=text))]
+
+
+def test_parse_batch_forms():
+    for text in (f'batch_vehicle_lookup {{"vins": ["{GOOD}"]}}', f'batch_vehicle_lookup ["{GOOD}"]',
+                 f'{{"vins": ["{GOOD}"], "concurrency": 2}}'):
+        request = parse_direct_request(_text(text))
+        assert request is not None and request.name == "batch_vehicle_lookup"
+        assert request.args["vins"] == [GOOD]
+
+
+def test_parse_rejects_bad_schema():
+    assert parse_direct_request(_text('{"vins": "not a list"}')) is None
+    assert parse_direct_request(_text('{"vins": [], "concurrency": "high"}')) is None
+
+
+def test_mixed_good_and_bad_vins(monkeypatch):
+    async def fetch(url, agent_token=None):
+        return f"VIN: {url[-17:]} Make: Honda Model: Fit Year: 2013"
+
+    monkeypatch.setattr(agent, "fetch_report_body", fetch)
+    monkeypatch.setattr(agent, "extract_vehicle_fields", lambda raw: {"raw": raw})
+
+    request = parse_direct_request(_text(f'{{"vins": ["{GOOD}", 123, null, "", " {GOOD.lower()} ", "SHORT"]}}'))
+    result = asyncio.run(request.run())
+
+    by_status = {}
+    for r in result["results"]:
+        by_status.setdefault(r["status"], []).append(r["vin"])
+    assert by_status["ok"] == [GOOD]  # deduplicated after normalizing
+    assert sorted(map(repr, by_status["error"])) == sorted(map(repr, [123, None, "", "SHORT"]))
+    assert (result["ok"], result["errors"]) == (1, 4)
@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+
+import agent
+from report_cache import ReportCache, cache_key, url_vin
+
+VIN = "JHMGE8H58DC009182"
+URL = f"https://proxy402.com/rZ0Or4VKA9?vin={VIN}"
+REPORT = f"<table><tr><th>VIN</th><td>{VIN}</td></tr><tr><th>Make:</th><td>Honda</td></tr></table>"
+
+
+def test_cache_key_normalizes_the_same_report():
+    assert cache_key(URL) == cache_key(f" HTTPS://Proxy402.com/rZ0Or4VKA9?vin={VIN.lower()}#top ")
+    assert cache_key("https://a.example/r?vin=X&b=2&a=1") == cache_key("https://a.example/r?a=1&b=2&vin=x")
+
+
+@pytest.mark.parametrize("other", [
+    f"http://proxy402.com/rZ0Or4VKA9?vin={VIN}",
+    f"https://localhost:9000/rZ0Or4VKA9?vin={VIN}",
+    f"https://proxy402.com/other?vin={VIN}",
+])
+def test_cache_key_keeps_scheme_host_and_path(other):
+    assert cache_key(other) != cache_key(URL)
+
+
+def test_url_vin():
+    assert url_vin(f"https://x.example/r?VIN= {VIN.lower()} ") == VIN
+    assert url_vin("https://x.example/r?vin=") is None
+    assert url_vin("https://x.example/r") is None
+
+
+def test_ttl_and_disk_tier(tmp_path):
+    db = str(tmp_path / "reports.db")
+    cache = ReportCache(ttl=60, db_path=db)
+    cache.put("k", REPORT)
+    cache.put_fields(REPORT, {"vin": VIN})
+    assert cache.get("k").body == REPORT
+
+    restarted = ReportCache(ttl=60, db_path=db)
+    assert restarted.get("k").body == REPORT
+    assert restarted.get_fields(REPORT) == {"vin": VIN}
+
+    expired = ReportCache(ttl=1e-9, db_path=db)
+    assert expired.get("k") is None
+
+
+def test_lru_is_bounded_by_bytes():
+    cache = ReportCache(ttl=60, max_bytes=10)
+    cache.put("a", "12345")
+    cache.put("b", "12345")
+    cache.put("c", "12345")
+    assert cache.get("a") is None and cache.get("c") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+class FakeResponse:
+    status_code = 402
+    is_success = False
+    text = "payment required"
+
+
+class FakeClient:
+    async def get(self, url, timeout=None):
+        return FakeResponse()
+
+
+@pytest.fixture
+def fresh_cache(monkeypatch):
+    cache = ReportCache(ttl=60)
+    monkeypatch.setattr(agent, "report_cache", cache)
+    monkeypatch.setattr(agent, "get_async_client", lambda: FakeClient())
+    return cache
+
+
+@pytest.mark.parametrize("body", [
+    "Payment failed: insufficient funds",
+    "I'm sorry, I could not complete the payment.",
+    REPORT.replace(VIN, "1HGCM82633A004352"),  # a report, but not the one asked for
+])
+def test_paid_non_report_bodies_are_not_cached(fresh_cache, monkeypatch, body):
+    async def pay(url, agent_token=None):
+        return body
+
+    monkeypatch.setattr(agent, "_pay402_and_fetch_async", pay)
+    assert asyncio.run(agent.fetch_report_body(URL)) == body
+    assert fresh_cache.get(cache_key(URL)) is None
+
+
+def test_paid_report_is_cached_with_its_fields(fresh_cache, monkeypatch):
+    calls = []
+
+    async def pay(url, agent_token=None):
+        calls.append(url)
+        return REPORT
+
+    monkeypatch.setattr(agent, "_pay402_and_fetch_async", pay)
+    assert asyncio.run(agent.fetch_report_body(URL)) == REPORT
+    assert asyncio.run(agent.fetch_report_body(URL.replace("proxy402", "PROXY402").replace(VIN, VIN.lower()))) == REPORT
+    assert len(calls) == 1
+    assert fresh_cache.get_fields(REPORT)["vin"] == VIN
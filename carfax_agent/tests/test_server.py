@@ -0,0 +1,21 @@
+import pytest
+from starlette.testclient import TestClient
+
+import server
+
+
+def card_url(monkeypatch, **env):
+    for name in ("CARFAX_HOST", "CARFAX_PORT", "CARFAX_PUBLIC_URL"):
+        monkeypatch.delenv(name, raising=False)
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    return TestClient(server.create_app()).get("/.well-known/agent.json").json()["url"]
+
+
+@pytest.mark.parametrize("env, url", [
+    ({}, "http://localhost:10004/"),
+    ({"CARFAX_HOST": "0.0.0.0", "CARFAX_PORT": "9000"}, "http://localhost:9000/"),
+    ({"CARFAX_HOST": "0.0.0.0", "CARFAX_PUBLIC_URL": "https://carfax.example/"}, "https://carfax.example/"),
+])
+def test_agent_card_url(monkeypatch, env, url):
+    assert card_url(monkeypatch, **env) == url
@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+import agent
+from report_cache import ReportCache
+from single_flight import SingleFlight
+
+URL = "https://proxy402.com/rZ0Or4VKA9?vin=JHMGE8H58DC009182"
+
+
+def test_concurrent_calls_share_one_flight():
+    flight = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "body"
+
+    async def run():
+        return await asyncio.gather(*(flight.do("k", work) for _ in range(5)))
+
+    assert asyncio.run(run()) == ["body"] * 5
+    assert len(calls) == 1 and flight.stats()["shared"] == 4 and flight.in_flight() == 0
+
+
+def test_cancelling_the_last_waiter_cancels_the_work():
+    flight = SingleFlight()
+    started = []
+
+    async def work():
+        started.append(1)
+        await asyncio.sleep(5)
+
+    async def run():
+        waiter = asyncio.ensure_future(flight.do("k", work))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        await asyncio.sleep(0)
+        return flight.in_flight()
+
+    assert asyncio.run(run()) == 0 and started == [1]
+
+
+@pytest.fixture
+def paid_fetches(monkeypatch):
+    """Every fetch is a 402 whose payment takes a moment; records the payer of each payment."""
+    class Response:
+        status_code, is_success, text = 402, False, ""
+
+    class Client:
+        async def get(self, url, timeout=None):
+            return Response()
+
+    payers = []
+
+    async def pay(url, agent_token=None):
+        payers.append(agent_token)
+        await asyncio.sleep(0.01)
+        return "not a report, so nothing is cached"
+
+    monkeypatch.setattr(agent, "report_cache", ReportCache(ttl=60))
+    monkeypatch.setattr(agent, "get_async_client", lambda: Client())
+    monkeypatch.setattr(agent, "_pay402_and_fetch_async", pay)
+    return payers
+
+
+def test_same_wallet_shares_a_fetch(paid_fetches):
+    async def run():
+        await asyncio.gather(*(agent.fetch_report_body(URL, "token-a") for _ in range(3)))
+
+    asyncio.run(run())
+    assert paid_fetches == ["token-a"]
+
+
+def test_other_wallet_pays_for_its_own_fetch(paid_fetches):
+    async def run():
+        return await asyncio.gather(agent.fetch_report_body(URL, "token-a"), agent.fetch_report_body(URL, "token-b"))
+
+    asyncio.run(run())
+    assert sorted(paid_fetches) == ["token-a", "token-b"]
@@ -0,0 +1,67 @@
+import pytest
+
+from vehicle_extractor import HOLD, VehicleFieldExtractor, extract_fields
+
+PAGE = (
+    "<html><head><script>var VIN = 'AAAAAAAAAAAAAAAAA'; // 1999</script></head><body>"
+    "<table><tr><th>VIN</th><td>JHMGE8H58DC009182</td></tr>"
+    "<tr><th>Make:</th><td>Honda</td></tr><tr><th>Model:</th><td>Fit</td></tr>"
+    "<tr><th>Year</th><td>2013</td></tr><tr><th>Odometer</th><td>45,123 miles</td></tr></table>"
+    "</body></html>"
+)
+EXPECTED = {"vin": "JHMGE8H58DC009182", "make": "Honda", "model": "Fit", "year": "2013", "mileage": "45,123"}
+
+
+def _fields(result):
+    return {k: v for k, v in result.items() if k != "raw_len"}
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("VIN: JHMGE8H58DC009182 Make: Honda Model: Fit 2013 45,000 miles",
+     {"vin": "JHMGE8H58DC009182", "make": "Honda", "model": "Fit", "year": "2013", "mileage": "45,000"}),
+    ("Car Make: Honda Model: Fit Year: 2013",
+     {"vin": None, "make": "Honda", "model": "Fit", "year": "2013", "mileage": None}),
+    ("Vehicle Make: Honda Model: Fit",
+     {"vin": None, "make": "Honda", "model": "Fit", "year": None, "mileage": None}),
+    # No label: the first pair of words, in any case, is the best guess.
+    ("Listing: Honda Fit, 2013, 45,000 mi",
+     {"vin": None, "make": "Honda", "model": None, "year": "2013", "mileage": "45,000"}),
+    ("listing: honda fit, 2013, 45,000 mi",
+     {"vin": None, "make": "honda", "model": None, "year": "2013", "mileage": "45,000"}),
+    ("nothing to see here", {"vin": None, "make": "nothing", "model": None, "year": None, "mileage": None}),
+    # Lowercase labels.
+    ("vin: jhmge8h58dc009182 make: honda model: fit year: 2013 odometer: 45,123 miles",
+     {"vin": "jhmge8h58dc009182", "make": "honda", "model": "fit", "year": "2013", "mileage": "45,123"}),
+    ("n/a", {"vin": None, "make": None, "model": None, "year": None, "mileage": None}),
+])
+def test_fields(text, expected):
+    result = extract_fields(text)
+    assert _fields(result) == expected
+    assert result["raw_len"] == len(text)
+
+
+def test_html_page_skips_script():
+    assert _fields(extract_fields(PAGE)) == EXPECTED
+
+
+def test_bytes_match_str():
+    assert _fields(extract_fields(PAGE.encode())) == EXPECTED
+    assert _fields(extract_fields(memoryview(PAGE.encode()))) == EXPECTED
+
+
+@pytest.mark.parametrize("size", [1, 7, 64, HOLD + 3])
+def test_chunked_feed_matches_one_shot(size):
+    page = "x" * (2 * HOLD) + PAGE
+    extractor = VehicleFieldExtractor()
+    for i in range(0, len(page), size):
+        extractor.feed(page[i:i + size])
+    result = extractor.result()
+    assert _fields(result) == EXPECTED
+    assert result["raw_len"] == len(page)
+
+
+def test_mixed_chunk_types_rejected():
+    extractor = VehicleFieldExtractor()
+    extractor.feed("VIN: ")
+    with pytest.raises(TypeError):
+        extractor.feed(b"JHMGE8H58DC009182")
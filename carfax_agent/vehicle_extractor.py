@@ -0,0 +1,157 @@
+import re
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple, Union
+
+Text = Union[str, bytes, bytearray, memoryview]
+
+FIELDS = ("vin", "make", "model", "year", "mileage")
+
+# Separator between a label and its value: colons, whitespace, &nbsp; and a few
+# short tags, so "<th>Make</th><td>Honda</td>" matches like "Make: Honda".
+_SEP = r"(?:[:\s]|&nbsp;|<[^<>]{0,64}>){0,8}"
+
+# Free-text values stop before the next label, year or mileage so a single
+# pass still sees them ("Make: Honda Model: Fit 2013 45,000 miles").
+_VALUE = (
+    r"(?:(?!\s(?:(?:VIN|Make|Model|Year|Mileage)\b|(?:19|20)\d\d\b|\d[\d,]*\s*(?:miles|mi)\b))"
+    r"[A-Za-z0-9\- ]){2,30}"
+)
+
+# Script/style/comment blocks (after their leading "<") are consumed whole so
+# their contents never produce fields. An unterminated block runs to the end of
+# the buffer, which makes the incremental scanner carry it over to the next chunk.
+_SKIP = (
+    r"(?P<skip>(?i:script\b.*?(?:</script\s*>|\Z)|style\b.*?(?:</style\s*>|\Z))"
+    r"|!--.*?(?:-->|\Z))"
+)
+
+# Every branch starts with one consumed "lead" character. The combined pattern
+# therefore begins with a plain character class, which lets the regex engine
+# skip non-candidate positions in C instead of trying each branch everywhere.
+# (name, lead characters, pattern after the lead, value includes the lead)
+_BRANCHES = (
+    ("vin", "Vv", rf"(?i:IN){_SEP}(?P<vin>(?i:[A-HJ-NPR-Z0-9]){{11,17}})\b", False),
+    ("make", "Mm", rf"(?i:AKE){_SEP}(?P<make>(?i:{_VALUE}))\b", False),
+    ("model", "Mm", rf"(?i:ODEL){_SEP}(?P<model>(?i:{_VALUE}))\b", False),
+    ("mileage", "0-9", r"(?P<mileage>\d{0,2}(?:,\d{3})*)\s*(?i:miles|mi)\b", True),
+    ("year", "12", r"(?P<year>(?<=2)0\d\d|(?<=1)9\d\d)\b", True),
+    # Fallback for pages without a "Make" label: first pair of words, in any case
+    # (like the old re.I grab). The second word is only looked at, so in
+    # "Car Make: Honda" the label is still scanned.
+    ("make_guess", "A-Za-z", r"(?P<make_guess>(?i:[a-z]+))(?=\s+(?i:[a-z]{2,})\b)", True),
+)
+_LEAD_IN_VALUE = {name for name, _, _, lead_in_value in _BRANCHES if lead_in_value}
+
+# Word boundary before the lead character (the lead itself is already consumed).
+_BOUNDARY = r"(?<!\w.)"
+
+# Longest non-skip match is well under this, so a match that ends before the
+# last HOLD characters of a chunk cannot change when more data arrives.
+HOLD = 1024
+
+
+@lru_cache(maxsize=None)
+def _scanner(wanted: Tuple[str, ...], binary: bool) -> "re.Pattern":
+    """Combined pattern for the fields still missing (compiled once per subset)."""
+    chosen = [b for b in _BRANCHES if b[0] in wanted]
+    leads = "<" + "".join(dict.fromkeys(lead for _, lead, _, _ in chosen))
+    branches = "|".join(f"(?<=[{lead}]){rest}" for _, lead, rest, _ in chosen)
+    source = f"[{leads}](?:(?<=<){_SKIP}|{_BOUNDARY}(?:{branches}))"
+    return re.compile(source.encode("ascii") if binary else source, re.S)
+
+
+def _as_scannable(chunk: Text) -> Union[str, bytes, memoryview]:
+    if isinstance(chunk, memoryview) and (chunk.format != "B" or chunk.ndim != 1):
+        return chunk.cast("B")
+    return chunk
+
+
+class VehicleFieldExtractor:
+    """Single-pass, incremental extractor for VIN/make/model/year/mileage.
+
+    ``feed()`` accepts ``str`` or bytes-like chunks (``bytes``, ``bytearray``,
+    ``memoryview``; scanned in place, not decoded) and ``result()`` returns the
+    same dict shape as ``extract_vehicle_fields``. Scanning stops as soon as
+    every field has been found.
+    """
+
+    def __init__(self):
+        self._found: Dict[str, str] = {}
+        self._carry: Optional[Union[str, bytes]] = None
+        self._carry_start = 0
+        self._binary: Optional[bool] = None
+        self._length = 0
+
+    @property
+    def done(self) -> bool:
+        return all(f in self._found for f in FIELDS)
+
+    def _wanted(self) -> Tuple[str, ...]:
+        wanted = tuple(b[0] for b in _BRANCHES if b[0] not in self._found)
+        if "make" in self._found:
+            wanted = tuple(w for w in wanted if w != "make_guess")
+        return wanted
+
+    def _scan(self, buf, start: int, final: bool) -> None:
+        limit = len(buf) if final else len(buf) - HOLD
+        pos = start
+        keep = None
+        while not self.done:
+            m = _scanner(self._wanted(), self._binary).search(buf, pos)
+            if m is None:
+                break
+            if not final and m.end() > limit:
+                keep = m.start()
+                break
+            name = m.lastgroup
+            if name != "skip" and name not in self._found:
+                value = buf[m.start():m.end(name)] if name in _LEAD_IN_VALUE else m.group(name)
+                if self._binary:
+                    value = bytes(value).decode("latin-1")
+                self._found[name] = value.strip()
+            pos = m.end()
+        if final or self.done:
+            self._carry = None
+            return
+        if keep is None:
+            keep = max(pos, limit)
+        # Keep one character of left context so \b still works at the seam.
+        self._carry_start = 1 if keep > 0 else 0
+        tail = buf[keep - self._carry_start:]
+        self._carry = bytes(tail) if self._binary else tail
+
+    def feed(self, chunk: Text, final: bool = False) -> None:
+        chunk = _as_scannable(chunk)
+        binary = not isinstance(chunk, str)
+        if self._binary is None:
+            self._binary = binary
+        elif self._binary != binary:
+            raise TypeError("cannot mix str and bytes chunks")
+        self._length += len(chunk)
+        if self.done:
+            return
+        if self._carry:
+            self._scan(self._carry + chunk, self._carry_start, final)
+        else:
+            self._scan(chunk, 0, final)
+
+    def result(self) -> Dict[str, Any]:
+        if self._carry:
+            carry, self._carry = self._carry, None
+            self._scan(carry, self._carry_start, True)
+        found = self._found
+        return {
+            "vin": found.get("vin"),
+            "make": found.get("make") or found.get("make_guess"),
+            "model": found.get("model"),
+            "year": found.get("year"),
+            "mileage": found.get("mileage"),
+            "raw_len": self._length,
+        }
+
+
+def extract_fields(raw: Text) -> Dict[str, Any]:
+    """One-shot extraction over a complete page."""
+    extractor = VehicleFieldExtractor()
+    extractor.feed(raw, final=True)
+    return extractor.result()
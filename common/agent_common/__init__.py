@@ -0,0 +1,8 @@
+# Modules shared by the host, Carfax and PayStabl agents.
+from . import metrics, tracing
+
+
+def set_service(name: str) -> None:
+    """Name this process's agent in its metrics labels and trace spans."""
+    metrics.registry.agent = name
+    tracing.SERVICE = name
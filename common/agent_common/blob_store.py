@@ -0,0 +1,162 @@
+# Content-addressed store for large report bodies, shared by the local agents.
+"""Large bodies are written once under ``A2A_BLOB_DIR`` (keyed by sha256) and
+passed between agents as ``file://`` URIs in ``FileWithUri`` parts instead of
+inline text. Readers open the file only when they actually need the bytes.
+
+Nothing else ever deletes a blob, so each agent server runs :meth:`BlobStore.gc_loop`
+from its lifespan: blobs unused for ``A2A_BLOB_TTL`` seconds are removed, then the
+least recently used ones until the store fits in ``A2A_BLOB_MAX_BYTES``.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Tuple, Union
+from urllib.parse import unquote, urlparse
+
+A2A_BLOB_DIR = os.getenv("A2A_BLOB_DIR", os.path.join(os.path.expanduser("~"), ".cache", "a2a-blobs"))
+# Bodies smaller than this stay inline.
+A2A_BLOB_MIN_BYTES = int(os.getenv("A2A_BLOB_MIN_BYTES", str(32 * 1024)))
+# Garbage collection; 0 turns the age or the size limit off.
+A2A_BLOB_TTL = float(os.getenv("A2A_BLOB_TTL", str(7 * 24 * 3600)))
+A2A_BLOB_MAX_BYTES = int(os.getenv("A2A_BLOB_MAX_BYTES", str(1024 * 1024 * 1024)))
+A2A_BLOB_GC_INTERVAL = float(os.getenv("A2A_BLOB_GC_INTERVAL", "3600"))
+
+logger = logging.getLogger(__name__)
+
+_DIGEST_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+@dataclass(frozen=True)
+class BlobRef:
+    uri: str
+    digest: str
+    size: int
+    mime_type: str
+
+    def describe(self) -> str:
+        """Short text stand-in for the body, safe to put in an LLM context."""
+        return f"{self.uri} ({self.mime_type}, {self.size} bytes)"
+
+
+class BlobStore:
+    def __init__(self, root: str = A2A_BLOB_DIR, min_bytes: int = A2A_BLOB_MIN_BYTES):
+        self.root = os.path.abspath(root)
+        self.min_bytes = min_bytes
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest)
+
+    def uri_for(self, digest: str) -> str:
+        return "file://" + self._path(digest)
+
+    def put(self, data: Union[str, bytes], mime_type: str = "text/html") -> BlobRef:
+        raw = data.encode("utf-8") if isinstance(data, str) else bytes(data)
+        digest = hashlib.sha256(raw).hexdigest()
+        path = self._path(digest)
+        try:
+            os.utime(path)  # already stored: mark it used so GC keeps it
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, "wb") as f:
+                f.write(raw)
+            os.replace(tmp, path)  # atomic: concurrent writers of the same digest are harmless
+        return BlobRef(self.uri_for(digest), digest, len(raw), mime_type)
+
+    def spill(self, body: str, mime_type: str = "text/html") -> str:
+        """Return `body` itself if small, else the URI of its stored copy."""
+        if len(body) < self.min_bytes:
+            return body
+        return self.put(body, mime_type).uri
+
+    def path_of(self, uri: str) -> Optional[str]:
+        """Local path for a blob URI of this store, or None if `uri` is not one."""
+        if not isinstance(uri, str) or not uri.startswith("file://"):
+            return None
+        path = os.path.abspath(unquote(urlparse(uri.strip()).path))
+        digest = os.path.basename(path)
+        if not _DIGEST_RE.match(digest) or os.path.dirname(os.path.dirname(path)) != self.root:
+            return None
+        return path
+
+    def is_blob_uri(self, value: str) -> bool:
+        return self.path_of(value) is not None
+
+    def iter_chunks(self, uri: str, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        path = self.path_of(uri)
+        if path is None:
+            raise ValueError(f"not a blob URI: {uri!r}")
+        with open(path, "rb") as f:
+            while chunk := f.read(chunk_size):
+                yield chunk
+
+    def read_text(self, uri: str, offset: int = 0, length: Optional[int] = None) -> str:
+        path = self.path_of(uri)
+        if path is None:
+            raise ValueError(f"not a blob URI: {uri!r}")
+        with open(path, "rb") as f:
+            f.seek(offset)
+            data = f.read() if length is None else f.read(length)
+        return data.decode("utf-8", errors="replace")
+
+    def resolve(self, value: str) -> str:
+        """Materialize `value` if it is a blob URI, otherwise return it unchanged."""
+        return self.read_text(value) if self.is_blob_uri(value) else value
+
+    def _blobs(self) -> List[Tuple[float, int, str]]:
+        """(mtime, size, path) of every stored blob, oldest first."""
+        blobs = []
+        if not os.path.isdir(self.root):
+            return blobs
+        for entry in os.scandir(self.root):
+            if not entry.is_dir():
+                continue
+            for blob in os.scandir(entry.path):
+                if not _DIGEST_RE.match(blob.name):
+                    continue
+                try:
+                    st = blob.stat()
+                except FileNotFoundError:  # removed by another worker's GC
+                    continue
+                blobs.append((st.st_mtime, st.st_size, blob.path))
+        blobs.sort()
+        return blobs
+
+    def gc(self, ttl: float = A2A_BLOB_TTL, max_bytes: int = A2A_BLOB_MAX_BYTES) -> int:
+        """Remove blobs older than `ttl`, then the oldest until at most `max_bytes` remain.
+
+        Returns the number removed. A blob is aged from when it was last stored.
+        """
+        blobs = self._blobs()
+        total = sum(size for _, size, _ in blobs)
+        cutoff = time.time() - ttl if ttl > 0 else None
+        removed = 0
+        for mtime, size, path in blobs:
+            expired = cutoff is not None and mtime < cutoff
+            if not expired and (max_bytes <= 0 or total <= max_bytes):
+                break
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+            total -= size
+        return removed
+
+    async def gc_loop(self, interval: float = A2A_BLOB_GC_INTERVAL) -> None:
+        while True:
+            try:
+                removed = await asyncio.to_thread(self.gc)
+                if removed:
+                    logger.info("Removed %d old blobs from %s", removed, self.root)
+            except OSError as e:
+                logger.warning("Blob GC failed: %s", e)
+            await asyncio.sleep(interval)
+
+
+blob_store = BlobStore()
@@ -0,0 +1,136 @@
+# Request deadlines carried across A2A hops, so downstream work stops when the caller gives up.
+"""The host gives each request a budget. Every A2A message it and the agents
+after it send carries the budget still left, as ``timeout_ms`` in the message
+``metadata``. It is sent relative, like ``grpc-timeout``, so the machines'
+clocks need not agree. Each receiver turns it back into a local deadline.
+
+Under a deadline:
+
+* ``timeout(default)`` is the HTTP/MCP/A2A timeout to use: the layer's usual
+  value, cut to the time left;
+* ``enforce()`` cancels the enclosed work when the deadline passes, raising
+  ``DeadlineExceeded``;
+* ``before_model`` (an ADK callback) caps the model call's HTTP timeout, and
+  refuses to start a model call after the deadline.
+
+Each hop keeps ``A2A_DEADLINE_MARGIN`` seconds of its budget for the reply to
+travel back. Without a deadline, everything uses its usual timeouts.
+"""
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Dict, Iterator, Optional
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models import LlmRequest
+from google.genai import types
+
+A2A_DEADLINE_MARGIN = float(os.getenv("A2A_DEADLINE_MARGIN", "0.5"))
+DEADLINE_KEY = "timeout_ms"
+
+_deadline: ContextVar[Optional[float]] = ContextVar("a2a_deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """The request's deadline passed; the work was abandoned (or never started)."""
+
+
+def current() -> Optional[float]:
+    """The deadline as a `time.monotonic()` value, or None."""
+    return _deadline.get()
+
+
+def remaining() -> Optional[float]:
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def check(what: str = "request") -> None:
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded(f"{what}: deadline exceeded by {-left:.3f}s")
+
+
+def timeout(default: float, what: str = "request") -> float:
+    """`default`, cut to the time left; raises DeadlineExceeded when none is left."""
+    check(what)
+    left = remaining()
+    return default if left is None else min(default, left)
+
+
+@contextmanager
+def scope(budget: Optional[float]) -> Iterator[Optional[float]]:
+    """Run the block under a deadline `budget` seconds from now (never later than the current one)."""
+    deadline = _deadline.get()
+    if budget is not None:
+        new = time.monotonic() + budget
+        deadline = new if deadline is None else min(deadline, new)
+    token = _deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _deadline.reset(token)
+
+
+@asynccontextmanager
+async def enforce(what: str = "request") -> AsyncIterator[None]:
+    """Cancel the block when the current deadline passes; it then raises DeadlineExceeded."""
+    left = remaining()
+    if left is None:
+        yield
+        return
+    check(what)
+    task = asyncio.current_task()
+    fired = False
+
+    def expire() -> None:
+        nonlocal fired
+        fired = True
+        task.cancel()
+
+    handle = asyncio.get_running_loop().call_later(left, expire)
+    try:
+        yield
+    except asyncio.CancelledError:
+        if not fired:
+            raise
+        if hasattr(task, "uncancel"):  # Python 3.11+: this cancellation is handled here
+            task.uncancel()
+        raise DeadlineExceeded(f"{what}: deadline exceeded") from None
+    finally:
+        handle.cancel()
+
+
+def extract(metadata: Optional[Dict[str, Any]]) -> Optional[float]:
+    """Budget in seconds carried in A2A message metadata, if any."""
+    value = (metadata or {}).get(DEADLINE_KEY)
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return max(0.0, value / 1000)
+    return None
+
+
+def inject(metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Return ``metadata`` with the time left (minus the reply margin) added, if there is a deadline."""
+    metadata = dict(metadata or {})
+    left = remaining()
+    if left is not None:
+        metadata[DEADLINE_KEY] = max(0, int((left - A2A_DEADLINE_MARGIN) * 1000))
+    return metadata
+
+
+def before_model(callback_context: CallbackContext, llm_request: LlmRequest) -> None:
+    """before_model_callback: no model call after the deadline, and none outliving it."""
+    left = remaining()
+    if left is None:
+        return None
+    check("model call")
+    config = llm_request.config
+    if config is not None:
+        http_options = config.http_options or types.HttpOptions()
+        limit = int(left * 1000)
+        if http_options.timeout is None or http_options.timeout > limit:
+            http_options.timeout = max(1, limit)
+        config.http_options = http_options
+    return None
@@ -0,0 +1,66 @@
+"""One pooled ``httpx.AsyncClient`` per process, shared by all of an agent's outbound calls.
+
+Each agent names its settings with :func:`configure` (e.g. ``configure("CARFAX")``)
+before the first request; the pool is then sized from ``<PREFIX>_HTTP_MAX_CONNECTIONS``,
+``<PREFIX>_HTTP_MAX_KEEPALIVE``, ``<PREFIX>_HTTP_KEEPALIVE_EXPIRY``,
+``<PREFIX>_HTTP_TIMEOUT``, ``<PREFIX>_HTTP_CONNECT_TIMEOUT`` and ``<PREFIX>_HTTP2``.
+"""
+import os
+from typing import Any, Dict, Optional
+
+import httpx
+
+_settings: Dict[str, Any] = {
+    "max_connections": 100,
+    "max_keepalive": 20,
+    "keepalive_expiry": 30.0,
+    "timeout": 30.0,
+    "connect_timeout": 10.0,
+    "http2": False,
+}
+_client: Optional[httpx.AsyncClient] = None
+
+
+def configure(env_prefix: str, *, timeout: float = 30.0, connect_timeout: float = 10.0) -> None:
+    """Read this agent's pool settings from ``<env_prefix>_HTTP_*``; the keywords are the defaults."""
+    _settings.update(
+        max_connections=int(os.getenv(f"{env_prefix}_HTTP_MAX_CONNECTIONS", "100")),
+        max_keepalive=int(os.getenv(f"{env_prefix}_HTTP_MAX_KEEPALIVE", "20")),
+        keepalive_expiry=float(os.getenv(f"{env_prefix}_HTTP_KEEPALIVE_EXPIRY", "30")),
+        timeout=float(os.getenv(f"{env_prefix}_HTTP_TIMEOUT", str(timeout))),
+        connect_timeout=float(os.getenv(f"{env_prefix}_HTTP_CONNECT_TIMEOUT", str(connect_timeout))),
+        http2=os.getenv(f"{env_prefix}_HTTP2", "").lower() in ("1", "true", "yes"),
+    )
+
+
+def _http2_available() -> bool:
+    """HTTP/2 needs the optional `h2` package (`pip install httpx[http2]`)."""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Return the process-wide pooled client, creating it on first use."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=_settings["max_connections"],
+                max_keepalive_connections=_settings["max_keepalive"],
+                keepalive_expiry=_settings["keepalive_expiry"],
+            ),
+            timeout=httpx.Timeout(_settings["timeout"], connect=_settings["connect_timeout"]),
+            http2=_settings["http2"] and _http2_available(),
+        )
+    return _client
+
+
+async def aclose_async_client() -> None:
+    """Close the shared client; call from the server lifespan on shutdown."""
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
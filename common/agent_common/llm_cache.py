@@ -0,0 +1,158 @@
+# Exact-match cache of model responses, so a repeated turn skips the model call.
+"""The key is a sha256 over everything the model sees: model name, system
+instruction, tool declarations and the (already compacted) contents,
+including tool results. Function-call ids are left out; ADK generates them
+per call.
+
+Only the model's answer is cached. Tool calls it asks for still run, so
+fetches and payments happen as usual. Entries expire after ``LLM_CACHE_TTL``
+seconds. The memory tier is an LRU of ``LLM_CACHE_MAX_ENTRIES``; set
+``LLM_CACHE_DB`` to also keep entries in SQLite across restarts and workers.
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models import LlmRequest, LlmResponse
+
+from .metrics import cache_requests_total
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "600"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024"))
+LLM_CACHE_DB = os.getenv("LLM_CACHE_DB", "")  # empty -> memory only
+# Pending keys for model calls in flight, at most this many (calls that raise never store).
+_MAX_PENDING = 4096
+
+
+def _strip_ids(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {
+            k: _strip_ids(v)
+            for k, v in value.items()
+            if not (k == "id" and ("name" in value and ("args" in value or "response" in value)))
+        }
+    if isinstance(value, list):
+        return [_strip_ids(v) for v in value]
+    return value
+
+
+def request_key(llm_request: LlmRequest) -> str:
+    config = llm_request.config
+    payload = {
+        "model": llm_request.model,
+        "system_instruction": config.system_instruction if config else None,
+        "tools": [t.model_dump(mode="json", exclude_none=True) for t in (config.tools or [])] if config else [],
+        "contents": _strip_ids([c.model_dump(mode="json", exclude_none=True) for c in llm_request.contents]),
+    }
+    raw = json.dumps(payload, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8", "surrogatepass")).hexdigest()
+
+
+class LLMResponseCache:
+    """TTL + LRU cache of `LlmResponse`s, used as a before/after model callback pair."""
+
+    def __init__(self, ttl: float = LLM_CACHE_TTL, max_entries: int = LLM_CACHE_MAX_ENTRIES,
+                 db_path: Optional[str] = None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._pending: Dict[str, str] = {}
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self._db: Optional[sqlite3.Connection] = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_responses ("
+                " key TEXT PRIMARY KEY, response TEXT NOT NULL, stored_at REAL NOT NULL)"
+            )
+
+    def _fresh(self, stored_at: float) -> bool:
+        return self.ttl <= 0 or (time.time() - stored_at) < self.ttl
+
+    def _remember(self, key: str, response: str, stored_at: float) -> None:
+        self._entries[key] = (response, stored_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and self._db is not None:
+                row = self._db.execute(
+                    "SELECT response, stored_at FROM llm_responses WHERE key = ?", (key,)
+                ).fetchone()
+                entry = tuple(row) if row else None
+            if entry is not None and not self._fresh(entry[1]):
+                self.invalidate(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                cache_requests_total.inc(cache="llm", result="miss")
+                return None
+            self._remember(key, *entry)
+            self.hits += 1
+            cache_requests_total.inc(cache="llm", result="hit")
+            return entry[0]
+
+    def put(self, key: str, response: str) -> None:
+        with self._lock:
+            stored_at = time.time()
+            self._remember(key, response, stored_at)
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO llm_responses (key, response, stored_at) VALUES (?, ?, ?)",
+                        (key, response, stored_at),
+                    )
+                except sqlite3.Error as e:
+                    logger.warning("llm cache: failed to persist %s: %s", key, e)
+
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+            if self._db is not None:
+                self._db.execute("DELETE FROM llm_responses WHERE key = ?", (key,))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+    # ---- ADK callbacks -----------------------------------------------------
+
+    def lookup(self, callback_context: CallbackContext, llm_request: LlmRequest) -> Optional[LlmResponse]:
+        """before_model_callback: answer from the cache, or remember the key for `store`."""
+        key = request_key(llm_request)
+        cached = self.get(key)
+        if cached is not None:
+            logger.debug("llm cache hit %s", key[:12])
+            return LlmResponse.model_validate_json(cached)
+        if len(self._pending) > _MAX_PENDING:
+            self._pending.clear()
+        self._pending[callback_context.invocation_id] = key
+        return None
+
+    def store(self, callback_context: CallbackContext, llm_response: LlmResponse) -> None:
+        """after_model_callback: cache complete, successful responses."""
+        if llm_response.partial:
+            return None
+        key = self._pending.pop(callback_context.invocation_id, None)
+        if key is None or llm_response.error_code or not llm_response.content:
+            return None
+        self.put(key, llm_response.model_dump_json(exclude_none=True, exclude={"usage_metadata"}))
+        return None
+
+
+llm_cache = LLMResponseCache(db_path=LLM_CACHE_DB or None)
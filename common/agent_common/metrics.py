@@ -0,0 +1,248 @@
+# In-process latency histograms and counters, exposed in Prometheus text format.
+"""Where does a request spend its time: model, network or payment?
+
+Metrics are per process; with several workers each one exposes its own. The
+Carfax and PayStabl servers mount ``GET /metrics`` on their own app
+(``add_metrics_route``); ``adk web`` owns the host's app, so the host runs a
+separate listener (``start_metrics_server``).
+
+* ``llm_turn_seconds``        - one model call (ADK before/after model callbacks)
+* ``tool_call_seconds``       - one tool call, by tool (ADK before/after tool callbacks)
+* ``a2a_send_seconds``        - A2A round-trip to another agent
+* ``stage_seconds``           - internal stages (fetch, payment, extraction, direct dispatch)
+* ``cache_requests_total``    - cache lookups by cache and hit/miss
+* gauges registered with ``gauge()`` - queue depths / in-flight work, read at scrape time
+
+Every series carries an ``agent`` label (see ``agent_common.set_service()``).
+"""
+import bisect
+import functools
+import inspect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _fmt(key: LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ""
+    body = ",".join('{}="{}"'.format(k, v.replace("\\", "\\\\").replace('"', '\\"')) for k, v in pairs)
+    return "{" + body + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str):
+        self.name, self.help = name, help
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = _labels(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self, const: LabelKey = ()) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        lines += [f"{self.name}{_fmt(const + k)} {v}" for k, v in values]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name, self.help, self.buckets = name, help, tuple(buckets)
+        self._series: Dict[LabelKey, List[float]] = {}  # bucket counts..., +Inf count, sum
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = _labels(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            series[bisect.bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, **labels: Any) -> Iterator[Dict[str, Any]]:
+        """Observe the block's duration; the yielded dict can add labels (e.g. status)."""
+        extra: Dict[str, Any] = {}
+        start = time.perf_counter()
+        try:
+            yield extra
+        except BaseException:
+            extra.setdefault("status", "error")
+            raise
+        finally:
+            extra.setdefault("status", "ok")
+            self.observe(time.perf_counter() - start, **{**labels, **extra})
+
+    def render(self, const: LabelKey = ()) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = sorted((const + key, list(series)) for key, series in self._series.items())
+        for key, series in snapshot:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_fmt(key, (('le', le),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_fmt(key)} {series[-1]}")
+            lines.append(f"{self.name}_count{_fmt(key)} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """Value read from `fn` at scrape time."""
+
+    def __init__(self, name: str, help: str, fn: Callable[[], float]):
+        self.name, self.help, self.fn = name, help, fn
+
+    def render(self, const: LabelKey = ()) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name}{_fmt(const)} {float(self.fn())}"]
+
+
+class Registry:
+    def __init__(self, agent: str):
+        self.agent = agent
+        self._metrics: Dict[str, Any] = {}
+
+    def _get(self, cls, name: str, help: str, **kwargs):
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = cls(name, help, **kwargs)
+        return metric
+
+    def counter(self, name: str, help: str) -> Counter:
+        return self._get(Counter, name, help)
+
+    def histogram(self, name: str, help: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help, buckets=buckets)
+
+    def gauge(self, name: str, help: str, fn: Callable[[], float]) -> Gauge:
+        self._metrics[name] = Gauge(name, help, fn)
+        return self._metrics[name]
+
+    def render(self) -> str:
+        const = (("agent", self.agent),)
+        lines: List[str] = []
+        for name in sorted(self._metrics):
+            lines += self._metrics[name].render(const)
+        return "\n".join(lines) + "\n"
+
+
+# Named per process by `agent_common.set_service()`.
+registry = Registry(os.getenv("A2A_SERVICE", "agent"))
+
+llm_turn_seconds = registry.histogram("llm_turn_seconds", "Duration of one LLM call.")
+tool_call_seconds = registry.histogram("tool_call_seconds", "Duration of one tool call.")
+a2a_send_seconds = registry.histogram("a2a_send_seconds", "A2A round-trip to a remote agent.")
+stage_seconds = registry.histogram("stage_seconds", "Duration of internal request stages.")
+cache_requests_total = registry.counter("cache_requests_total", "Cache lookups by result.")
+gauge = registry.gauge
+
+
+def timed(stage: str) -> Callable:
+    """Decorator recording the wrapped (sync or async) function in `stage_seconds`."""
+    def wrap(fn: Callable) -> Callable:
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def run_async(*args, **kwargs):
+                with stage_seconds.time(stage=stage):
+                    return await fn(*args, **kwargs)
+            return run_async
+
+        @functools.wraps(fn)
+        def run(*args, **kwargs):
+            with stage_seconds.time(stage=stage):
+                return fn(*args, **kwargs)
+        return run
+    return wrap
+
+
+# ADK callbacks. Start times are keyed by invocation / function-call id, which
+# are unique per in-flight model call and tool call.
+_started: Dict[Tuple[str, str], float] = {}
+_MAX_STARTED = 4096
+
+
+def _start(kind: str, key: Optional[str]) -> None:
+    _started[(kind, key or "")] = time.perf_counter()
+    # Calls that raised never reach their after-callback; drop the oldest such entries.
+    while len(_started) > _MAX_STARTED:
+        del _started[next(iter(_started))]
+
+
+def _stop(kind: str, key: Optional[str]) -> Optional[float]:
+    start = _started.pop((kind, key or ""), None)
+    return None if start is None else time.perf_counter() - start
+
+
+def before_model(callback_context, llm_request) -> None:
+    _start("llm", callback_context.invocation_id)
+    return None
+
+
+def after_model(callback_context, llm_response) -> None:
+    if getattr(llm_response, "partial", False):
+        return None
+    elapsed = _stop("llm", callback_context.invocation_id)
+    if elapsed is not None:
+        status = "error" if getattr(llm_response, "error_code", None) else "ok"
+        llm_turn_seconds.observe(elapsed, status=status)
+    return None
+
+
+def before_tool(tool, args, tool_context) -> None:
+    _start("tool", tool_context.function_call_id)
+    return None
+
+
+def after_tool(tool, args, tool_context, tool_response) -> None:
+    elapsed = _stop("tool", tool_context.function_call_id)
+    if elapsed is not None:
+        tool_call_seconds.observe(elapsed, tool=tool.name)
+    return None
+
+
+async def metrics_endpoint(request):
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
+def add_metrics_route(app, path: str = "/metrics"):
+    """Mount `GET /metrics` on a built Starlette app and return the app."""
+    app.router.routes.append(Route(path, metrics_endpoint, methods=["GET"]))
+    return app
+
+
+_server: Optional[uvicorn.Server] = None
+
+
+def start_metrics_server(host: str, port: int) -> None:
+    """Serve `GET /metrics` on `host:port` from a daemon thread (once per process; port 0 disables it).
+
+    The thread runs its own event loop, so scrapes never wait on the agent's.
+    """
+    global _server
+    if _server is not None or port <= 0:
+        return
+    app = add_metrics_route(Starlette())
+    _server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning", lifespan="off"))
+    threading.Thread(target=_server.run, name="metrics-server", daemon=True).start()
@@ -0,0 +1,172 @@
+# Bounds the history replayed to the model for long-lived A2A contexts.
+"""The executors reuse the A2A ``context_id`` as the ADK session id, so every
+message to a context replays the whole event history. ``SessionCompactor`` is a
+``before_model_callback`` that rewrites the outgoing request only (the stored
+session is untouched):
+
+* the last ``SESSION_KEEP_TURNS`` user turns are sent verbatim;
+* in older turns, tool outputs are replaced by a short summary and long texts
+  are clipped to ``SESSION_SUMMARY_CHARS``;
+* if the request is still above ``SESSION_TOKEN_BUDGET`` (estimated at four
+  characters per token), whole old turns are dropped, oldest first, so tool
+  calls and their responses stay paired;
+* if even the recent turns exceed the budget, their oversized parts are
+  summarized the same way, oldest first, until it fits. The text of the
+  message being answered is always sent in full.
+
+Stats are kept per invocation (one incoming message and the model calls it
+causes).
+"""
+import json
+import logging
+import os
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import List, Optional
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models import LlmRequest, LlmResponse
+from google.genai import types
+
+logger = logging.getLogger(__name__)
+
+SESSION_KEEP_TURNS = int(os.getenv("SESSION_KEEP_TURNS", "3"))
+SESSION_TOKEN_BUDGET = int(os.getenv("SESSION_TOKEN_BUDGET", "8000"))
+SESSION_SUMMARY_CHARS = int(os.getenv("SESSION_SUMMARY_CHARS", "300"))
+# Per-invocation stats kept for at most this many recent invocations.
+_MAX_TRACKED_INVOCATIONS = 1024
+
+
+@dataclass
+class CompactionStats:
+    requests: int = 0
+    compacted: int = 0
+    responses_summarized: int = 0
+    texts_clipped: int = 0
+    turns_dropped: int = 0
+    tokens_before: int = 0
+    tokens_after: int = 0
+
+
+def _part_chars(part: types.Part) -> int:
+    if part.text:
+        return len(part.text)
+    if part.function_response:
+        return len(json.dumps(part.function_response.response, default=str))
+    if part.function_call:
+        return len(json.dumps(part.function_call.args, default=str)) + len(part.function_call.name or "")
+    if part.inline_data and part.inline_data.data:
+        return len(part.inline_data.data)
+    return 0
+
+
+def _content_chars(content: types.Content) -> int:
+    return sum(_part_chars(p) for p in content.parts or [])
+
+
+def estimate_tokens(contents: List[types.Content]) -> int:
+    return sum(_content_chars(c) for c in contents) // 4
+
+
+def _starts_turn(content: types.Content) -> bool:
+    return content.role == "user" and any(p.text for p in content.parts or [])
+
+
+def _split_turns(contents: List[types.Content]) -> List[List[types.Content]]:
+    turns: List[List[types.Content]] = []
+    for content in contents:
+        if not turns or _starts_turn(content):
+            turns.append([])
+        turns[-1].append(content)
+    return turns
+
+
+class SessionCompactor:
+    def __init__(
+        self,
+        keep_turns: int = SESSION_KEEP_TURNS,
+        token_budget: int = SESSION_TOKEN_BUDGET,
+        summary_chars: int = SESSION_SUMMARY_CHARS,
+    ):
+        self.keep_turns = max(1, keep_turns)
+        self.token_budget = token_budget
+        self.summary_chars = summary_chars
+        self._stats: "OrderedDict[str, CompactionStats]" = OrderedDict()
+        self._totals = CompactionStats()
+
+    def _clip(self, text: str) -> str:
+        return text[: self.summary_chars] + f"... [{len(text) - self.summary_chars} chars elided]"
+
+    def _summarize_part(self, part: types.Part, stats: CompactionStats) -> types.Part:
+        if part.function_response and _part_chars(part) > self.summary_chars:
+            stats.responses_summarized += 1
+            raw = json.dumps(part.function_response.response, default=str)
+            return types.Part(
+                function_response=types.FunctionResponse(
+                    id=part.function_response.id,
+                    name=part.function_response.name,
+                    response={"summary": self._clip(raw)},
+                )
+            )
+        if part.text and len(part.text) > self.summary_chars:
+            stats.texts_clipped += 1
+            return types.Part(text=self._clip(part.text))
+        return part
+
+    def _summarize(self, content: types.Content, stats: CompactionStats) -> types.Content:
+        return types.Content(role=content.role, parts=[self._summarize_part(p, stats) for p in content.parts or []])
+
+    def compact(self, contents: List[types.Content], stats: CompactionStats) -> List[types.Content]:
+        turns = _split_turns(contents)
+        old, recent = turns[: -self.keep_turns], turns[-self.keep_turns:]
+        old = [[self._summarize(c, stats) for c in turn] for turn in old]
+        while old and estimate_tokens([c for turn in old + recent for c in turn]) > self.token_budget:
+            old.pop(0)
+            stats.turns_dropped += 1
+        flat = [c for turn in old + recent for c in turn]
+        excess = sum(_content_chars(c) for c in flat) - self.token_budget * 4
+        # Still over: one large tool result in a recent turn would otherwise keep it there.
+        question = recent[-1][0] if recent and _starts_turn(recent[-1][0]) else None
+        for i in range(sum(len(turn) for turn in old), len(flat)):
+            if excess <= 0:
+                break
+            if flat[i] is question:
+                continue
+            summarized = self._summarize(flat[i], stats)
+            excess -= _content_chars(flat[i]) - _content_chars(summarized)
+            flat[i] = summarized
+        return flat
+
+    def stats(self, invocation_id: Optional[str] = None) -> dict:
+        """Stats for one invocation (all its model calls), or totals across invocations."""
+        if invocation_id is None:
+            return asdict(self._totals)
+        return asdict(self._stats.get(invocation_id, CompactionStats()))
+
+    def __call__(self, callback_context: CallbackContext, llm_request: LlmRequest) -> Optional[LlmResponse]:
+        invocation_id = callback_context.invocation_id
+        stats = self._stats.pop(invocation_id, None) or CompactionStats()
+        self._stats[invocation_id] = stats
+        if len(self._stats) > _MAX_TRACKED_INVOCATIONS:
+            self._stats.popitem(last=False)
+        before = estimate_tokens(llm_request.contents)
+        delta = CompactionStats(requests=1, tokens_before=before, tokens_after=before)
+        if len(_split_turns(llm_request.contents)) > self.keep_turns or before > self.token_budget:
+            llm_request.contents = self.compact(llm_request.contents, delta)
+            delta.tokens_after = estimate_tokens(llm_request.contents)
+            if delta.tokens_after < before:
+                delta.compacted = 1
+                logger.info(
+                    "Compacted invocation %s: ~%d -> ~%d tokens (%d responses summarized, %d turns dropped)",
+                    invocation_id, before, delta.tokens_after, delta.responses_summarized, delta.turns_dropped,
+                )
+        for target in (stats, self._totals):
+            for field, value in asdict(delta).items():
+                setattr(target, field, getattr(target, field) + value)
+        return None
+
+    def forget(self, invocation_id: str) -> None:
+        self._stats.pop(invocation_id, None)
+
+
+session_compactor = SessionCompactor()
@@ -0,0 +1,446 @@
+# Durable SQLite (WAL) task store, session service and artifact service.
+"""Drop-in replacements for a2a's ``InMemoryTaskStore`` and ADK's
+``InMemorySessionService`` / ``InMemoryArtifactService``, backed by one SQLite
+file in WAL mode.
+
+Writes are buffered and committed in one transaction per batch (every
+``AGENT_STORE_FLUSH_MS`` or ``AGENT_STORE_BATCH`` statements, and before any
+read), so a burst of task status updates costs one fsync instead of dozens.
+Rows untouched for ``AGENT_STORE_TTL`` seconds are removed by ``compact()``,
+which the servers run periodically from their lifespan.
+
+Select with ``AGENT_STORE=sqlite`` (default ``memory``); ``AGENT_STORE_DB``
+overrides the database path.
+"""
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, List, Optional, Tuple
+
+from a2a.server.tasks import InMemoryTaskStore, TaskStore
+from a2a.types import Task
+from google.adk.artifacts import InMemoryArtifactService
+from google.adk.artifacts.base_artifact_service import BaseArtifactService
+from google.adk.events import Event
+from google.adk.sessions import InMemorySessionService, Session
+from google.adk.sessions.base_session_service import (
+    BaseSessionService,
+    GetSessionConfig,
+    ListSessionsResponse,
+)
+from google.adk.sessions.state import State
+from google.genai import types
+
+logger = logging.getLogger(__name__)
+
+AGENT_STORE = os.getenv("AGENT_STORE", "memory").lower()
+AGENT_STORE_DB = os.getenv("AGENT_STORE_DB")
+AGENT_STORE_TTL = float(os.getenv("AGENT_STORE_TTL", str(24 * 3600)))
+AGENT_STORE_COMPACT_INTERVAL = float(os.getenv("AGENT_STORE_COMPACT_INTERVAL", "300"))
+AGENT_STORE_BATCH = int(os.getenv("AGENT_STORE_BATCH", "64"))
+AGENT_STORE_FLUSH_MS = float(os.getenv("AGENT_STORE_FLUSH_MS", "50"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    task_id TEXT PRIMARY KEY,
+    context_id TEXT NOT NULL,
+    body TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tasks_context ON tasks(context_id);
+CREATE INDEX IF NOT EXISTS tasks_updated ON tasks(updated_at);
+
+CREATE TABLE IF NOT EXISTS sessions (
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    state TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (app_name, user_id, session_id)
+);
+CREATE INDEX IF NOT EXISTS sessions_updated ON sessions(updated_at);
+
+CREATE TABLE IF NOT EXISTS events (
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    event_id TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    body TEXT NOT NULL,
+    PRIMARY KEY (app_name, user_id, session_id, event_id)
+);
+CREATE INDEX IF NOT EXISTS events_session ON events(app_name, user_id, session_id, timestamp);
+
+CREATE TABLE IF NOT EXISTS app_state (
+    app_name TEXT PRIMARY KEY,
+    state TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS user_state (
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    state TEXT NOT NULL,
+    PRIMARY KEY (app_name, user_id)
+);
+
+CREATE TABLE IF NOT EXISTS artifacts (
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    body TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (app_name, user_id, session_id, filename, version)
+);
+CREATE INDEX IF NOT EXISTS artifacts_created ON artifacts(created_at);
+"""
+
+
+class SQLiteDB:
+    """One WAL-mode connection with a write-behind batch buffer."""
+
+    def __init__(
+        self,
+        path: str,
+        batch_size: int = AGENT_STORE_BATCH,
+        flush_interval: float = AGENT_STORE_FLUSH_MS / 1000,
+    ):
+        self.path = path
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.RLock()
+        self._pending: List[Tuple[str, tuple]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+
+    def write(self, sql: str, params: tuple = ()) -> None:
+        with self._lock:
+            self._pending.append((sql, params))
+            if len(self._pending) >= self.batch_size:
+                self.flush()
+                return
+            if self._flush_handle is None:
+                try:
+                    loop = asyncio.get_running_loop()
+                except RuntimeError:
+                    self.flush()
+                    return
+                self._flush_handle = loop.call_later(self.flush_interval, self.flush)
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._flush_handle is not None:
+                self._flush_handle.cancel()
+                self._flush_handle = None
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, []
+            self._conn.execute("BEGIN")
+            try:
+                for sql, params in pending:
+                    self._conn.execute(sql, params)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def query(self, sql: str, params: tuple = ()) -> list:
+        with self._lock:
+            self.flush()
+            return self._conn.execute(sql, params).fetchall()
+
+    def compact(self, ttl: float = AGENT_STORE_TTL) -> int:
+        """Delete rows not updated within `ttl` seconds; returns how many sessions/tasks went."""
+        cutoff = time.time() - ttl
+        with self._lock:
+            self.flush()
+            self._conn.execute("BEGIN")
+            try:
+                removed = self._conn.execute("DELETE FROM tasks WHERE updated_at < ?", (cutoff,)).rowcount
+                stale = "SELECT app_name, user_id, session_id FROM sessions WHERE updated_at < ?"
+                for table in ("events", "artifacts"):
+                    self._conn.execute(
+                        f"DELETE FROM {table} WHERE (app_name, user_id, session_id) IN ({stale})", (cutoff,)
+                    )
+                removed += self._conn.execute("DELETE FROM sessions WHERE updated_at < ?", (cutoff,)).rowcount
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return removed
+
+    def close(self) -> None:
+        with self._lock:
+            self.flush()
+            self._conn.close()
+
+
+class SQLiteTaskStore(TaskStore):
+    def __init__(self, db: SQLiteDB):
+        self._db = db
+
+    async def save(self, task: Task) -> None:
+        self._db.write(
+            "INSERT OR REPLACE INTO tasks (task_id, context_id, body, updated_at) VALUES (?, ?, ?, ?)",
+            (task.id, task.contextId, task.model_dump_json(exclude_none=True), time.time()),
+        )
+
+    async def get(self, task_id: str) -> Task | None:
+        rows = self._db.query("SELECT body FROM tasks WHERE task_id = ?", (task_id,))
+        return Task.model_validate_json(rows[0][0]) if rows else None
+
+    async def delete(self, task_id: str) -> None:
+        self._db.write("DELETE FROM tasks WHERE task_id = ?", (task_id,))
+
+    async def list_by_context(self, context_id: str) -> list[Task]:
+        rows = self._db.query(
+            "SELECT body FROM tasks WHERE context_id = ? ORDER BY updated_at", (context_id,)
+        )
+        return [Task.model_validate_json(body) for (body,) in rows]
+
+
+class SQLiteSessionService(BaseSessionService):
+    """Sessions and events in SQLite; `app:` / `user:` state shared the way InMemorySessionService shares it."""
+
+    def __init__(self, db: SQLiteDB):
+        self._db = db
+
+    def _load_state(self, table: str, where: str, params: tuple) -> dict[str, Any]:
+        rows = self._db.query(f"SELECT state FROM {table} WHERE {where}", params)
+        return json.loads(rows[0][0]) if rows else {}
+
+    def _merge_state(self, session: Session) -> Session:
+        app_state = self._load_state("app_state", "app_name = ?", (session.app_name,))
+        user_state = self._load_state(
+            "user_state", "app_name = ? AND user_id = ?", (session.app_name, session.user_id)
+        )
+        session.state.update({State.APP_PREFIX + k: v for k, v in app_state.items()})
+        session.state.update({State.USER_PREFIX + k: v for k, v in user_state.items()})
+        return session
+
+    @staticmethod
+    def _own_state(state: dict[str, Any]) -> dict[str, Any]:
+        prefixes = (State.APP_PREFIX, State.USER_PREFIX, State.TEMP_PREFIX)
+        return {k: v for k, v in state.items() if not k.startswith(prefixes)}
+
+    def _update_shared_state(self, app_name: str, user_id: str, delta: dict[str, Any]) -> None:
+        app_delta = {k.removeprefix(State.APP_PREFIX): v for k, v in delta.items() if k.startswith(State.APP_PREFIX)}
+        user_delta = {k.removeprefix(State.USER_PREFIX): v for k, v in delta.items() if k.startswith(State.USER_PREFIX)}
+        if app_delta:
+            state = self._load_state("app_state", "app_name = ?", (app_name,))
+            state.update(app_delta)
+            self._db.write(
+                "INSERT OR REPLACE INTO app_state (app_name, state) VALUES (?, ?)",
+                (app_name, json.dumps(state)),
+            )
+        if user_delta:
+            state = self._load_state("user_state", "app_name = ? AND user_id = ?", (app_name, user_id))
+            state.update(user_delta)
+            self._db.write(
+                "INSERT OR REPLACE INTO user_state (app_name, user_id, state) VALUES (?, ?, ?)",
+                (app_name, user_id, json.dumps(state)),
+            )
+
+    async def create_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        state: Optional[dict[str, Any]] = None,
+        session_id: Optional[str] = None,
+    ) -> Session:
+        session_id = session_id.strip() if session_id and session_id.strip() else str(uuid.uuid4())
+        now = time.time()
+        state = dict(state or {})
+        self._update_shared_state(app_name, user_id, state)
+        self._db.write(
+            "INSERT OR REPLACE INTO sessions (app_name, user_id, session_id, state, updated_at) VALUES (?, ?, ?, ?, ?)",
+            (app_name, user_id, session_id, json.dumps(self._own_state(state)), now),
+        )
+        session = Session(
+            app_name=app_name,
+            user_id=user_id,
+            id=session_id,
+            state=self._own_state(state),
+            last_update_time=now,
+        )
+        return self._merge_state(session)
+
+    async def get_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        config: Optional[GetSessionConfig] = None,
+    ) -> Optional[Session]:
+        rows = self._db.query(
+            "SELECT state, updated_at FROM sessions WHERE app_name = ? AND user_id = ? AND session_id = ?",
+            (app_name, user_id, session_id),
+        )
+        if not rows:
+            return None
+        state, updated_at = rows[0]
+        sql = "SELECT body, timestamp FROM events WHERE app_name = ? AND user_id = ? AND session_id = ?"
+        params: tuple = (app_name, user_id, session_id)
+        if config and config.after_timestamp:
+            sql += " AND timestamp >= ?"
+            params += (config.after_timestamp,)
+        if config and config.num_recent_events:
+            sql = f"SELECT * FROM ({sql} ORDER BY timestamp DESC LIMIT ?) ORDER BY timestamp"
+            params += (config.num_recent_events,)
+        else:
+            sql += " ORDER BY timestamp"
+        events = [Event.model_validate_json(body) for body, _ in self._db.query(sql, params)]
+        session = Session(
+            app_name=app_name,
+            user_id=user_id,
+            id=session_id,
+            state=json.loads(state),
+            events=events,
+            last_update_time=updated_at,
+        )
+        return self._merge_state(session)
+
+    async def list_sessions(self, *, app_name: str, user_id: str) -> ListSessionsResponse:
+        rows = self._db.query(
+            "SELECT session_id, updated_at FROM sessions WHERE app_name = ? AND user_id = ? ORDER BY updated_at",
+            (app_name, user_id),
+        )
+        return ListSessionsResponse(
+            sessions=[
+                Session(app_name=app_name, user_id=user_id, id=sid, state={}, last_update_time=ts)
+                for sid, ts in rows
+            ]
+        )
+
+    async def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        key = (app_name, user_id, session_id)
+        for table in ("events", "artifacts", "sessions"):
+            self._db.write(f"DELETE FROM {table} WHERE app_name = ? AND user_id = ? AND session_id = ?", key)
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        if event.partial:
+            return event
+        await super().append_event(session=session, event=event)
+        session.last_update_time = event.timestamp
+        delta = event.actions.state_delta if event.actions and event.actions.state_delta else {}
+        if delta:
+            self._update_shared_state(session.app_name, session.user_id, delta)
+        self._db.write(
+            "INSERT OR REPLACE INTO events (app_name, user_id, session_id, event_id, timestamp, body) VALUES (?, ?, ?, ?, ?, ?)",
+            (session.app_name, session.user_id, session.id, event.id, event.timestamp,
+             event.model_dump_json(exclude_none=True)),
+        )
+        self._db.write(
+            "UPDATE sessions SET state = ?, updated_at = ? WHERE app_name = ? AND user_id = ? AND session_id = ?",
+            (json.dumps(self._own_state(session.state)), time.time(), session.app_name, session.user_id, session.id),
+        )
+        return event
+
+
+class SQLiteArtifactService(BaseArtifactService):
+    def __init__(self, db: SQLiteDB):
+        self._db = db
+
+    async def save_artifact(
+        self, *, app_name: str, user_id: str, session_id: str, filename: str, artifact: types.Part
+    ) -> int:
+        versions = await self.list_versions(
+            app_name=app_name, user_id=user_id, session_id=session_id, filename=filename
+        )
+        version = versions[-1] + 1 if versions else 0
+        self._db.write(
+            "INSERT INTO artifacts (app_name, user_id, session_id, filename, version, body, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (app_name, user_id, session_id, filename, version,
+             artifact.model_dump_json(exclude_none=True), time.time()),
+        )
+        return version
+
+    async def load_artifact(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        filename: str,
+        version: Optional[int] = None,
+    ) -> Optional[types.Part]:
+        sql = "SELECT body FROM artifacts WHERE app_name = ? AND user_id = ? AND session_id = ? AND filename = ?"
+        params: tuple = (app_name, user_id, session_id, filename)
+        if version is None:
+            sql += " ORDER BY version DESC LIMIT 1"
+        else:
+            sql += " AND version = ?"
+            params += (version,)
+        rows = self._db.query(sql, params)
+        return types.Part.model_validate_json(rows[0][0]) if rows else None
+
+    async def list_artifact_keys(self, *, app_name: str, user_id: str, session_id: str) -> list[str]:
+        rows = self._db.query(
+            "SELECT DISTINCT filename FROM artifacts WHERE app_name = ? AND user_id = ? AND session_id = ? ORDER BY filename",
+            (app_name, user_id, session_id),
+        )
+        return [filename for (filename,) in rows]
+
+    async def delete_artifact(self, *, app_name: str, user_id: str, session_id: str, filename: str) -> None:
+        self._db.write(
+            "DELETE FROM artifacts WHERE app_name = ? AND user_id = ? AND session_id = ? AND filename = ?",
+            (app_name, user_id, session_id, filename),
+        )
+
+    async def list_versions(
+        self, *, app_name: str, user_id: str, session_id: str, filename: str
+    ) -> list[int]:
+        rows = self._db.query(
+            "SELECT version FROM artifacts WHERE app_name = ? AND user_id = ? AND session_id = ? AND filename = ? ORDER BY version",
+            (app_name, user_id, session_id, filename),
+        )
+        return [version for (version,) in rows]
+
+
+@dataclass
+class AgentStores:
+    task_store: TaskStore
+    session_service: BaseSessionService
+    artifact_service: BaseArtifactService
+    db: Optional[SQLiteDB] = None
+
+    async def compaction_loop(
+        self, ttl: float = AGENT_STORE_TTL, interval: float = AGENT_STORE_COMPACT_INTERVAL
+    ) -> None:
+        if self.db is None:
+            return
+        while True:
+            try:
+                removed = self.db.compact(ttl)
+                if removed:
+                    logger.info("Compacted %d expired tasks/sessions from %s", removed, self.db.path)
+            except sqlite3.Error as e:
+                logger.warning("Store compaction failed: %s", e)
+            await asyncio.sleep(interval)
+
+    def close(self) -> None:
+        if self.db is not None:
+            self.db.close()
+
+
+def create_stores(default_db: str, kind: str = AGENT_STORE, path: Optional[str] = AGENT_STORE_DB) -> AgentStores:
+    """Task store, session service and artifact service for `kind` ("memory" or "sqlite")."""
+    if kind == "memory":
+        return AgentStores(InMemoryTaskStore(), InMemorySessionService(), InMemoryArtifactService())
+    if kind != "sqlite":
+        raise ValueError(f"Unknown AGENT_STORE: {kind!r}")
+    db = SQLiteDB(path or default_db)
+    return AgentStores(SQLiteTaskStore(db), SQLiteSessionService(db), SQLiteArtifactService(db), db)
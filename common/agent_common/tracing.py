@@ -0,0 +1,310 @@
+# Trace/span ids carried across A2A hops, so one slow request can be followed end to end.
+"""Each hop (host ``send_message``, an agent's ``execute``, Carfax's call to
+PayStabl, tool calls) records a span. The caller's span travels to the next
+agent as a W3C-style ``traceparent`` string in the A2A message ``metadata``;
+the receiver continues the same trace under it.
+
+Finished spans go to the exporter chosen by ``A2A_TRACE_EXPORTER``:
+
+* ``memory`` (default) - the last ``A2A_TRACE_MEMORY_SPANS`` spans, kept in process;
+* ``jsonl`` - one JSON object per line appended to ``A2A_TRACE_FILE`` by a
+  background thread; all agents on a machine share the file, so a trace can be
+  rebuilt from it. Past ``A2A_TRACE_MAX_BYTES`` the file is moved to
+  ``<file>.1`` (replacing the previous one). Writers take an exclusive lock on
+  ``<file>.lock`` around each rotate-and-append, so several processes can share it;
+* ``none`` - tracing disabled.
+
+``python -m agent_common.tracing [trace_id]`` prints a trace (the slowest one by default)
+as a tree with its critical path marked.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import secrets
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: rotation is not coordinated between processes
+    fcntl = None
+
+A2A_TRACE_EXPORTER = os.getenv("A2A_TRACE_EXPORTER", "memory")
+A2A_TRACE_FILE = os.getenv(
+    "A2A_TRACE_FILE", os.path.join(os.path.expanduser("~"), ".cache", "a2a-traces", "traces.jsonl")
+)
+A2A_TRACE_MEMORY_SPANS = int(os.getenv("A2A_TRACE_MEMORY_SPANS", "10000"))
+A2A_TRACE_MAX_BYTES = int(os.getenv("A2A_TRACE_MAX_BYTES", str(64 * 1024 * 1024)))
+TRACEPARENT_KEY = "traceparent"
+
+logger = logging.getLogger(__name__)
+# Named per process by `agent_common.set_service()`.
+SERVICE = os.getenv("A2A_SERVICE", "agent")
+
+
+@dataclass
+class Span:
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    name: str
+    service: str = field(default_factory=lambda: SERVICE)
+    start: float = 0.0
+    end: float = 0.0
+    status: str = "ok"
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+
+class InMemoryExporter:
+    def __init__(self, max_spans: int = A2A_TRACE_MEMORY_SPANS):
+        self.spans: "deque[dict]" = deque(maxlen=max_spans)
+
+    def export(self, span: Span) -> None:
+        self.spans.append(asdict(span))
+
+
+class JSONLExporter:
+    """Appends spans to `path` from a writer thread; `export` only queues them.
+
+    Spans arriving while `max_queued` are already waiting are dropped (and counted).
+    """
+
+    def __init__(self, path: str = A2A_TRACE_FILE, max_bytes: int = A2A_TRACE_MAX_BYTES,
+                 max_queued: int = A2A_TRACE_MEMORY_SPANS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.dropped = 0
+        self._queue: "queue.Queue[Optional[Span]]" = queue.Queue(maxsize=max_queued)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="trace-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def export(self, span: Span) -> None:
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            spans = [s for s in batch if s is not None]
+            if spans:
+                try:
+                    self._write(spans)
+                except OSError as e:
+                    logger.warning("Trace export failed: %s", e)
+            if len(spans) < len(batch):
+                return
+
+    def _write(self, spans: List[Span]) -> None:
+        lines = [json.dumps(asdict(s), default=str) + "\n" for s in spans]
+        with open(self.path + ".lock", "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)  # released when the lock file is closed
+            if self.max_bytes > 0 and os.path.exists(self.path) and os.path.getsize(self.path) >= self.max_bytes:
+                os.replace(self.path, self.path + ".1")
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.writelines(lines)
+
+    def close(self, timeout: float = 5) -> None:
+        """Write what is queued and stop the writer thread."""
+        if self._thread.is_alive():
+            try:
+                self._queue.put(None, timeout=timeout)
+            except queue.Full:
+                return
+            self._thread.join(timeout)
+
+
+def _default_exporter():
+    if A2A_TRACE_EXPORTER == "memory":
+        return InMemoryExporter()
+    if A2A_TRACE_EXPORTER == "jsonl":
+        return JSONLExporter()
+    return None
+
+
+_exporter = _default_exporter()
+_current: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def set_exporter(exporter) -> None:
+    """Replace the exporter (any object with ``export(span)``; None disables tracing)."""
+    global _exporter
+    _exporter = exporter
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def parse_traceparent(value: Any) -> Optional[Tuple[str, str]]:
+    """(trace_id, span_id) from a ``00-<32 hex>-<16 hex>-<flags>`` string, else None."""
+    if not isinstance(value, str):
+        return None
+    parts = value.split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    return parts[1], parts[2]
+
+
+def extract(metadata: Optional[Dict[str, Any]]) -> Optional[Tuple[str, str]]:
+    """Remote parent carried in A2A message metadata, if any."""
+    return parse_traceparent((metadata or {}).get(TRACEPARENT_KEY))
+
+
+def inject(metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Return ``metadata`` with the current span's traceparent added (if a span is active)."""
+    metadata = dict(metadata or {})
+    span = _current.get()
+    if span is not None:
+        metadata[TRACEPARENT_KEY] = span.traceparent()
+    return metadata
+
+
+def _export(span: Span) -> None:
+    try:
+        _exporter.export(span)
+    except Exception as e:  # tracing must never fail the request
+        logger.warning("Trace export failed: %s", e)
+
+
+@contextmanager
+def span(name: str, remote_parent: Optional[Tuple[str, str]] = None, **attributes: Any) -> Iterator[Optional[Span]]:
+    """Record a span around the block, as a child of the current span or of `remote_parent`."""
+    if _exporter is None:
+        yield None
+        return
+    parent = _current.get()
+    if remote_parent is not None:
+        trace_id, parent_id = remote_parent
+    elif parent is not None:
+        trace_id, parent_id = parent.trace_id, parent.span_id
+    else:
+        trace_id, parent_id = secrets.token_hex(16), None
+    s = Span(trace_id, secrets.token_hex(8), parent_id, name, start=time.time(), attributes=attributes)
+    token = _current.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.status = "cancelled" if type(e).__name__ == "CancelledError" else "error"
+        s.attributes.setdefault("error", f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        _current.reset(token)
+        s.end = time.time()
+        _export(s)
+
+
+# ADK tool callbacks: one span per tool call, child of the span active when the
+# agent runs (e.g. the executor's). Keyed by function-call id.
+_tool_spans: Dict[str, Span] = {}
+_MAX_TOOL_SPANS = 4096
+
+
+def before_tool(tool, args, tool_context) -> None:
+    parent = _current.get()
+    if _exporter is None or parent is None:
+        return None
+    if len(_tool_spans) > _MAX_TOOL_SPANS:  # calls that raised never reach after_tool
+        _tool_spans.clear()
+    _tool_spans[tool_context.function_call_id or ""] = Span(
+        parent.trace_id, secrets.token_hex(8), parent.span_id, f"tool:{tool.name}", start=time.time()
+    )
+    return None
+
+
+def after_tool(tool, args, tool_context, tool_response) -> None:
+    s = _tool_spans.pop(tool_context.function_call_id or "", None)
+    if s is not None:
+        s.end = time.time()
+        if isinstance(tool_response, dict) and tool_response.get("error"):
+            s.status = "error"
+        _export(s)
+    return None
+
+
+def load_spans(path: str = A2A_TRACE_FILE, trace_id: Optional[str] = None) -> List[dict]:
+    spans = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if trace_id is None or record["trace_id"] == trace_id:
+                spans.append(record)
+    return spans
+
+
+def critical_path(spans: List[dict]) -> List[dict]:
+    """Root-to-leaf chain that always follows the child finishing last."""
+    ids = {s["span_id"] for s in spans}
+    children: Dict[Optional[str], List[dict]] = {}
+    for s in spans:
+        children.setdefault(s["parent_id"] if s["parent_id"] in ids else None, []).append(s)
+    path: List[dict] = []
+    level = children.get(None, [])
+    while level:
+        node = max(level, key=lambda s: s["end"])
+        path.append(node)
+        level = children.get(node["span_id"], [])
+    return path
+
+
+def format_trace(spans: List[dict]) -> str:
+    if not spans:
+        return "no spans"
+    ids = {s["span_id"] for s in spans}
+    children: Dict[Optional[str], List[dict]] = {}
+    for s in sorted(spans, key=lambda s: s["start"]):
+        children.setdefault(s["parent_id"] if s["parent_id"] in ids else None, []).append(s)
+    on_path = {s["span_id"] for s in critical_path(spans)}
+    t0 = min(s["start"] for s in spans)
+    lines = [f"trace {spans[0]['trace_id']}  (* = critical path)"]
+
+    def walk(node: dict, depth: int) -> None:
+        mark = "*" if node["span_id"] in on_path else " "
+        lines.append(
+            f"{mark} {(node['start'] - t0) * 1000:9.1f}ms {(node['end'] - node['start']) * 1000:9.1f}ms  "
+            f"{'  ' * depth}{node['service']}:{node['name']} [{node['status']}]"
+        )
+        for child in children.get(node["span_id"], []):
+            walk(child, depth + 1)
+
+    for root in children.get(None, []):
+        walk(root, 0)
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    wanted = sys.argv[1] if len(sys.argv) > 1 else None
+    all_spans = load_spans(trace_id=wanted)
+    if wanted is None and all_spans:
+        by_trace: Dict[str, List[dict]] = {}
+        for s in all_spans:
+            by_trace.setdefault(s["trace_id"], []).append(s)
+        all_spans = max(by_trace.values(), key=lambda ss: max(s["end"] for s in ss) - min(s["start"] for s in ss))
+    print(format_trace(all_spans))
@@ -0,0 +1,38 @@
+import os
+import time
+
+from agent_common.blob_store import BlobStore
+
+
+def _age(store, uri, seconds):
+    path = store.path_of(uri)
+    then = time.time() - seconds
+    os.utime(path, (then, then))
+
+
+def test_gc_removes_expired_then_oldest_over_the_size_limit(tmp_path):
+    store = BlobStore(str(tmp_path), min_bytes=1)
+    old = store.put("a" * 100).uri
+    older = store.put("b" * 100).uri
+    recent = store.put("c" * 100).uri
+    newest = store.put("d" * 100).uri
+    _age(store, old, 3600)
+    _age(store, older, 7200)
+    _age(store, recent, 60)
+
+    assert store.gc(ttl=1800, max_bytes=0) == 2
+    assert [store.path_of(u) and os.path.exists(store.path_of(u)) for u in (old, older, recent, newest)] == [
+        False, False, True, True]
+
+    assert store.gc(ttl=0, max_bytes=150) == 1
+    assert not os.path.exists(store.path_of(recent))
+    assert store.read_text(newest) == "d" * 100
+
+
+def test_storing_again_keeps_a_blob_from_expiring(tmp_path):
+    store = BlobStore(str(tmp_path), min_bytes=1)
+    uri = store.put("x" * 100).uri
+    _age(store, uri, 3600)
+    assert store.put("x" * 100).uri == uri
+    assert store.gc(ttl=1800, max_bytes=0) == 0
+    assert store.gc(ttl=0, max_bytes=0) == 0
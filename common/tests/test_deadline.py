@@ -0,0 +1,34 @@
+import asyncio
+
+import pytest
+
+from agent_common import deadline
+
+
+def test_inject_extract_round_trip(monkeypatch):
+    monkeypatch.setattr(deadline, "A2A_DEADLINE_MARGIN", 0.5)
+    assert deadline.inject({"a": 1}) == {"a": 1}
+    with deadline.scope(10):
+        metadata = deadline.inject({"a": 1})
+    assert metadata["a"] == 1
+    assert 9000 < metadata[deadline.DEADLINE_KEY] <= 9500
+    assert 9 < deadline.extract(metadata) <= 9.5
+    assert deadline.extract({deadline.DEADLINE_KEY: True}) is None
+    assert deadline.extract(None) is None
+
+
+def test_scope_never_extends_the_deadline():
+    with deadline.scope(1):
+        with deadline.scope(100):
+            assert deadline.remaining() <= 1
+    assert deadline.current() is None
+
+
+def test_enforce_raises_deadline_exceeded():
+    async def slow():
+        with deadline.scope(0.05):
+            async with deadline.enforce("slow"):
+                await asyncio.sleep(5)
+
+    with pytest.raises(deadline.DeadlineExceeded):
+        asyncio.run(slow())
@@ -0,0 +1,23 @@
+import asyncio
+
+from agent_common import http_client
+
+
+def test_configure_reads_prefixed_env_and_keeps_one_client(monkeypatch):
+    monkeypatch.setattr(http_client, "_settings", dict(http_client._settings))
+    monkeypatch.setenv("TEST_HTTP_MAX_CONNECTIONS", "7")
+    monkeypatch.setenv("TEST_HTTP_CONNECT_TIMEOUT", "2.5")
+    http_client.configure("TEST", connect_timeout=5.0, timeout=12.0)
+
+    async def run():
+        client = http_client.get_async_client()
+        assert http_client.get_async_client() is client
+        assert client.timeout.connect == 2.5
+        assert client.timeout.read == 12.0
+        assert client._transport._pool._max_connections == 7
+        await http_client.aclose_async_client()
+        assert client.is_closed
+        assert http_client.get_async_client() is not client
+        await http_client.aclose_async_client()
+
+    asyncio.run(run())
@@ -0,0 +1,77 @@
+import socket
+import time
+from types import SimpleNamespace
+
+import httpx
+
+from agent_common import metrics, set_service, tracing
+
+
+def test_started_timings_evict_oldest_first(monkeypatch):
+    monkeypatch.setattr(metrics, "_started", {})
+    monkeypatch.setattr(metrics, "_MAX_STARTED", 3)
+    for key in "abcd":
+        metrics._start("llm", key)
+    assert list(metrics._started) == [("llm", "b"), ("llm", "c"), ("llm", "d")]
+    assert metrics._stop("llm", "d") is not None
+    assert metrics._stop("llm", "a") is None
+
+
+def test_after_model_observes_the_started_call(monkeypatch):
+    monkeypatch.setattr(metrics, "_started", {})
+    histogram = metrics.Histogram("t_seconds", "test")
+    monkeypatch.setattr(metrics, "llm_turn_seconds", histogram)
+    ctx = SimpleNamespace(invocation_id="inv-1")
+    metrics.before_model(ctx, None)
+    metrics.after_model(ctx, SimpleNamespace(partial=False, error_code=None))
+    assert 't_seconds_count{status="ok"}' in "\n".join(histogram.render())
+    assert not metrics._started
+
+
+def test_set_service_names_metrics_and_spans(monkeypatch):
+    monkeypatch.setattr(metrics.registry, "agent", metrics.registry.agent)
+    monkeypatch.setattr(tracing, "SERVICE", tracing.SERVICE)
+    set_service("carfax")
+    assert metrics.registry.agent == "carfax"
+    assert tracing.Span("t", "s", None, "n").service == "carfax"
+
+
+def test_every_metric_carries_the_agent_label():
+    registry = metrics.Registry("carfax")
+    registry.counter("c_total", "test").inc(cache="report", result="hit")
+    registry.histogram("h_seconds", "test", buckets=(1,)).observe(0.5, stage="fetch")
+    registry.gauge("g", "test", lambda: 3)
+    text = registry.render()
+    assert 'c_total{agent="carfax",cache="report",result="hit"} 1' in text
+    assert 'h_seconds_bucket{agent="carfax",stage="fetch",le="1"} 1.0' in text
+    assert 'g{agent="carfax"} 3.0' in text
+    registry.agent = "host"
+    assert 'g{agent="host"} 3.0' in registry.render()
+
+
+def test_metrics_server_serves_the_registry(monkeypatch):
+    monkeypatch.setattr(metrics, "_server", None)
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    metrics.cache_requests_total.inc(cache="test", result="hit")
+    metrics.start_metrics_server("127.0.0.1", port)
+    try:
+        for _ in range(100):
+            try:
+                response = httpx.get(f"http://127.0.0.1:{port}/metrics")
+                break
+            except httpx.ConnectError:
+                time.sleep(0.05)
+        assert response.status_code == 200
+        agent = metrics.registry.agent
+        assert f'cache_requests_total{{agent="{agent}",cache="test",result="hit"}}' in response.text
+        assert httpx.get(f"http://127.0.0.1:{port}/other").status_code == 404
+    finally:
+        metrics._server.should_exit = True
+
+
+def test_metrics_server_disabled_on_port_zero(monkeypatch):
+    monkeypatch.setattr(metrics, "_server", None)
+    metrics.start_metrics_server("127.0.0.1", 0)
+    assert metrics._server is None
@@ -0,0 +1,73 @@
+from types import SimpleNamespace
+
+from google.adk.models import LlmRequest
+from google.genai import types
+
+from agent_common.session_compaction import SessionCompactor, estimate_tokens
+
+
+def user(text):
+    return types.Content(role="user", parts=[types.Part(text=text)])
+
+
+def model(text):
+    return types.Content(role="model", parts=[types.Part(text=text)])
+
+
+def call(name):
+    return types.Content(role="model", parts=[types.Part(function_call=types.FunctionCall(id=name, name=name, args={}))])
+
+
+def result(name, body):
+    return types.Content(role="user", parts=[types.Part(
+        function_response=types.FunctionResponse(id=name, name=name, response={"result": body}))])
+
+
+def run(compactor, contents, invocation_id="inv-1"):
+    request = LlmRequest(contents=list(contents))
+    compactor(SimpleNamespace(invocation_id=invocation_id), request)
+    return request.contents
+
+
+def test_short_history_is_untouched():
+    contents = [user("hi"), model("hello")]
+    assert run(SessionCompactor(keep_turns=3, token_budget=1000), contents) == contents
+
+
+def test_old_turns_are_summarized_and_recent_kept():
+    big = "x" * 2000
+    contents = [user("turn 1"), call("f"), result("f", big), model("done"),
+                user("turn 2"), model("ok"), user("turn 3")]
+    out = run(SessionCompactor(keep_turns=2, token_budget=10_000, summary_chars=100), contents)
+    assert out[2].parts[0].function_response.response["summary"].endswith("chars elided]")
+    assert out[2].parts[0].function_response.id == "f"  # still paired with its call
+    assert out[-3:] == contents[-3:]
+
+
+def test_old_turns_dropped_whole_when_over_budget():
+    contents = [user("a" * 400), model("b" * 400), user("c"), model("d"), user("e")]
+    out = run(SessionCompactor(keep_turns=2, token_budget=10, summary_chars=1000), contents)
+    assert out == contents[2:]
+
+
+def test_large_tool_result_in_a_recent_turn_is_clipped():
+    compactor = SessionCompactor(keep_turns=3, token_budget=200, summary_chars=100)
+    question = user("q" * 500)
+    contents = [user("look up the VIN"), call("paid_fetch"), result("paid_fetch", "<html>" + "y" * 20_000),
+                model("fetched"), question]
+    out = run(compactor, contents)
+    assert estimate_tokens(out) <= 200 + 500 // 4  # only the question itself may exceed it
+    assert out[-1] is question  # the message being answered is sent in full
+    assert "summary" in out[2].parts[0].function_response.response
+    assert compactor.stats("inv-1")["responses_summarized"] == 1
+
+
+def test_stats_are_kept_per_invocation():
+    compactor = SessionCompactor(keep_turns=1, token_budget=10_000)
+    contents = [user("a"), model("b"), user("c")]
+    run(compactor, contents, "inv-1")
+    run(compactor, contents, "inv-1")
+    run(compactor, contents, "inv-2")
+    assert compactor.stats("inv-1")["requests"] == 2
+    assert compactor.stats("inv-2")["requests"] == 1
+    assert compactor.stats()["requests"] == 3
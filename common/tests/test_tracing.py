@@ -0,0 +1,80 @@
+import json
+import os
+import time
+
+import pytest
+
+from agent_common import tracing
+
+
+def _span(name):
+    return tracing.Span("a" * 32, "b" * 16, None, name, start=1.0, end=2.0)
+
+
+@pytest.mark.skipif("A2A_TRACE_EXPORTER" in os.environ, reason="exporter chosen by the environment")
+def test_default_exporter_keeps_spans_in_memory():
+    assert isinstance(tracing._default_exporter(), tracing.InMemoryExporter)
+
+
+def test_jsonl_exporter_writes_from_its_thread(tmp_path):
+    path = str(tmp_path / "traces.jsonl")
+    exporter = tracing.JSONLExporter(path)
+    exporter.export(_span("one"))
+    exporter.export(_span("two"))
+    exporter.close()
+    assert [s["name"] for s in tracing.load_spans(path)] == ["one", "two"]
+    assert not exporter._thread.is_alive()
+
+
+def test_jsonl_exporter_rotates_past_max_bytes(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    path.write_text(json.dumps({"old": True}) + "\n")
+    exporter = tracing.JSONLExporter(str(path), max_bytes=1)
+    exporter.export(_span("new"))
+    exporter.close()
+    assert [s["name"] for s in tracing.load_spans(str(path))] == ["new"]
+    assert json.loads((tmp_path / "traces.jsonl.1").read_text()) == {"old": True}
+
+
+@pytest.mark.skipif(tracing.fcntl is None, reason="no fcntl on this platform")
+def test_jsonl_exporter_waits_for_another_writers_lock(tmp_path):
+    path = str(tmp_path / "traces.jsonl")
+    with open(path + ".lock", "a") as lock:
+        tracing.fcntl.flock(lock, tracing.fcntl.LOCK_EX)  # another worker rotating
+        exporter = tracing.JSONLExporter(path)
+        exporter.export(_span("waiting"))
+        time.sleep(0.2)
+        assert not os.path.exists(path)
+    exporter.close()
+    assert [s["name"] for s in tracing.load_spans(path)] == ["waiting"]
+
+
+def test_export_failure_is_logged_not_raised(monkeypatch, caplog):
+    class Broken:
+        def export(self, span):
+            raise RuntimeError("disk full")
+
+    monkeypatch.setattr(tracing, "_exporter", Broken())
+    with tracing.span("execute"):
+        pass
+    assert "Trace export failed: disk full" in caplog.text
+
+
+def test_jsonl_exporter_drops_spans_past_the_queue_bound(tmp_path):
+    exporter = tracing.JSONLExporter(str(tmp_path / "traces.jsonl"), max_queued=1)
+    exporter.close()  # writer stopped, so the queue stays full
+    exporter._queue.put_nowait(_span("queued"))
+    exporter.export(_span("dropped"))
+    assert exporter.dropped == 1
+
+
+def test_span_joins_the_remote_trace(monkeypatch):
+    exporter = tracing.InMemoryExporter()
+    monkeypatch.setattr(tracing, "_exporter", exporter)
+    with tracing.span("execute", ("c" * 32, "d" * 16)):
+        with tracing.span("fetch"):
+            metadata = tracing.inject()
+    fetch, execute = exporter.spans
+    assert execute["trace_id"] == fetch["trace_id"] == "c" * 32
+    assert execute["parent_id"] == "d" * 16 and fetch["parent_id"] == execute["span_id"]
+    assert tracing.extract(metadata) == ("c" * 32, fetch["span_id"])
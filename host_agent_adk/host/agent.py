@@ -1,43 +1,90 @@
 import asyncio
+import hashlib
 import json
+import os
 import uuid
+from contextvars import ContextVar
 from datetime import datetime
-from typing import Any, AsyncIterable, List
+from typing import Any, AsyncIterable, List, Optional, Union
 
 import httpx
-import nest_asyncio
-from a2a.client import A2ACardResolver
 from a2a.types import (
     AgentCard,
     MessageSendParams,
     SendMessageRequest,
     SendMessageResponse,
     SendMessageSuccessResponse,
+    SendStreamingMessageRequest,
+    SendStreamingMessageSuccessResponse,
     Task,
+    TaskArtifactUpdateEvent,
+    TaskStatusUpdateEvent,
 )
 from dotenv import load_dotenv
 from google.adk import Agent
+from google.adk.agents.callback_context import CallbackContext
 from google.adk.agents.readonly_context import ReadonlyContext
 from google.adk.artifacts import InMemoryArtifactService
 from google.adk.memory.in_memory_memory_service import InMemoryMemoryService
+from google.adk.models import LlmRequest, LlmResponse
 from google.adk.runners import Runner
 from google.adk.sessions import InMemorySessionService
 from google.adk.tools.tool_context import ToolContext
 from google.genai import types
 
+from agent_common import deadline, http_client, set_service, tracing
+from agent_common.blob_store import blob_store
+from agent_common.http_client import get_async_client
+from agent_common.llm_cache import llm_cache
+from agent_common.metrics import a2a_send_seconds, after_model, after_tool, before_model, before_tool, start_metrics_server
+
+from .card_cache import HOST_CARD_TIMEOUT, HOST_CARD_TTL, AgentCardCache
+from .planner import Planner
 from .remote_agent_connection import RemoteAgentConnections
+from .resilience import CircuitOpenError, breaker_for, call_with_policy
 
 load_dotenv()
-nest_asyncio.apply()
+set_service("host")
+http_client.configure("HOST", connect_timeout=5.0)
+
+HOST_MODEL = os.getenv("HOST_MODEL", "gemini-2.0-flash")
+HOST_LLM_CACHE = os.getenv("HOST_LLM_CACHE", "true").lower() not in ("0", "false", "no")
+# Budget for one user request, end to end; the agents it calls get what is left (see agent_common/deadline.py).
+HOST_REQUEST_TIMEOUT = float(os.getenv("HOST_REQUEST_TIMEOUT", "120"))
+# Longest the host waits for one remote agent call, streamed or not.
+HOST_SEND_TIMEOUT = float(os.getenv("HOST_SEND_TIMEOUT", "30"))
+# `adk web` owns the host's HTTP app, so /metrics gets a listener of its own (port 0 disables it).
+HOST_METRICS_HOST = os.getenv("HOST_METRICS_HOST", "127.0.0.1")
+HOST_METRICS_PORT = int(os.getenv("HOST_METRICS_PORT", "10010"))
+
+# Two-agent world for demo:
+DEFAULT_REMOTE_AGENTS = [
+    "http://localhost:10002",  # PayStabl Agent (pay402_and_fetch)
+    "http://localhost:10004",  # Carfax Agent (constructs/knows VIN endpoint)
+]
+
+# Queue of the `stream()` call currently running the tool; remote task events go there.
+_progress_relay: ContextVar[Optional[asyncio.Queue]] = ContextVar("host_progress_relay", default=None)
 
 
 class HostAgent:
     """The Host agent that orchestrates Carfax (data) and PayStabl (payments)."""
 
-    def __init__(self):
+    def __init__(self, remote_agent_addresses: Optional[List[str]] = None):
         self.remote_agent_connections: dict[str, RemoteAgentConnections] = {}
         self.cards: dict[str, AgentCard] = {}
         self.agents: str = ""  # rendered into the instruction
+        self._remote_agent_addresses = list(remote_agent_addresses or [])
+        self._card_cache = AgentCardCache()
+        self._discovered = asyncio.Event()
+        self._refresh_task: Optional[asyncio.Task] = None
+        self.planner = Planner()
+        # Cards cached by a previous run are usable before any network round-trip.
+        for address in self._remote_agent_addresses:
+            entry = self._card_cache.get(address)
+            if entry is not None:
+                self._register_card(address, entry.card)
+        self._render_agents()
         self._agent = self.create_agent()
         self._user_id = "host_agent"
         self._runner = Runner(
@@ -48,22 +95,15 @@ class HostAgent:
             memory_service=InMemoryMemoryService(),
         )
 
-    async def _async_init_components(self, remote_agent_addresses: List[str]):
-        async with httpx.AsyncClient(timeout=30) as client:
-            for address in remote_agent_addresses:
-                card_resolver = A2ACardResolver(client, address)
-                try:
-                    card = await card_resolver.get_agent_card()
-                    remote_connection = RemoteAgentConnections(
-                        agent_card=card, agent_url=date_address(address)
-                    )
-                    self.remote_agent_connections[card.name] = remote_connection
-                    self.cards[card.name] = card
-                except httpx.ConnectError as e:
-                    print(f"ERROR: Failed to get agent card from {address}: {e}")
-                except Exception as e:
-                    print(f"ERROR: Failed to initialize connection for {address}: {e}")
+    def _register_card(self, address: str, card: AgentCard) -> None:
+        if self.cards.get(card.name) == card and card.name in self.remote_agent_connections:
+            return
+        self.remote_agent_connections[card.name] = RemoteAgentConnections(
+            agent_card=card, agent_url=date_address(address)
+        )
+        self.cards[card.name] = card
 
+    def _render_agents(self) -> None:
         agent_info = [
             json.dumps({"name": card.name, "description": card.description})
             for card in self.cards.values()
@@ -71,22 +111,115 @@ class HostAgent:
         print("agent_info:", agent_info)
         self.agents = "\n".join(agent_info) if agent_info else "No agents discovered"
 
+    async def _resolve_card(self, client: httpx.AsyncClient, address: str) -> None:
+        try:
+            card = await call_with_policy(
+                lambda: self._card_cache.resolve(client, address, HOST_CARD_TIMEOUT),
+                breaker_for(date_address(address)),
+                idempotent=True,
+            )
+        except CircuitOpenError as e:
+            print(f"ERROR: Skipping agent card from {address}: {e}")
+            return
+        except asyncio.TimeoutError:
+            print(f"ERROR: Timed out after {HOST_CARD_TIMEOUT}s getting agent card from {address}")
+            return
+        except httpx.HTTPError as e:
+            print(f"ERROR: Failed to get agent card from {address}: {e}")
+            return
+        except Exception as e:
+            print(f"ERROR: Failed to initialize connection for {address}: {e}")
+            return
+        self._register_card(address, card)
+
+    async def _async_init_components(self, remote_agent_addresses: List[str]):
+        """Resolves all cards concurrently; each attempt gets its own HOST_CARD_TIMEOUT deadline."""
+        client = get_async_client()
+        await asyncio.gather(
+            *(self._resolve_card(client, address) for address in remote_agent_addresses)
+        )
+        self._card_cache.save()
+        self._render_agents()
+
+    async def _refresh_loop(self, interval: float):
+        while True:
+            await self._async_init_components(self._remote_agent_addresses)
+            self._discovered.set()
+            if interval <= 0:
+                return
+            await asyncio.sleep(interval)
+
+    def start_background_refresh(self, interval: float = HOST_CARD_TTL) -> asyncio.Task:
+        """Starts (once) a task that discovers cards now and re-checks them every `interval` seconds."""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh_loop(interval))
+            start_metrics_server(HOST_METRICS_HOST, HOST_METRICS_PORT)
+        return self._refresh_task
+
+    async def ensure_discovered(self) -> None:
+        """Starts background discovery; waits for the first round only if no card is known yet."""
+        self.start_background_refresh()
+        if self.cards or self._discovered.is_set():
+            return
+        try:
+            await asyncio.wait_for(self._discovered.wait(), HOST_CARD_TIMEOUT)
+        except asyncio.TimeoutError:
+            print("WARNING: Agent discovery still running; continuing with the agents known so far")
+
     @classmethod
     async def create(cls, remote_agent_addresses: List[str]):
-        instance = cls()
+        instance = cls(remote_agent_addresses)
         await instance._async_init_components(remote_agent_addresses)
+        instance._discovered.set()
         return instance
 
-    def create_agent(self) -> Agent:
+    def create_agent(self, use_llm_cache: bool = HOST_LLM_CACHE) -> Agent:
+        # The planner first: a planned turn makes no model call at all (see planner.py).
+        before_model_callbacks = [self.plan_fast_path, deadline.before_model]
+        after_model_callbacks = [after_model]
+        if use_llm_cache:
+            before_model_callbacks.append(llm_cache.lookup)
+            after_model_callbacks.append(llm_cache.store)
+        # Timing last: a planned or cached answer skips after_model, so it must not start a timing either.
+        before_model_callbacks.append(before_model)
         return Agent(
-            model="gemini-2.0-flash",
+            model=HOST_MODEL,
             name="Host_Agent",
             instruction=self.root_instruction,
             description="Orchestrates VIN lookups by coordinating Carfax (data) and PayStabl (payments).",
-            tools=[self.send_message],
+            tools=[self.send_message, self.read_blob],
+            before_model_callback=before_model_callbacks,
+            after_model_callback=after_model_callbacks,
+            before_tool_callback=[before_tool, tracing.before_tool],
+            after_tool_callback=[after_tool, tracing.after_tool],
         )
 
-    def root_instruction(self, context: ReadonlyContext) -> str:
+    async def plan_fast_path(
+        self, callback_context: CallbackContext, llm_request: LlmRequest
+    ) -> Optional[LlmResponse]:
+        """before_model_callback: answer a known intent by calling the agents directly."""
+        plan = self.planner.plan(_new_user_text(llm_request))
+        if plan is None:
+            return None
+        remote_parent = _invocation_trace(callback_context)
+
+        def send(agent_name: str, task: str):
+            return self.send_task(agent_name, task, remote_parent=remote_parent)
+
+        try:
+            with tracing.span("plan", remote_parent, intent=plan.intent):
+                answer = await self.planner.run(plan, send)
+        except deadline.DeadlineExceeded:
+            raise
+        except Exception as e:
+            print(f"WARNING: planned {plan.intent} failed ({type(e).__name__}: {e}); asking the model")
+            return None
+        if answer is None:
+            return None
+        return LlmResponse(content=types.Content(role="model", parts=[types.Part(text=answer)]))
+
+    async def root_instruction(self, context: ReadonlyContext) -> str:
+        await self.ensure_discovered()
         return f"""
         **Role:** You are the Host Agent. You coordinate between specialized agents:
         - **Carfax Agent**: knows how to construct the VIN data endpoint and parse results.
@@ -99,6 +232,8 @@ class HostAgent:
         3) Return the final parsed result to the user. Be concise and structured (JSON if appropriate).
 
         **Tool:** `send_message(agent_name, task)` — Send plain text commands to a remote agent discovered below.
+        **Tool:** `read_blob(uri, offset, length)` — Read part of a large body that an agent returned as a `file://` URI.
+          Prefer passing the URI on to another agent (e.g. Carfax `extract_vehicle_fields`) over reading it yourself.
 
         **Important Behavior:**
         - Do not ask the user for details the agents already know. Be decisive and iterate quickly.
@@ -116,9 +251,25 @@ class HostAgent:
         - To PayStabl: "pay402_and_fetch {{'url':'http://localhost:9000/vin/TESTVIN'}}"
         """
 
+    async def _drive_runner(self, session_id: str, content: types.Content, queue: asyncio.Queue):
+        try:
+            with tracing.span("query", session_id=session_id), deadline.scope(HOST_REQUEST_TIMEOUT):
+                async with deadline.enforce("query"):
+                    async for event in self._runner.run_async(
+                        user_id=self._user_id, session_id=session_id, new_message=content
+                    ):
+                        queue.put_nowait(("host", event))
+        except Exception as e:
+            queue.put_nowait(("error", e))
+        finally:
+            queue.put_nowait(("done", None))
+
     async def stream(self, query: str, session_id: str) -> AsyncIterable[dict[str, Any]]:
         """
         Streams the agent's response to a given query.
+
+        Status and artifact events from remote agents are relayed as they arrive,
+        interleaved with the host's own progress updates.
         """
         session = await self._runner.session_service.get_session(
             app_name=self._agent.name,
@@ -133,19 +284,54 @@ class HostAgent:
                 state={},
                 session_id=session_id,
             )
-        async for event in self._runner.run_async(
-            user_id=self._user_id, session_id=session.id, new_message=content
-        ):
-            if event.is_final_response():
-                response = ""
-                if event.content and event.content.parts and event.content.parts[0].text:
-                    response = "\n".join([p.text for p in event.content.parts if p.text])
-                yield {"is_task_complete": True, "content": response}
-            else:
-                yield {"is_task_complete": False, "updates": "The host agent is thinking..."}
+        queue: asyncio.Queue = asyncio.Queue()
+        token = _progress_relay.set(queue)
+        try:
+            runner_task = asyncio.create_task(self._drive_runner(session.id, content, queue))
+        finally:
+            _progress_relay.reset(token)
+        try:
+            while True:
+                kind, item = await queue.get()
+                if kind == "done":
+                    break
+                if kind == "error":
+                    raise item
+                if kind == "remote":
+                    yield item
+                elif item.is_final_response():
+                    response = ""
+                    if item.content and item.content.parts and item.content.parts[0].text:
+                        response = "\n".join([p.text for p in item.content.parts if p.text])
+                    yield {"is_task_complete": True, "content": response}
+                else:
+                    yield {"is_task_complete": False, "updates": "The host agent is thinking..."}
+        finally:
+            if not runner_task.done():
+                runner_task.cancel()
 
     async def send_message(self, agent_name: str, task: str, tool_context: ToolContext):
         """Sends a task to a remote agent by name (as discovered from its Agent Card)."""
+        state = tool_context.state
+        return await self.send_task(
+            agent_name,
+            task,
+            task_id=state.get("task_id"),
+            context_id=state.get("context_id"),
+            remote_parent=_invocation_trace(tool_context),
+        )
+
+    async def send_task(
+        self,
+        agent_name: str,
+        task: str,
+        task_id: Optional[str] = None,
+        context_id: Optional[str] = None,
+        remote_parent: Optional[tuple[str, str]] = None,
+    ) -> Optional[list]:
+        """Sends `task` to a remote agent; returns its artifact parts, or None without a task result."""
+        if agent_name not in self.remote_agent_connections:
+            await self.ensure_discovered()
         if agent_name not in self.remote_agent_connections:
             raise ValueError(f"Agent {agent_name} not found")
         client = self.remote_agent_connections[agent_name]
@@ -153,25 +339,39 @@ class HostAgent:
             raise ValueError(f"Client not available for {agent_name}")
 
         # Minimal task/context IDs; keep stable for replies if desired
-        state = tool_context.state
-        task_id = state.get("task_id", str(uuid.uuid4()))
-        context_id = state.get("context_id", str(uuid.uuid4()))
+        task_id = task_id or str(uuid.uuid4())
+        context_id = context_id or str(uuid.uuid4())
         message_id = str(uuid.uuid4())
 
-        payload = {
-            "message": {
-                "role": "user",
-                "parts": [{"type": "text", "text": task}],
-                "messageId": message_id,
-                "taskId": task_id,
-                "contextId": context_id,
-            },
-        }
-
-        message_request = SendMessageRequest(
-            id=message_id, params=MessageSendParams.model_validate(payload)
-        )
-        send_response: SendMessageResponse = await client.send_message(message_request)
+        # The host waits at most HOST_SEND_TIMEOUT for this agent (less if the request's own
+        # deadline is nearer), and the agent is told exactly that much.
+        with tracing.span("send_message", remote_parent, agent=agent_name, task_id=task_id), \
+                deadline.scope(HOST_SEND_TIMEOUT):
+            payload = {
+                "message": {
+                    "role": "user",
+                    "parts": [{"type": "text", "text": task}],
+                    "messageId": message_id,
+                    "taskId": task_id,
+                    "contextId": context_id,
+                    # The remote executor continues this trace under the send_message span,
+                    # and stops once the time left in `timeout_ms` is used up.
+                    "metadata": deadline.inject(tracing.inject()),
+                },
+            }
+
+            async with deadline.enforce(f"send_message to {agent_name}"):
+                if client.supports_streaming:
+                    with a2a_send_seconds.time(target=agent_name, method="message/stream"):
+                        return await self._send_message_streaming(agent_name, client, message_id, payload)
+
+                message_request = SendMessageRequest(
+                    id=message_id, params=MessageSendParams.model_validate(payload)
+                )
+                with a2a_send_seconds.time(target=agent_name, method="message/send"):
+                    send_response: SendMessageResponse = await client.send_message(
+                        message_request, timeout=deadline.timeout(HOST_SEND_TIMEOUT, "send_message")
+                    )
         print("send_response", send_response)
 
         if not isinstance(send_response.root, SendMessageSuccessResponse) or not isinstance(
@@ -190,37 +390,123 @@ class HostAgent:
                     resp.extend(artifact["parts"])
         return resp
 
+    def read_blob(self, uri: str, offset: int = 0, length: int = 4000) -> str:
+        """Reads `length` characters of a blob handle (`file://` URI) returned by a remote agent."""
+        if not blob_store.is_blob_uri(uri):
+            raise ValueError(f"Not a blob URI: {uri}")
+        return blob_store.read_text(uri, offset, length)
+
+    async def _send_message_streaming(
+        self, agent_name: str, client: RemoteAgentConnections, message_id: str, payload: dict
+    ):
+        """`message/stream` variant of send_message: relays each remote event while collecting artifacts."""
+        message_request = SendStreamingMessageRequest(
+            id=message_id, params=MessageSendParams.model_validate(payload)
+        )
+        artifacts: dict[str, list] = {}
+        received_task = False
+        async for response in client.send_message_streaming(message_request):
+            if not isinstance(response.root, SendStreamingMessageSuccessResponse):
+                print("Received a non-success streaming response. Cannot proceed.", response)
+                return
+            event = response.root.result
+            if isinstance(event, Task):
+                received_task = True
+                for artifact in event.artifacts or []:
+                    artifacts[artifact.artifactId] = list(artifact.parts)
+            elif isinstance(event, TaskArtifactUpdateEvent):
+                received_task = True
+                parts = artifacts.setdefault(event.artifact.artifactId, []) if event.append else []
+                parts.extend(event.artifact.parts)
+                artifacts[event.artifact.artifactId] = parts
+            elif isinstance(event, TaskStatusUpdateEvent):
+                received_task = True
+            _relay_remote_event(agent_name, event)
+
+        if not received_task:
+            print("Received a non-task response. Cannot proceed.")
+            return
+        return [
+            part.model_dump(mode="json", exclude_none=True)
+            for parts in artifacts.values()
+            for part in parts
+        ]
+
+
+def _describe_event(agent_name: str, event: Any) -> str:
+    if isinstance(event, TaskStatusUpdateEvent):
+        text = ""
+        if event.status.message:
+            text = " ".join(
+                p.root.text for p in event.status.message.parts if getattr(p.root, "text", None)
+            )
+        return f"{agent_name}: {event.status.state.value}" + (f" - {text}" if text else "")
+    if isinstance(event, TaskArtifactUpdateEvent):
+        return f"{agent_name}: artifact {event.artifact.name or event.artifact.artifactId}"
+    if isinstance(event, Task):
+        return f"{agent_name}: task {event.status.state.value}"
+    return f"{agent_name}: message"
+
+
+def _relay_remote_event(agent_name: str, event: Any) -> None:
+    """Hands a remote task event to the enclosing `stream()` call, if any."""
+    queue = _progress_relay.get()
+    if queue is None:
+        return
+    queue.put_nowait(
+        (
+            "remote",
+            {
+                "is_task_complete": False,
+                "updates": _describe_event(agent_name, event),
+                "agent": agent_name,
+                "event": event,
+            },
+        )
+    )
+
+
+def _new_user_text(llm_request: LlmRequest) -> str:
+    """Text of the user's message when this is the turn's first model call, else ''."""
+    if not llm_request.contents:
+        return ""
+    last = llm_request.contents[-1]
+    parts = last.parts or []
+    if last.role != "user" or any(p.function_response for p in parts):
+        return ""
+    return "\n".join(p.text for p in parts if p.text)
+
+
+def _invocation_trace(context: Union[ToolContext, CallbackContext]) -> Optional[tuple[str, str]]:
+    """Under `adk web` no span encloses the run; group one user turn's hops by invocation id."""
+    if tracing.current_span() is not None:
+        return None
+    digest = hashlib.sha256(context.invocation_id.encode()).hexdigest()
+    return digest[:32], digest[32:48]
+
 
 def date_address(addr: str) -> str:
     # Normalize any trailing slashes (optional helper)
     return addr.rstrip("/")
 
 
+async def create_host_agent(remote_agent_addresses: Optional[List[str]] = None) -> HostAgent:
+    """App-factory entry point: returns immediately and refreshes agent cards in the background."""
+    instance = HostAgent(remote_agent_addresses or DEFAULT_REMOTE_AGENTS)
+    instance.start_background_refresh()
+    return instance
+
+
 def _get_initialized_host_agent_sync():
-    """Synchronously creates and initializes the HostAgent."""
+    """Creates the HostAgent without blocking on the network.
 
-    async def _async_main():
-        # Two-agent world for demo:
-        friend_agent_urls = [
-            "http://localhost:10002",  # PayStabl Agent (pay402_and_fetch)
-            "http://localhost:10004",  # Carfax Agent (constructs/knows VIN endpoint)
-        ]
-        print("initializing host agent")
-        hosting_agent_instance = await HostAgent.create(remote_agent_addresses=friend_agent_urls)
-        print("HostAgent initialized")
-        return hosting_agent_instance.create_agent()
-
-    try:
-        return asyncio.run(_async_main())
-    except RuntimeError as e:
-        if "asyncio.run() cannot be called from a running event loop" in str(e):
-            print(
-                f"Warning: Could not initialize HostAgent with asyncio.run(): {e}. "
-                "This can happen if an event loop is already running (e.g., in Jupyter). "
-                "Consider initializing HostAgent within an async function in your application."
-            )
-        else:
-            raise
+    Only cards cached by earlier runs are registered here; discovery starts on the
+    serving event loop the first time the agent builds its instruction.
+    """
+    print("initializing host agent")
+    hosting_agent_instance = HostAgent(remote_agent_addresses=DEFAULT_REMOTE_AGENTS)
+    print("HostAgent initialized")
+    return hosting_agent_instance.create_agent()
 
 
-root_agent = _get_initialized_host_agent_sync()
\ No newline at end of file
+root_agent = _get_initialized_host_agent_sync()
@@ -0,0 +1,99 @@
+import asyncio
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import httpx
+from a2a.types import AgentCard
+
+from agent_common.metrics import cache_requests_total
+
+AGENT_CARD_PATH = "/.well-known/agent.json"
+HOST_CARD_CACHE = os.getenv(
+    "HOST_CARD_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "a2a-host", "agent_cards.json")
+)
+HOST_CARD_TTL = float(os.getenv("HOST_CARD_TTL", "300"))
+HOST_CARD_TIMEOUT = float(os.getenv("HOST_CARD_TIMEOUT", "5"))
+
+
+@dataclass
+class CachedCard:
+    card: AgentCard
+    etag: Optional[str]
+    fetched_at: float
+
+
+class AgentCardCache:
+    """Agent cards by address, persisted as JSON so they survive restarts.
+
+    A card younger than `ttl` is used without touching the network; an older
+    one is revalidated with `If-None-Match` when the agent sent an ETag.
+    """
+
+    def __init__(self, path: Optional[str] = HOST_CARD_CACHE, ttl: float = HOST_CARD_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._entries: Dict[str, CachedCard] = {}
+        self.load()
+
+    def load(self) -> None:
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                raw = json.load(f)
+            for address, entry in raw.items():
+                self._entries[address] = CachedCard(
+                    card=AgentCard.model_validate(entry["card"]),
+                    etag=entry.get("etag"),
+                    fetched_at=entry.get("fetched_at", 0.0),
+                )
+        except (OSError, ValueError, KeyError) as e:
+            print(f"WARNING: Ignoring unreadable agent card cache {self.path}: {e}")
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        data = {
+            address: {
+                "card": entry.card.model_dump(mode="json", exclude_none=True),
+                "etag": entry.etag,
+                "fetched_at": entry.fetched_at,
+            }
+            for address, entry in self._entries.items()
+        }
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            print(f"WARNING: Could not write agent card cache {self.path}: {e}")
+
+    def get(self, address: str) -> Optional[CachedCard]:
+        return self._entries.get(address)
+
+    def is_fresh(self, entry: CachedCard) -> bool:
+        return time.time() - entry.fetched_at < self.ttl
+
+    async def resolve(self, client: httpx.AsyncClient, address: str, timeout: float = HOST_CARD_TIMEOUT) -> AgentCard:
+        """Return the card for `address`, fetching only when the cached copy is stale."""
+        entry = self._entries.get(address)
+        if entry is not None and self.is_fresh(entry):
+            cache_requests_total.inc(cache="agent_card", result="hit")
+            return entry.card
+        headers = {"If-None-Match": entry.etag} if entry is not None and entry.etag else {}
+        url = address.rstrip("/") + AGENT_CARD_PATH
+        response = await asyncio.wait_for(client.get(url, headers=headers, timeout=timeout), timeout)
+        if response.status_code == 304 and entry is not None:
+            cache_requests_total.inc(cache="agent_card", result="revalidated")
+            entry.fetched_at = time.time()
+            return entry.card
+        cache_requests_total.inc(cache="agent_card", result="miss")
+        response.raise_for_status()
+        card = AgentCard.model_validate(response.json())
+        self._entries[address] = CachedCard(card=card, etag=response.headers.get("etag"), fetched_at=time.time())
+        return card
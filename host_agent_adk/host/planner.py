@@ -0,0 +1,158 @@
+# Deterministic fast path for requests whose workflow is fixed.
+"""A "look up VIN X" request always ends in the same Carfax call, and "pay
+for URL Y" in the same PayStabl call. Deciding that with the model costs one or two model
+turns. The planner recognizes these intents in the user's message and runs
+the calls itself. It runs as the host's first ``before_model`` callback, so it
+works under ``stream()`` and ``adk web`` alike, and the turn lands in the
+session like any other.
+
+An intent matches only when every word of the message, apart from its VINs,
+URLs and tokens, belongs to that intent's small vocabulary. "Fetch the
+vehicle report for VIN X" is planned. "Is VIN X a good buy?" goes to the
+model. Several VINs are looked up concurrently. If a plan raises (agent
+unknown, circuit open), the model handles the turn as before.
+
+Add intents with ``Planner.register``. Set ``HOST_PLANNER=false`` to always ask
+the model.
+"""
+import asyncio
+import json
+import os
+import re
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, List, Optional
+
+HOST_PLANNER = os.getenv("HOST_PLANNER", "true").lower() not in ("0", "false", "no")
+HOST_CARFAX_AGENT = os.getenv("HOST_CARFAX_AGENT", "Carfax Agent")
+HOST_PAYSTABL_AGENT = os.getenv("HOST_PAYSTABL_AGENT", "PayStabl Agent")
+HOST_PLANNER_MAX_VINS = int(os.getenv("HOST_PLANNER_MAX_VINS", "20"))
+
+_VIN_RE = re.compile(r"\b[A-HJ-NPR-Z0-9]{17}\b")
+_URL_RE = re.compile(r"https?://[^\s'\"}<>]+")
+_TOKEN_RE = re.compile(r"""["']?agent_token["']?\s*[:=]\s*["']?([^\s'",}]+)["']?""")
+_WORD_RE = re.compile(r"[a-z0-9_]+")
+
+# (agent name, task text) -> artifact parts, as returned by HostAgent.send_task.
+Send = Callable[[str, str], Awaitable[Optional[list]]]
+
+_COMMON = frozenset(
+    "a an and the for of on to me my please its it this these with get show run pull give return "
+    "fetch json data details info".split()
+)
+_VIN_WORDS = _COMMON | frozenset(
+    "vin vins look up lookup report reports history vehicle vehicles car cars carfax check extract "
+    "field fields make model year mileage odometer".split()
+)
+_PAY_WORDS = _COMMON | frozenset(
+    "pay paid payment for url endpoint x402 402 pay402_and_fetch paywall paywalled body content "
+    "response result agent_token using via".split()
+)
+
+
+@dataclass(frozen=True)
+class Plan:
+    intent: str
+    args: Dict[str, Any]
+
+
+@dataclass(frozen=True)
+class Intent:
+    """A request shape the planner can run without the model."""
+    name: str
+    match: Callable[[str], Optional[Dict[str, Any]]]
+    run: Callable[[Send, Dict[str, Any]], Awaitable[Optional[str]]]
+
+
+def _only_words(text: str, vocabulary: FrozenSet[str]) -> bool:
+    return all(word in vocabulary for word in _WORD_RE.findall(text.lower()))
+
+
+def _parts_text(parts: Optional[list]) -> Optional[str]:
+    """Text (or blob URI) and data of a remote agent's artifact parts."""
+    if not parts:
+        return None
+    out: List[str] = []
+    for part in parts:
+        if part.get("kind") == "data" or "data" in part:
+            out.append(json.dumps(part.get("data"), indent=2))
+        elif part.get("text"):
+            out.append(part["text"])
+        elif (part.get("file") or {}).get("uri"):
+            out.append(part["file"]["uri"])
+    return "\n".join(out) or None
+
+
+def match_vin_lookup(text: str) -> Optional[Dict[str, Any]]:
+    if _URL_RE.search(text):
+        return None
+    # Real VINs carry a check digit; a 17-letter word is not one.
+    vins = [v for v in dict.fromkeys(_VIN_RE.findall(text.upper())) if any(c.isdigit() for c in v)]
+    if not vins or len(vins) > HOST_PLANNER_MAX_VINS:
+        return None
+    if not _only_words(_VIN_RE.sub(" ", text.upper()), _VIN_WORDS):
+        return None
+    return {"vins": vins}
+
+
+async def run_vin_lookup(send: Send, args: Dict[str, Any]) -> Optional[str]:
+    """One Carfax `vehicle_lookup` per VIN (structured, so Carfax skips its model too), concurrently."""
+    replies = await asyncio.gather(
+        *(send(HOST_CARFAX_AGENT, json.dumps({"vin": vin})) for vin in args["vins"])
+    )
+    texts = [_parts_text(parts) for parts in replies]
+    if any(text is None for text in texts):
+        return None
+    return "\n\n".join(texts)
+
+
+def match_pay_and_fetch(text: str) -> Optional[Dict[str, Any]]:
+    urls = list(dict.fromkeys(_URL_RE.findall(text)))
+    if len(urls) != 1:
+        return None
+    token = _TOKEN_RE.search(text)
+    rest = _TOKEN_RE.sub(" agent_token ", _URL_RE.sub(" ", text))
+    words = set(_WORD_RE.findall(rest.lower()))
+    if not words & {"pay", "paid", "payment", "x402", "402", "pay402_and_fetch", "paywall", "paywalled"}:
+        return None
+    if not _only_words(rest, _PAY_WORDS):
+        return None
+    return {"url": urls[0], "agent_token": token.group(1) if token else None}
+
+
+async def run_pay_and_fetch(send: Send, args: Dict[str, Any]) -> Optional[str]:
+    payload = {"url": args["url"], **({"agent_token": args["agent_token"]} if args.get("agent_token") else {})}
+    return _parts_text(await send(HOST_PAYSTABL_AGENT, f"pay402_and_fetch {json.dumps(payload)}"))
+
+
+DEFAULT_INTENTS = [
+    # Pay-and-fetch first: a paywalled URL may itself contain a VIN.
+    Intent("pay_and_fetch", match_pay_and_fetch, run_pay_and_fetch),
+    Intent("vin_lookup", match_vin_lookup, run_vin_lookup),
+]
+
+
+class Planner:
+    def __init__(self, intents: Optional[List[Intent]] = None, enabled: bool = HOST_PLANNER):
+        self.intents = list(DEFAULT_INTENTS if intents is None else intents)
+        self.enabled = enabled
+
+    def register(self, intent: Intent, first: bool = False) -> None:
+        """Add an intent; `first` puts it ahead of the built-in ones."""
+        if first:
+            self.intents.insert(0, intent)
+        else:
+            self.intents.append(intent)
+
+    def plan(self, text: str) -> Optional[Plan]:
+        if not self.enabled or not text or not text.strip():
+            return None
+        for intent in self.intents:
+            args = intent.match(text)
+            if args is not None:
+                return Plan(intent.name, args)
+        return None
+
+    async def run(self, plan: Plan, send: Send) -> Optional[str]:
+        """The answer for the user, or None when the plan got no usable result."""
+        intent = next(i for i in self.intents if i.name == plan.intent)
+        return await intent.run(send, plan.args)
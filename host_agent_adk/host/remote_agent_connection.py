@@ -1,17 +1,25 @@
-from typing import Callable
+import asyncio
+from typing import AsyncIterator, Callable, Optional
 
-import httpx
 from a2a.client import A2AClient
 from a2a.types import (
     AgentCard,
+    GetTaskRequest,
+    GetTaskResponse,
     SendMessageRequest,
     SendMessageResponse,
+    SendStreamingMessageRequest,
+    SendStreamingMessageResponse,
     Task,
     TaskArtifactUpdateEvent,
     TaskStatusUpdateEvent,
 )
 from dotenv import load_dotenv
 
+from agent_common.http_client import get_async_client
+
+from .resilience import HOST_RETRY_ATTEMPTS, backoff, breaker_for, call_with_policy, is_transient, never_sent
+
 load_dotenv()
 
 TaskCallbackArg = Task | TaskStatusUpdateEvent | TaskArtifactUpdateEvent
@@ -19,13 +27,18 @@ TaskUpdateCallback = Callable[[TaskCallbackArg, AgentCard], Task]
 
 
 class RemoteAgentConnections:
-    """A class to hold the connections to the remote agents."""
+    """A class to hold the connections to the remote agents.
+
+    All connections share one pooled httpx client; calls go through the
+    agent's circuit breaker and retry policy (see resilience.py).
+    """
 
     def __init__(self, agent_card: AgentCard, agent_url: str):
         print(f"agent_card: {agent_card}")
         print(f"agent_url: {agent_url}")
-        self._httpx_client = httpx.AsyncClient(timeout=30)
+        self._httpx_client = get_async_client()
         self.agent_client = A2AClient(self._httpx_client, agent_card, url=agent_url)
+        self.breaker = breaker_for(agent_url)
         self.card = agent_card
         self.conversation_name = None
         self.conversation = None
@@ -35,6 +48,43 @@ class RemoteAgentConnections:
         return self.card
 
     async def send_message(
-        self, message_request: SendMessageRequest
+        self, message_request: SendMessageRequest, timeout: Optional[float] = None
     ) -> SendMessageResponse:
-        return await self.agent_client.send_message(message_request)
+        # Not idempotent (it may pay): repeated only if the request never left the host.
+        http_kwargs = {"timeout": timeout} if timeout is not None else None
+        return await call_with_policy(
+            lambda: self.agent_client.send_message(message_request, http_kwargs=http_kwargs), self.breaker
+        )
+
+    async def get_task(self, request: GetTaskRequest) -> GetTaskResponse:
+        return await call_with_policy(
+            lambda: self.agent_client.get_task(request), self.breaker, idempotent=True
+        )
+
+    @property
+    def supports_streaming(self) -> bool:
+        return bool(self.card.capabilities and self.card.capabilities.streaming)
+
+    async def send_message_streaming(
+        self, message_request: SendStreamingMessageRequest
+    ) -> AsyncIterator[SendStreamingMessageResponse]:
+        """Streams the task's events; the stream is reopened only if it never reached the agent."""
+        for attempt in range(max(1, HOST_RETRY_ATTEMPTS)):
+            self.breaker.before_call()
+            started = False
+            try:
+                async for response in self.agent_client.send_message_streaming(message_request):
+                    if not started:
+                        started = True
+                        self.breaker.record_success()
+                    yield response
+            except Exception as e:
+                if is_transient(e):
+                    self.breaker.record_failure()
+                if started or not never_sent(e) or attempt == HOST_RETRY_ATTEMPTS - 1:
+                    raise
+                await asyncio.sleep(backoff(attempt))
+                continue
+            if not started:
+                self.breaker.record_success()
+            return
@@ -0,0 +1,190 @@
+# Retry, hedging and circuit breaking for calls from the host to remote agents.
+"""Which calls may be repeated decides what the policy does:
+
+* Any call is retried (with jittered exponential backoff) when the request
+  never reached the agent: connect errors and pool timeouts.
+* Idempotent calls (agent cards, ``tasks/get``) are also retried after
+  transport errors and 502/503/504. After ``HOST_HEDGE_DELAY`` seconds
+  without an answer, a second copy is started and the first answer wins.
+* ``message/send`` and ``message/stream`` are never repeated once the agent
+  may have seen them. A second copy could pay twice.
+
+Each agent address has a circuit breaker. After ``HOST_BREAKER_FAILURES``
+transport failures with no success in between it opens (other errors, such as
+a JSON-RPC 500, neither count nor reset the count), and calls fail immediately with
+``CircuitOpenError`` for ``HOST_BREAKER_RESET`` seconds. Then one call is let
+through as a probe; its success closes the breaker.
+"""
+import asyncio
+import logging
+import os
+import random
+import time
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+import httpx
+from a2a.client.errors import A2AClientHTTPError
+
+from agent_common.metrics import registry
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+HOST_RETRY_ATTEMPTS = int(os.getenv("HOST_RETRY_ATTEMPTS", "3"))
+HOST_RETRY_BASE_DELAY = float(os.getenv("HOST_RETRY_BASE_DELAY", "0.1"))
+HOST_RETRY_MAX_DELAY = float(os.getenv("HOST_RETRY_MAX_DELAY", "2"))
+HOST_HEDGE_DELAY = float(os.getenv("HOST_HEDGE_DELAY", "1"))  # 0 disables hedging
+HOST_BREAKER_FAILURES = int(os.getenv("HOST_BREAKER_FAILURES", "5"))
+HOST_BREAKER_RESET = float(os.getenv("HOST_BREAKER_RESET", "30"))
+
+_NOT_SENT = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+_TRANSIENT_STATUS = (502, 503, 504)
+
+a2a_retries_total = registry.counter("a2a_retries_total", "Repeated or hedged calls to remote agents.")
+a2a_circuit_total = registry.counter("a2a_circuit_total", "Circuit breaker transitions and fast failures.")
+
+
+class CircuitOpenError(Exception):
+    """The remote agent's circuit breaker is open; the call was not attempted."""
+
+
+def _chain(exc: BaseException):
+    while exc is not None:
+        yield exc
+        exc = exc.__cause__ or exc.__context__
+
+
+def never_sent(exc: BaseException) -> bool:
+    """True when the request cannot have reached the agent, so repeating it is always safe."""
+    return any(isinstance(e, _NOT_SENT) for e in _chain(exc))
+
+
+def is_transient(exc: BaseException) -> bool:
+    """Transport failures and gateway errors: the agent (or the way to it) is unhealthy."""
+    for e in _chain(exc):
+        if isinstance(e, (httpx.TransportError, asyncio.TimeoutError)):
+            return True
+        if isinstance(e, httpx.HTTPStatusError) and e.response.status_code in _TRANSIENT_STATUS:
+            return True
+        if isinstance(e, A2AClientHTTPError) and e.status_code in _TRANSIENT_STATUS:
+            return True
+    return False
+
+
+def backoff(attempt: int) -> float:
+    """Full-jitter exponential backoff for the `attempt`-th retry (0-based)."""
+    return random.uniform(0, min(HOST_RETRY_MAX_DELAY, HOST_RETRY_BASE_DELAY * 2 ** attempt))
+
+
+class CircuitBreaker:
+    def __init__(self, target: str, failures: int = HOST_BREAKER_FAILURES, reset_after: float = HOST_BREAKER_RESET):
+        self.target = target
+        self.threshold = max(1, failures)
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "open" if time.monotonic() - self.opened_at < self.reset_after else "half_open"
+
+    def before_call(self) -> None:
+        state = self.state
+        if state == "open":
+            a2a_circuit_total.inc(target=self.target, event="rejected")
+            raise CircuitOpenError(f"{self.target} is failing; not retrying for {self.reset_after:g}s")
+        if state == "half_open":
+            # Let this call probe; the others keep failing fast for another period.
+            self.opened_at = time.monotonic()
+            self.failures = self.threshold - 1
+            a2a_circuit_total.inc(target=self.target, event="probe")
+
+    def record_success(self) -> None:
+        if self.opened_at is not None:
+            a2a_circuit_total.inc(target=self.target, event="closed")
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.failures >= self.threshold:
+            if self.opened_at is None:
+                a2a_circuit_total.inc(target=self.target, event="opened")
+                logger.warning("%s failed %d times in a row; circuit open", self.target, self.failures)
+            self.opened_at = time.monotonic()
+
+    def record(self, exc: Optional[BaseException]) -> None:
+        """Count a finished call; only transport-level failures count against the agent.
+
+        Other errors leave the count alone: an agent alternating 503s and 500s is still failing.
+        """
+        if exc is None:
+            self.record_success()
+        elif is_transient(exc):
+            self.record_failure()
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def breaker_for(target: str) -> CircuitBreaker:
+    """The breaker shared by every caller of `target` (an agent address)."""
+    target = target.rstrip("/")
+    breaker = _breakers.get(target)
+    if breaker is None:
+        breaker = _breakers[target] = CircuitBreaker(target)
+    return breaker
+
+
+async def _hedged(call: Callable[[], Awaitable[T]], delay: float, target: str) -> T:
+    """Run `call`; if it has not finished after `delay` seconds, race a second copy."""
+    tasks = [asyncio.ensure_future(call())]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if not done:
+            a2a_retries_total.inc(target=target, reason="hedge")
+            tasks.append(asyncio.ensure_future(call()))
+        pending, error = set(tasks), None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+async def call_with_policy(
+    call: Callable[[], Awaitable[T]],
+    breaker: CircuitBreaker,
+    idempotent: bool = False,
+    attempts: int = HOST_RETRY_ATTEMPTS,
+    hedge_delay: float = HOST_HEDGE_DELAY,
+) -> T:
+    """Run `call` under `breaker`, retrying (and for idempotent calls, hedging) as described above."""
+    attempts = max(1, attempts)
+    for attempt in range(attempts):
+        breaker.before_call()
+        try:
+            if idempotent and hedge_delay > 0:
+                result = await _hedged(call, hedge_delay, breaker.target)
+            else:
+                result = await call()
+        except Exception as e:
+            breaker.record(e)
+            retry = never_sent(e) or (idempotent and is_transient(e))
+            if not retry or attempt == attempts - 1:
+                raise
+            a2a_retries_total.inc(target=breaker.target, reason="not_sent" if never_sent(e) else "transient")
+            await asyncio.sleep(backoff(attempt))
+            continue
+        breaker.record_success()
+        return result
+    raise AssertionError("unreachable")
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Import the host the way `adk web` does: as the `host` package next to this directory.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+from a2a.types import InternalError, JSONRPCErrorResponse, SendMessageResponse
+
+from agent_common import deadline
+
+from host import agent as host_agent
+from host.agent import HostAgent
+
+
+class FakeConnection:
+    def __init__(self, streaming=False):
+        self.supports_streaming = streaming
+        self.requests = []
+
+    async def send_message(self, request, timeout=None):
+        self.requests.append((request, timeout))
+        return SendMessageResponse(root=JSONRPCErrorResponse(id=request.id, error=InternalError()))
+
+
+def _host(connection):
+    host = HostAgent([])
+    host.remote_agent_connections["Carfax Agent"] = connection
+    return host
+
+
+def test_send_advertises_the_send_timeout(monkeypatch):
+    monkeypatch.setattr(host_agent, "HOST_SEND_TIMEOUT", 5.0)
+    connection = FakeConnection()
+
+    async def send():
+        with deadline.scope(120):  # the request's budget, as under stream()
+            return await _host(connection).send_task("Carfax Agent", "hello")
+
+    assert asyncio.run(send()) is None
+    request, timeout = connection.requests[0]
+    budget = deadline.extract(request.params.message.metadata)
+    assert budget <= 5.0 and timeout <= 5.0
+
+
+def test_send_respects_a_nearer_request_deadline(monkeypatch):
+    monkeypatch.setattr(host_agent, "HOST_SEND_TIMEOUT", 30.0)
+    connection = FakeConnection()
+
+    async def send():
+        with deadline.scope(2):
+            return await _host(connection).send_task("Carfax Agent", "hello")
+
+    asyncio.run(send())
+    request, timeout = connection.requests[0]
+    assert deadline.extract(request.params.message.metadata) <= 2 and timeout <= 2
+
+
+def test_streaming_send_is_bounded_by_the_send_timeout(monkeypatch):
+    monkeypatch.setattr(host_agent, "HOST_SEND_TIMEOUT", 0.1)
+    host = _host(FakeConnection(streaming=True))
+    seen = {}
+
+    async def stream(agent_name, client, message_id, payload):
+        seen["budget"] = deadline.extract(payload["message"]["metadata"])
+        await asyncio.sleep(5)
+
+    monkeypatch.setattr(host, "_send_message_streaming", stream)
+    with pytest.raises(deadline.DeadlineExceeded):
+        asyncio.run(host.send_task("Carfax Agent", "hello"))
+    assert seen["budget"] <= 0.1
@@ -0,0 +1,86 @@
+import asyncio
+import json
+
+import pytest
+
+from host.planner import Intent, Planner, match_pay_and_fetch, match_vin_lookup
+
+VIN = "JHMGE8H58DC009182"
+VIN2 = "1HGCM82633A004352"
+URL = f"https://proxy402.com/rZ0Or4VKA9?vin={VIN}"
+
+
+@pytest.mark.parametrize("text", [
+    f"Fetch the vehicle report for VIN {VIN} and extract its fields.",
+    f"look up {VIN.lower()}",
+    f"carfax {VIN}, {VIN2} please",
+])
+def test_vin_lookup_matches_its_vocabulary(text):
+    assert match_vin_lookup(text)["vins"][0] == VIN
+
+
+@pytest.mark.parametrize("text", [
+    f"Is VIN {VIN} a good buy?",
+    f"Compare {VIN} with my old car",
+    "Look up VIN ABCDEFGHJKLMNPRST",  # no digit: not a VIN
+    f"report for {URL}",
+    "show me the report",
+])
+def test_vin_lookup_leaves_other_questions_to_the_model(text):
+    assert match_vin_lookup(text) is None
+
+
+def test_vin_lookup_dedupes_vins():
+    assert match_vin_lookup(f"look up {VIN} {VIN2} {VIN}") == {"vins": [VIN, VIN2]}
+
+
+def test_pay_and_fetch_matches_its_vocabulary():
+    # PayStabl's own skill example.
+    assert match_pay_and_fetch(f"Pay for this URL and return the JSON: url: {URL}") == {"url": URL, "agent_token": None}
+    assert match_pay_and_fetch(f"pay for {URL} using agent_token: tok-1") == {"url": URL, "agent_token": "tok-1"}
+    assert match_pay_and_fetch(f"pay402_and_fetch {URL}") == {"url": URL, "agent_token": None}
+
+
+@pytest.mark.parametrize("text", [
+    f"what does {URL} cost?",
+    f"fetch {URL}",  # no payment word
+    f"pay for {URL} and {URL}x",  # two URLs
+])
+def test_pay_and_fetch_leaves_other_requests_to_the_model(text):
+    assert match_pay_and_fetch(text) is None
+
+
+def test_plan_prefers_pay_and_fetch_for_a_url_with_a_vin():
+    plan = Planner(enabled=True).plan(f"pay for {URL}")
+    assert plan.intent == "pay_and_fetch"
+
+
+def test_disabled_planner_plans_nothing():
+    assert Planner(enabled=False).plan(f"look up {VIN}") is None
+
+
+def test_run_vin_lookup_sends_structured_requests():
+    sent = []
+
+    async def send(agent, text):
+        sent.append((agent, json.loads(text)))
+        return [{"kind": "data", "data": {"vin": json.loads(text)["vin"]}}]
+
+    planner = Planner(enabled=True)
+    answer = asyncio.run(planner.run(planner.plan(f"look up {VIN} {VIN2}"), send))
+    assert [args for _, args in sent] == [{"vin": VIN}, {"vin": VIN2}]
+    assert VIN in answer and VIN2 in answer
+
+
+def test_run_returns_none_when_an_agent_gives_nothing():
+    async def send(agent, text):
+        return None
+
+    planner = Planner(enabled=True)
+    assert asyncio.run(planner.run(planner.plan(f"look up {VIN}"), send)) is None
+
+
+def test_registered_intent_can_go_first():
+    planner = Planner(enabled=True)
+    planner.register(Intent("echo", lambda text: {"text": text}, None), first=True)
+    assert planner.plan(f"look up {VIN}").intent == "echo"
@@ -0,0 +1,71 @@
+import asyncio
+
+import httpx
+import pytest
+
+from host import resilience
+from host.resilience import CircuitBreaker, CircuitOpenError, call_with_policy
+
+
+def _status_error(code):
+    request = httpx.Request("POST", "http://carfax.test/")
+    return httpx.HTTPStatusError(str(code), request=request, response=httpx.Response(code, request=request))
+
+
+def test_non_transient_errors_do_not_reset_the_count(caplog):
+    breaker = CircuitBreaker("http://carfax.test", failures=3)
+    for exc in (_status_error(503), _status_error(500), _status_error(503), ValueError("bad"), _status_error(503)):
+        breaker.record(exc)
+    assert breaker.state == "open"
+    assert "http://carfax.test failed 3 times in a row; circuit open" in caplog.text
+
+
+def test_success_resets_the_count():
+    breaker = CircuitBreaker("http://carfax.test", failures=2)
+    breaker.record(_status_error(503))
+    breaker.record(None)
+    breaker.record(_status_error(503))
+    assert breaker.state == "closed" and breaker.failures == 1
+
+
+def test_open_breaker_fails_fast_then_probes(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(resilience.time, "monotonic", lambda: now[0])
+    breaker = CircuitBreaker("http://carfax.test", failures=1, reset_after=10)
+    breaker.record(httpx.ConnectError("refused"))
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    now[0] = 11
+    breaker.before_call()  # the probe
+    breaker.record(None)
+    assert breaker.state == "closed"
+
+
+def test_message_send_is_not_retried_once_it_may_have_arrived(monkeypatch):
+    monkeypatch.setattr(resilience, "backoff", lambda attempt: 0)
+    calls = []
+
+    async def send():
+        calls.append(1)
+        if len(calls) == 1:
+            raise httpx.ConnectError("refused")  # never sent: safe to repeat
+        raise httpx.ReadTimeout("no answer")  # may have been seen: not repeated
+
+    with pytest.raises(httpx.ReadTimeout):
+        asyncio.run(call_with_policy(send, CircuitBreaker("http://carfax.test"), attempts=5))
+    assert len(calls) == 2
+
+
+def test_idempotent_call_is_retried_after_a_gateway_error(monkeypatch):
+    monkeypatch.setattr(resilience, "backoff", lambda attempt: 0)
+    calls = []
+
+    async def get_card():
+        calls.append(1)
+        if len(calls) == 1:
+            raise _status_error(502)
+        return "card"
+
+    breaker = CircuitBreaker("http://carfax.test")
+    assert asyncio.run(call_with_policy(get_card, breaker, idempotent=True, hedge_delay=0)) == "card"
+    assert breaker.failures == 0
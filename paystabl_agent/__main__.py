@@ -1,18 +1,9 @@
+import argparse
 import logging
 import os
 
 import uvicorn
-from a2a.server.apps import A2AStarletteApplication
-from a2a.server.request_handlers import DefaultRequestHandler
-from a2a.server.tasks import InMemoryTaskStore
-from a2a.types import AgentCapabilities, AgentCard, AgentSkill
-from agent import create_agent
-from agent_executor import PayStablAgentExecutor
 from dotenv import load_dotenv
-from google.adk.artifacts import InMemoryArtifactService
-from google.adk.memory.in_memory_memory_service import InMemoryMemoryService
-from google.adk.runners import Runner
-from google.adk.sessions import InMemorySessionService
 
 load_dotenv()
 
@@ -25,10 +16,41 @@ class MissingAPIKeyError(Exception):
     pass
 
 
-def main():
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="PayStabl A2A agent server")
+    parser.add_argument("--host", default=os.getenv("PAYSTABL_HOST", "localhost"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PAYSTABL_PORT", "10002")))
+    parser.add_argument(
+        "--public-url",
+        default=os.getenv("PAYSTABL_PUBLIC_URL", ""),
+        help="URL advertised in the agent card (default: http://<host>:<port>/)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.getenv("PAYSTABL_WORKERS", "1")),
+        help="worker processes; >1 shares tasks and sessions through SQLite, "
+        "but not receipts or ledger reads, and tasks/cancel and tasks/resubscribe "
+        "need sticky routing (see README)",
+    )
+    parser.add_argument(
+        "--store",
+        choices=["memory", "sqlite"],
+        default=os.getenv("AGENT_STORE"),
+        help="task/session store (default: memory for one worker, sqlite for several)",
+    )
+    parser.add_argument(
+        "--graceful-timeout",
+        type=float,
+        default=float(os.getenv("PAYSTABL_GRACEFUL_TIMEOUT", "30")),
+        help="seconds to let in-flight requests finish on shutdown",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
     """Starts the PayStabl A2A agent server."""
-    host = "localhost"
-    port = 10002
+    args = parse_args(argv)
     try:
         # Require API key unless using Vertex
         if not os.getenv("GOOGLE_GENAI_USE_VERTEXAI") == "TRUE":
@@ -37,53 +59,33 @@ def main():
                     "GOOGLE_API_KEY environment variable not set and GOOGLE_GENAI_USE_VERTEXAI is not TRUE."
                 )
 
-        capabilities = AgentCapabilities(streaming=True)
-
-        # Core capability: pay x402 endpoints
-        skill = AgentSkill(
-            id="pay_402",
-            name="Pay x402 Endpoint",
-            description=(
-                "Pays a 402-paywalled URL using stablecoins and returns the provider's result. "
-                "Inputs: { url, agent_token }."
-            ),
-            tags=["payments", "stablecoin", "x402", "agents"],
-            examples=["Pay for this URL and return the JSON: url: https://proxy402.com/rZ0Or4VKA9?vin=JHMGE8H58DC009182"],
-        )
-
-        agent_card = AgentCard(
-            name="PayStabl Agent",
-            description="An agent that executes payments for AI agents (x402 URLs, direct transfers, balances).",
-            url=f"http://{host}:{port}/",
-            version="1.0.0",
-            defaultInputModes=["text/plain", "application/json"],
-            defaultOutputModes=["text/plain", "application/json"],
-            capabilities=capabilities,
-            skills=[skill],
+        workers = max(1, args.workers)
+        store = args.store or ("sqlite" if workers > 1 else "memory")
+        if workers > 1 and store == "memory":
+            logger.warning("--store memory with %d workers: tasks are not shared between workers", workers)
+        if workers > 1:
+            logger.warning(
+                "%d workers: payment receipts and ledger reads are cached per worker, "
+                "so the same URL paid on two workers is paid twice", workers
+            )
+            # A running task's queue lives in the worker executing it.
+            logger.warning(
+                "%d workers: tasks/cancel and tasks/resubscribe only reach a running task "
+                "if the load balancer routes them to the worker running it", workers
+            )
+        # Read at import time by the app modules, in this process and in every worker.
+        os.environ.update(PAYSTABL_HOST=args.host, PAYSTABL_PORT=str(args.port), AGENT_STORE=store)
+        if args.public_url:
+            os.environ["PAYSTABL_PUBLIC_URL"] = args.public_url
+
+        uvicorn.run(
+            "server:create_app",
+            factory=True,
+            host=args.host,
+            port=args.port,
+            workers=workers,
+            timeout_graceful_shutdown=args.graceful_timeout,
         )
-
-        adk_agent = create_agent()
-        runner = Runner(
-            app_name=agent_card.name,
-            agent=adk_agent,
-            artifact_service=InMemoryArtifactService(),
-            session_service=InMemorySessionService(),
-            memory_service=InMemoryMemoryService(),
-        )
-
-        agent_executor = PayStablAgentExecutor(runner)
-
-        request_handler = DefaultRequestHandler(
-            agent_executor=agent_executor,
-            task_store=InMemoryTaskStore(),
-        )
-
-        server = A2AStarletteApplication(
-            agent_card=agent_card,
-            http_handler=request_handler,
-        )
-
-        uvicorn.run(server.build(), host=host, port=port)
     except MissingAPIKeyError as e:
         logger.error(f"Error: {e}")
         exit(1)
@@ -0,0 +1,131 @@
+# paystabl_agent/admission.py
+"""Admission control for PayStabl tasks.
+
+At most ``PAYSTABL_MAX_IN_FLIGHT`` tasks run (LLM + MCP payment) at once per
+worker. The rest wait in a priority queue: ``interactive`` before ``batch``,
+FIFO within a priority. A task is rejected when the queue already holds
+``PAYSTABL_MAX_QUEUE`` tasks, or when it has waited ``PAYSTABL_QUEUE_TIMEOUT``
+seconds without a slot. Under a burst, callers then get a quick rejection
+instead of every payment slowing down.
+
+The priority comes from the A2A message metadata (``{"priority": "batch"}``);
+anything else is treated as interactive.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from agent_common import deadline
+from agent_common.metrics import gauge, registry
+
+logger = logging.getLogger(__name__)
+
+PAYSTABL_MAX_IN_FLIGHT = int(os.getenv("PAYSTABL_MAX_IN_FLIGHT", "8"))
+PAYSTABL_MAX_QUEUE = int(os.getenv("PAYSTABL_MAX_QUEUE", "256"))
+PAYSTABL_QUEUE_TIMEOUT = float(os.getenv("PAYSTABL_QUEUE_TIMEOUT", "30"))
+
+PRIORITIES = {"interactive": 0, "batch": 1}
+
+admission_wait_seconds = registry.histogram(
+    "admission_wait_seconds", "Time a task waited for an execution slot."
+)
+
+
+class AdmissionRejected(Exception):
+    """The task was not admitted (queue full or waited too long)."""
+
+
+def priority_of(metadata: Optional[Dict[str, Any]]) -> str:
+    value = (metadata or {}).get("priority")
+    return value if value in PRIORITIES else "interactive"
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        max_in_flight: int = PAYSTABL_MAX_IN_FLIGHT,
+        max_queue: int = PAYSTABL_MAX_QUEUE,
+        queue_timeout: float = PAYSTABL_QUEUE_TIMEOUT,
+    ):
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self._queue: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self.admitted = 0
+        self.rejected = 0
+
+    def queue_depth(self) -> int:
+        return sum(1 for _, _, waiter in self._queue if not waiter.done())
+
+    def _wake_next(self) -> None:
+        """Hand a freed slot to the highest-priority live waiter."""
+        while self._queue and self.in_flight < self.max_in_flight:
+            _, _, waiter = heapq.heappop(self._queue)
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    async def _acquire(self, priority: str) -> float:
+        start = time.monotonic()
+        if self.in_flight < self.max_in_flight and not self.queue_depth():
+            self.in_flight += 1
+            return 0.0
+        if self.queue_depth() >= self.max_queue:
+            self.rejected += 1
+            admission_wait_seconds.observe(0.0, priority=priority, outcome="queue_full")
+            raise AdmissionRejected(f"queue full ({self.max_queue} tasks waiting)")
+        # A caller that will give up sooner is not kept queued past its deadline.
+        queue_timeout = deadline.timeout(self.queue_timeout, "admission")
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (PRIORITIES[priority], next(self._seq), waiter))
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), queue_timeout)
+        except asyncio.TimeoutError:
+            if waiter.done():  # admitted just as the timeout fired
+                return time.monotonic() - start
+            waiter.cancel()
+            self.rejected += 1
+            admission_wait_seconds.observe(time.monotonic() - start, priority=priority, outcome="timeout")
+            raise AdmissionRejected(f"no slot within {queue_timeout:g}s")
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._release()  # the slot was already ours; give it back
+            else:
+                waiter.cancel()
+            raise
+        return time.monotonic() - start
+
+    def _release(self) -> None:
+        self.in_flight -= 1
+        self._wake_next()
+
+    @asynccontextmanager
+    async def slot(self, priority: str = "interactive") -> AsyncIterator[float]:
+        """Hold one execution slot for the block; yields the seconds spent queued."""
+        waited = await self._acquire(priority)
+        self.admitted += 1
+        admission_wait_seconds.observe(waited, priority=priority, outcome="admitted")
+        try:
+            yield waited
+        finally:
+            self._release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queue_depth(),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+        }
+
+
+admission = AdmissionController()
+gauge("admission_in_flight", "PayStabl tasks holding an execution slot.", lambda: admission.in_flight)
+gauge("admission_queue_depth", "PayStabl tasks waiting for an execution slot.", admission.queue_depth)
@@ -1,34 +1,117 @@
 # paystabl_agent/agent.py
+import logging
 import os
+from typing import Any, Optional
+
 from google.adk.agents.llm_agent import Agent as LlmAgent
-from google.adk.tools.mcp_tool.mcp_toolset import MCPToolset, StdioServerParameters
+from google.adk.tools.base_tool import BaseTool
+from google.adk.tools.tool_context import ToolContext
+
+from agent_common import deadline, set_service, tracing
+from agent_common.blob_store import blob_store
+from agent_common.llm_cache import llm_cache
+from agent_common.metrics import after_model, after_tool, before_model, before_tool
+from agent_common.session_compaction import session_compactor
+
+from ledger_cache import PAYSTABL_LEDGER_CACHE, ledger_cache, payment_history_page
+from mcp_transport import create_paystabl_toolset
+from receipt_cache import PAYSTABL_RECEIPT_REUSE, receipt_cache
+
+logger = logging.getLogger(__name__)
+set_service("paystabl")
 
-PAYSTABL_MCP_URL = os.getenv("PAYSTABL_MCP_URL", "http://localhost:3000/mcp")
-PAYSTABL_AGENT_TOKEN = os.getenv("PAYSTABL_AGENT_TOKEN", "")
+PAYSTABL_MODEL = os.getenv("PAYSTABL_MODEL", "gemini-2.0-flash")
+PAYSTABL_LLM_CACHE = os.getenv("PAYSTABL_LLM_CACHE", "true").lower() not in ("0", "false", "no")
+PAYSTABL_MCP_WARM = os.getenv("PAYSTABL_MCP_WARM", "true").lower() not in ("0", "false", "no")
 
 INSTRUCTION = """
 **Role:** You are the PayStabl Payments Agent. Handle x402 payments and simple transfers.
 - Use `pay_x402_api(url, agent_token?)` for HTTP 402 paywalls.
 - Use `pay_address(to, amount[, agent_token])` for direct transfers.
 - Use `get_balance()` and `get_payment_history()` for wallet balance and transaction history respectively.
+- Use `payment_history_page(offset, limit)` to page through a long history instead of fetching it all.
 Stay concise and strictly payment-focused.
+If a tool result is a `file://` URI, return that URI verbatim as the whole answer; do not summarize it.
 """
 
-def create_agent() -> LlmAgent:
-    paystabl_mcp = MCPToolset(
-        connection_params=StdioServerParameters(
-            command="node",
-            args=["stdio_bridge.js"],
-            env={
-                "MCP_HTTP_URL": PAYSTABL_MCP_URL,
-                **({"MCP_BEARER": f"Bearer {PAYSTABL_AGENT_TOKEN}"} if PAYSTABL_AGENT_TOKEN else {})
-            },
-        )
-    )
+
+def spill_large_tool_output(
+    tool: BaseTool, args: dict[str, Any], tool_context: ToolContext, tool_response: Any
+) -> Optional[dict]:
+    """Replace large text blocks in an MCP tool result with blob-store URIs.
+
+    Paid response bodies can be megabytes; the LLM (and every agent after it)
+    then only carries the handle.
+    """
+    response = tool_response.model_dump(mode="json", exclude_none=True) if hasattr(tool_response, "model_dump") else tool_response
+    if not isinstance(response, dict) or not isinstance(response.get("content"), list):
+        return None
+    changed = False
+    for block in response["content"]:
+        text = block.get("text") if isinstance(block, dict) and block.get("type") == "text" else None
+        if text and len(text) >= blob_store.min_bytes:
+            block["text"] = blob_store.spill(text)
+            changed = True
+    return response if changed else None
+
+
+def create_agent(use_llm_cache: bool = PAYSTABL_LLM_CACHE) -> LlmAgent:
+    # In-process streamable-HTTP MCP by default; the node stdio bridge is the
+    # fallback (PAYSTABL_MCP_TRANSPORT=http|stdio|auto, see mcp_transport.py).
+    paystabl_mcp = create_paystabl_toolset()
+
+    before_tool_callbacks = [before_tool, tracing.before_tool]
+    # Capture before spilling: the proof is read from the untouched tool result.
+    after_tool_callbacks = [after_tool, tracing.after_tool, spill_large_tool_output]
+    if PAYSTABL_RECEIPT_REUSE:
+        before_tool_callbacks.append(receipt_cache.replay)
+        after_tool_callbacks.insert(2, receipt_cache.capture)
+    tools = [paystabl_mcp]
+    if PAYSTABL_LEDGER_CACHE:
+        # Reads are served before the MCP call; payments invalidate after it (see ledger_cache.py).
+        ledger_cache.bind(paystabl_mcp)
+        before_tool_callbacks.append(ledger_cache.serve)
+        after_tool_callbacks.insert(-1, ledger_cache.record)
+        tools.append(payment_history_page)
+
+    before_model_callbacks = [deadline.before_model, session_compactor]
+    after_model_callbacks = [after_model]
+    if use_llm_cache:
+        # After compaction, so the key covers the compacted request (see agent_common/llm_cache.py).
+        before_model_callbacks.append(llm_cache.lookup)
+        after_model_callbacks.append(llm_cache.store)
+    # Timing last: a cached answer skips after_model, so it must not start a timing either.
+    before_model_callbacks.append(before_model)
 
     return LlmAgent(
-        model="gemini-2.0-flash",
+        model=PAYSTABL_MODEL,
         name="PayStabl_Agent",
         instruction=INSTRUCTION,
-        tools=[paystabl_mcp],
+        tools=tools,
+        before_tool_callback=before_tool_callbacks,
+        # Timing first: spill_large_tool_output may replace the response.
+        after_tool_callback=after_tool_callbacks,
+        # Long contexts replay only recent turns verbatim (see agent_common/session_compaction.py).
+        before_model_callback=before_model_callbacks,
+        after_model_callback=after_model_callbacks,
     )
+
+
+async def warm_up(agent: LlmAgent) -> None:
+    """Open pooled MCP sessions and prefetch tool schemas before serving traffic."""
+    if not PAYSTABL_MCP_WARM:
+        return
+    for toolset in agent.tools:
+        if hasattr(toolset, "warm"):
+            try:
+                await toolset.warm()
+            except Exception as e:
+                # Not fatal: sessions are still opened lazily on first use.
+                logger.warning("PayStabl MCP warm-up failed: %s", e)
+
+
+async def shutdown(agent: LlmAgent) -> None:
+    for toolset in agent.tools:
+        if hasattr(toolset, "close"):
+            await toolset.close()
+    await receipt_cache.aclose()
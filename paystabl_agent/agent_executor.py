@@ -1,6 +1,9 @@
 import asyncio
+import inspect
 import logging
 from collections.abc import AsyncGenerator
+from contextlib import aclosing
+from typing import Any
 
 from a2a.server.agent_execution import AgentExecutor
 from a2a.server.agent_execution.context import RequestContext
@@ -11,25 +14,48 @@ from a2a.types import (
     FileWithBytes,
     FileWithUri,
     Part,
+    TaskNotCancelableError,
     TaskState,
     TextPart,
-    UnsupportedOperationError,
 )
 from a2a.utils.errors import ServerError
 from google.adk import Runner
 from google.adk.events import Event
 from google.genai import types
 
+from agent_common import deadline, tracing
+from agent_common.blob_store import blob_store
+from agent_common.metrics import gauge
+from agent_common.session_compaction import session_compactor
+
+from admission import AdmissionRejected, admission, priority_of
+
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
 
+async def _emit(result: Any) -> None:
+    """TaskUpdater methods are plain calls in a2a-sdk 0.2.5 and coroutines from 0.2.6."""
+    if inspect.isawaitable(result):
+        await result
+
+
+_TERMINAL_STATES = (
+    TaskState.completed,
+    TaskState.canceled,
+    TaskState.failed,
+    TaskState.rejected,
+)
+
+
 class PayStablAgentExecutor(AgentExecutor):
     """AgentExecutor that runs the PayStabl ADK-based agent."""
 
     def __init__(self, runner: Runner):
         self.runner = runner
-        self._running_sessions = {}
+        # task_id -> the asyncio task running execute(), so cancel() can tear it down.
+        self._running_tasks: dict[str, asyncio.Task] = {}
+        gauge("running_tasks", "A2A tasks currently executing.", lambda: len(self._running_tasks))
 
     def _run_agent(
         self, session_id: str, new_message: types.Content
@@ -48,30 +74,38 @@ class PayStablAgentExecutor(AgentExecutor):
         session_obj = await self._upsert_session(session_id)
         session_id = session_obj.id
 
-        async for event in self._run_agent(session_id, new_message):
-            if event.is_final_response():
-                parts = convert_genai_parts_to_a2a(
-                    event.content.parts if event.content and event.content.parts else []
-                )
-                logger.debug("Yielding final response: %s", parts)
-                task_updater.add_artifact(parts)
-                task_updater.complete()
-                break
-
-            if not event.get_function_calls():
-                logger.debug("Yielding update response")
-                task_updater.update_status(
-                    TaskState.working,
-                    message=task_updater.new_agent_message(
-                        convert_genai_parts_to_a2a(
-                            event.content.parts
-                            if event.content and event.content.parts
-                            else []
+        invocation_id = None
+        # aclosing: a cancelled task also closes the generator and the MCP call under it.
+        async with aclosing(self._run_agent(session_id, new_message)) as events:
+            async for event in events:
+                invocation_id = event.invocation_id
+                if event.is_final_response():
+                    parts = convert_genai_parts_to_a2a(
+                        event.content.parts if event.content and event.content.parts else []
+                    )
+                    logger.debug("Yielding final response: %s", parts)
+                    await _emit(task_updater.add_artifact(parts))
+                    await _emit(task_updater.complete())
+                    break
+
+                if not event.get_function_calls():
+                    logger.debug("Yielding update response")
+                    await _emit(task_updater.update_status(
+                        TaskState.working,
+                        message=task_updater.new_agent_message(
+                            convert_genai_parts_to_a2a(
+                                event.content.parts
+                                if event.content and event.content.parts
+                                else []
+                            ),
                         ),
-                    ),
-                )
-            else:
-                logger.debug("Skipping event (function call in progress)")
+                    ))
+                else:
+                    logger.debug("Skipping event (function call in progress)")
+        if invocation_id:
+            logger.debug(
+                "session %s compaction stats: %s", session_id, session_compactor.stats(invocation_id)
+            )
 
     async def execute(
         self,
@@ -85,20 +119,63 @@ class PayStablAgentExecutor(AgentExecutor):
 
         updater = TaskUpdater(event_queue, context.task_id, context.context_id)
         if not context.current_task:
-            updater.submit()
-        updater.start_work()
-
-        await self._process_request(
-            types.UserContent(
-                parts=convert_a2a_parts_to_genai(context.message.parts),
-            ),
-            context.context_id,
-            updater,
-        )
+            await _emit(updater.submit())
+
+        self._running_tasks[context.task_id] = asyncio.current_task()
+        remote_parent = tracing.extract(context.message.metadata)
+        priority = priority_of(context.message.metadata)
+        budget = deadline.extract(context.message.metadata)
+        try:
+            with tracing.span(
+                "execute", remote_parent, task_id=context.task_id, context_id=context.context_id,
+                priority=priority,
+            ), deadline.scope(budget):
+                # The caller's remaining budget bounds the queue wait, the model and the MCP call.
+                async with deadline.enforce(f"task {context.task_id}"):
+                    # The task stays `submitted` while it waits for a slot (see admission.py).
+                    async with admission.slot(priority) as waited:
+                        if waited:
+                            logger.debug("task %s admitted after %.3fs", context.task_id, waited)
+                        await _emit(updater.start_work())
+                        await self._process_request(
+                            types.UserContent(
+                                parts=convert_a2a_parts_to_genai(context.message.parts),
+                            ),
+                            context.context_id,
+                            updater,
+                        )
+        except deadline.DeadlineExceeded as e:
+            logger.warning("abandoning task %s: %s", context.task_id, e)
+            await _emit(updater.failed(
+                message=updater.new_agent_message(
+                    [Part(root=TextPart(text=f"PayStabl gave up: {e}"))]
+                ),
+            ))
+        except AdmissionRejected as e:
+            logger.warning("rejecting task %s (%s): %s", context.task_id, priority, e)
+            await _emit(updater.update_status(
+                TaskState.rejected,
+                message=updater.new_agent_message(
+                    [Part(root=TextPart(text=f"PayStabl is overloaded, retry later: {e}"))]
+                ),
+                final=True,
+            ))
+        finally:
+            self._running_tasks.pop(context.task_id, None)
 
     async def cancel(self, context: RequestContext, event_queue: EventQueue):
-        # Optional: you can implement cancellation by tracking session_id
-        raise ServerError(error=UnsupportedOperationError())
+        """Cancel the running execute() for this task, including any in-flight MCP call."""
+        running = self._running_tasks.pop(context.task_id, None)
+        if running is None:
+            if (
+                context.current_task
+                and context.current_task.status.state in _TERMINAL_STATES
+            ):
+                raise ServerError(error=TaskNotCancelableError())
+        elif not running.done():
+            running.cancel()
+        updater = TaskUpdater(event_queue, context.task_id, context.context_id)
+        await _emit(updater.update_status(TaskState.canceled, final=True))
 
     async def _upsert_session(self, session_id: str):
         session = await self.runner.session_service.get_session(
@@ -155,6 +232,13 @@ def convert_genai_parts_to_a2a(parts: list[types.Part]) -> list[Part]:
 def convert_genai_part_to_a2a(part: types.Part) -> Part:
     """Convert a single Google GenAI Part -> A2A Part."""
     if part.text:
+        if blob_store.is_blob_uri(part.text.strip()):
+            # A spilled body: hand on the blob handle instead of inline text.
+            return Part(
+                root=FilePart(
+                    file=FileWithUri(uri=part.text.strip(), mimeType="text/html")
+                )
+            )
         return Part(root=TextPart(text=part.text))
     if part.file_data:
         if not part.file_data.file_uri:
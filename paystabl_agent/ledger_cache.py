@@ -0,0 +1,283 @@
+# paystabl_agent/ledger_cache.py
+"""Local cache of wallet reads (``get_balance`` / ``get_payment_history``).
+
+Dashboards and chat turns ask for the balance and recent payments far more
+often than either changes. Results are cached per (tool, payer, arguments)
+for ``PAYSTABL_LEDGER_TTL`` seconds and served without an MCP round trip.
+
+* Write-through invalidation: when this agent calls ``pay_x402_api`` or
+  ``pay_address``, the payer's entries are dropped, and the ones still in use
+  are re-fetched in the background. Reads that were in flight while a
+  payment completed are not stored.
+* Background refresh: ``refresh_loop()`` (run from the server lifespan)
+  re-fetches entries read in the last ``PAYSTABL_LEDGER_KEEP_WARM`` seconds
+  before they expire. Entries nobody reads are dropped.
+* Paging: ``payment_history_page(offset, limit)`` is a tool that slices the
+  cached history, so paging through it costs one MCP call per TTL.
+
+Payments made by other agents on the same wallet show up after at most one
+TTL. Set ``PAYSTABL_LEDGER_CACHE=false`` to always ask the payment service.
+"""
+import asyncio
+import copy
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from google.adk.tools.base_tool import BaseTool
+from google.adk.tools.tool_context import ToolContext
+
+from agent_common.metrics import cache_requests_total, gauge
+
+from receipt_cache import payer_id
+
+logger = logging.getLogger(__name__)
+
+LEDGER_TOOLS = ("get_balance", "get_payment_history")
+PAYMENT_TOOLS = ("pay_x402_api", "pay_address")
+HISTORY_TOOL = "get_payment_history"
+
+PAYSTABL_LEDGER_CACHE = os.getenv("PAYSTABL_LEDGER_CACHE", "true").lower() not in ("0", "false", "no")
+PAYSTABL_LEDGER_TTL = float(os.getenv("PAYSTABL_LEDGER_TTL", "30"))
+PAYSTABL_LEDGER_KEEP_WARM = float(os.getenv("PAYSTABL_LEDGER_KEEP_WARM", "300"))
+PAYSTABL_LEDGER_PAGE_SIZE = int(os.getenv("PAYSTABL_LEDGER_PAGE_SIZE", "20"))
+# Pending reads for tool calls in flight, at most this many (calls that raise never store).
+_MAX_PENDING = 4096
+
+_HISTORY_KEYS = ("payments", "transactions", "history", "items", "data", "results")
+
+Key = Tuple[str, str, str]
+
+
+@dataclass
+class LedgerEntry:
+    tool: str
+    args: Dict[str, Any]  # kept (in memory only) so the entry can be re-fetched
+    result: dict
+    fetched_at: float
+    read_at: float
+
+
+def _key(tool: str, args: Dict[str, Any]) -> Key:
+    rest = {k: v for k, v in args.items() if k != "agent_token"}
+    return tool, payer_id(args), json.dumps(rest, sort_keys=True, default=str)
+
+
+def _as_dict(tool_response: Any) -> Optional[dict]:
+    if hasattr(tool_response, "model_dump"):
+        tool_response = tool_response.model_dump(mode="json", by_alias=True, exclude_none=True)
+    return tool_response if isinstance(tool_response, dict) else None
+
+
+def history_items(result: dict) -> Optional[List[Any]]:
+    """The list of payments in a `get_payment_history` result, if it has one."""
+    candidates: List[Any] = [result.get("structuredContent")]
+    for block in result.get("content") or []:
+        text = block.get("text") if isinstance(block, dict) else None
+        if text and text.lstrip()[:1] in ("{", "["):
+            try:
+                candidates.append(json.loads(text))
+            except ValueError:
+                pass
+    for value in candidates:
+        if isinstance(value, list):
+            return value
+        if isinstance(value, dict):
+            for k in _HISTORY_KEYS:
+                if isinstance(value.get(k), list):
+                    return value[k]
+    return None
+
+
+class LedgerCache:
+    """TTL cache of balance/history results, used as a before/after tool callback pair."""
+
+    def __init__(self, ttl: float = PAYSTABL_LEDGER_TTL, keep_warm: float = PAYSTABL_LEDGER_KEEP_WARM):
+        self.ttl = ttl
+        self.keep_warm = keep_warm
+        self._entries: Dict[Key, LedgerEntry] = {}
+        # Bumped by every payment; a read started under an older generation is not stored.
+        self._generation: Dict[str, int] = {}
+        self._pending: Dict[str, int] = {}
+        self._inflight: Dict[Key, asyncio.Future] = {}
+        self._toolset = None
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+
+    def bind(self, toolset) -> None:
+        """The toolset used for reads outside an LLM turn (refresh, paging); needs `call_tool`."""
+        self._toolset = toolset
+
+    def _fresh(self, entry: LedgerEntry) -> bool:
+        return time.time() - entry.fetched_at < self.ttl
+
+    def get(self, tool: str, args: Dict[str, Any]) -> Optional[dict]:
+        entry = self._entries.get(_key(tool, args))
+        if entry is None or not self._fresh(entry):
+            self.misses += 1
+            cache_requests_total.inc(cache="ledger", result="miss")
+            return None
+        entry.read_at = time.time()
+        self.hits += 1
+        cache_requests_total.inc(cache="ledger", result="hit")
+        # A copy: later after_tool callbacks (spill) edit the response in place.
+        return copy.deepcopy(entry.result)
+
+    def put(self, tool: str, args: Dict[str, Any], result: dict, generation: Optional[int] = None) -> None:
+        payer = payer_id(args)
+        if generation is not None and generation != self._generation.get(payer, 0):
+            return  # a payment completed while this read was in flight
+        now = time.time()
+        key = _key(tool, args)
+        previous = self._entries.get(key)
+        self._entries[key] = LedgerEntry(
+            tool=tool, args=dict(args), result=copy.deepcopy(result),
+            fetched_at=now, read_at=previous.read_at if previous else now,
+        )
+
+    def invalidate_payer(self, payer: str) -> List[LedgerEntry]:
+        """Drop the payer's entries; returns the dropped ones that were still being read."""
+        self._generation[payer] = self._generation.get(payer, 0) + 1
+        now = time.time()
+        dropped = [e for k, e in self._entries.items() if k[1] == payer]
+        for entry in dropped:
+            del self._entries[_key(entry.tool, entry.args)]
+        return [e for e in dropped if now - e.read_at < self.keep_warm]
+
+    # ---- reads outside an LLM turn -------------------------------------------
+
+    async def fetch(self, tool: str, args: Dict[str, Any]) -> dict:
+        """Call the tool through the bound toolset and cache the result; one call per key at a time."""
+        if self._toolset is None:
+            raise RuntimeError("ledger cache has no toolset bound")
+        key = _key(tool, args)
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        generation = self._generation.get(key[1], 0)
+        try:
+            result = await self._toolset.call_tool(tool, args)
+            if not result.get("isError"):
+                self.put(tool, args, result, generation)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # retrieved: waiters (if any) re-raise it
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    async def read(self, tool: str, args: Dict[str, Any]) -> dict:
+        cached = self.get(tool, args)
+        return cached if cached is not None else await self.fetch(tool, args)
+
+    async def history_page(self, offset: int = 0, limit: int = PAYSTABL_LEDGER_PAGE_SIZE,
+                           args: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        result = await self.read(HISTORY_TOOL, args or {})
+        items = history_items(result)
+        if items is None:
+            return {"error": "payment history is not a JSON list", "result": result}
+        offset, limit = max(0, offset), max(1, limit)
+        page = items[offset: offset + limit]
+        next_offset = offset + len(page)
+        return {
+            "items": page,
+            "offset": offset,
+            "limit": limit,
+            "total": len(items),
+            "next_offset": next_offset if next_offset < len(items) else None,
+        }
+
+    async def _refresh(self, entries: List[LedgerEntry]) -> None:
+        for entry in entries:
+            try:
+                await self.fetch(entry.tool, entry.args)
+                self.refreshes += 1
+                cache_requests_total.inc(cache="ledger", result="refresh")
+            except Exception as e:
+                logger.info("ledger refresh of %s failed: %s", entry.tool, e)
+
+    async def refresh_due(self) -> None:
+        """Re-fetch entries past half their TTL that are still read; drop the rest."""
+        now = time.time()
+        due = []
+        for key, entry in list(self._entries.items()):
+            if now - entry.read_at >= self.keep_warm:
+                del self._entries[key]
+            elif now - entry.fetched_at >= self.ttl / 2:
+                due.append(entry)
+        await self._refresh(due)
+
+    async def refresh_loop(self) -> None:
+        if self.ttl <= 0:
+            return
+        while True:
+            await asyncio.sleep(max(1.0, self.ttl / 4))
+            if self._toolset is None:
+                continue
+            try:
+                await self.refresh_due()
+            except Exception as e:
+                logger.warning("ledger refresh failed: %s", e)
+
+    # ---- ADK tool callbacks ------------------------------------------------
+
+    def serve(self, tool: BaseTool, args: Dict[str, Any], tool_context: ToolContext) -> Optional[dict]:
+        """before_tool_callback: answer balance/history reads from the cache."""
+        if tool.name not in LEDGER_TOOLS:
+            return None
+        cached = self.get(tool.name, args)
+        if cached is not None:
+            return cached
+        if len(self._pending) > _MAX_PENDING:
+            self._pending.clear()
+        self._pending[tool_context.function_call_id or ""] = self._generation.get(payer_id(args), 0)
+        return None
+
+    def record(self, tool: BaseTool, args: Dict[str, Any], tool_context: ToolContext, tool_response: Any) -> None:
+        """after_tool_callback: store fresh reads; invalidate the payer's entries after a payment."""
+        if tool.name in PAYMENT_TOOLS:
+            # Even a failed payment may have moved funds; re-read rather than guess.
+            warm = self.invalidate_payer(payer_id(args))
+            if warm and self._toolset is not None:
+                asyncio.get_running_loop().create_task(self._refresh(warm))
+            return None
+        generation = self._pending.pop(tool_context.function_call_id or "", None)
+        if tool.name not in LEDGER_TOOLS or generation is None:
+            return None  # not a tool we cache, or served from the cache
+        response = _as_dict(tool_response)
+        if response is not None and not response.get("isError"):
+            self.put(tool.name, args, response, generation)
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses, "refreshes": self.refreshes}
+
+
+ledger_cache = LedgerCache()
+gauge("ledger_cache_entries", "Balance/history results held by the PayStabl ledger cache.",
+      lambda: ledger_cache.stats()["entries"])
+
+
+async def payment_history_page(offset: int = 0, limit: int = PAYSTABL_LEDGER_PAGE_SIZE, agent_token: str = "") -> dict:
+    """Returns one page of the wallet's payment history.
+
+    Args:
+      offset: Index of the first payment to return (0 = most recent page).
+      limit: Maximum number of payments to return.
+      agent_token: Optional wallet token; defaults to the agent's own.
+
+    Returns:
+      {"items": [...], "offset", "limit", "total", "next_offset"}; next_offset is null on the last page.
+    """
+    return await ledger_cache.history_page(offset, limit, {"agent_token": agent_token} if agent_token else {})
@@ -0,0 +1,240 @@
+# paystabl_agent/mcp_pool.py
+"""Pre-warmed MCP session pool with a cached `tools/list` result.
+
+ADK's ``MCPToolset`` opens one session lazily on the first request and calls
+``tools/list`` on every LLM turn. ``PooledMCPToolset`` instead opens
+``pool_size`` sessions up front (``warm()``, called from the server lifespan),
+lists tools once, and hands out sessions round-robin so concurrent
+``pay_x402_api`` calls do not queue behind a single session.
+
+The MCP clients hold anyio cancel scopes, which must be exited by the task
+that entered them. Each slot therefore has an owner task, started by
+``warm()``, that alone opens, reconnects and closes the slot's session.
+Request tasks and background refreshes only ask it for a session. When ADK
+reacts to a ``ClosedResourceError`` by closing its session manager, only
+the slot that failed is reconnected.
+"""
+import asyncio
+import itertools
+import logging
+import os
+import sys
+import time
+from contextvars import ContextVar
+from typing import Any, List, Optional, TextIO, Tuple
+
+import anyio
+from google.adk.agents.readonly_context import ReadonlyContext
+from google.adk.tools.base_tool import BaseTool
+from google.adk.tools.base_toolset import BaseToolset
+from google.adk.tools.mcp_tool.mcp_session_manager import MCPSessionManager
+from google.adk.tools.mcp_tool.mcp_tool import MCPTool
+from mcp import ClientSession
+
+logger = logging.getLogger(__name__)
+
+PAYSTABL_MCP_POOL_SIZE = int(os.getenv("PAYSTABL_MCP_POOL_SIZE", "4"))
+# Seconds before the cached tool list is refreshed; 0 keeps it until invalidate_tools().
+PAYSTABL_MCP_TOOLS_TTL = float(os.getenv("PAYSTABL_MCP_TOOLS_TTL", "0"))
+
+
+class _SessionSlot:
+    """One pooled session; only its owner task opens or closes it."""
+
+    def __init__(self, connection_params: Any, errlog: TextIO):
+        self._manager = MCPSessionManager(connection_params=connection_params, errlog=errlog)
+        self._session: Optional[ClientSession] = None
+        self._requests: Optional[asyncio.Queue] = None
+        self._owner: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._owner is None or self._owner.done():
+            self._requests = asyncio.Queue()
+            self._owner = asyncio.get_running_loop().create_task(self._own())
+
+    async def _own(self) -> None:
+        while True:
+            action, arg, reply = await self._requests.get()
+            try:
+                if action == "close" or (action == "reset" and arg is self._session):
+                    self._session = None
+                    await self._manager.close()
+                if action != "close":
+                    # Returns the open session or connects one (newer ADKs also replace a dropped one here).
+                    self._session = await self._manager.create_session()
+            except Exception as e:
+                if not reply.done():
+                    reply.set_exception(e)
+            else:
+                if not reply.done():
+                    reply.set_result(self._session)
+            if action == "close":
+                return
+
+    async def _ask(self, action: str, arg: Any = None) -> Optional[ClientSession]:
+        self.start()
+        reply = asyncio.get_running_loop().create_future()
+        self._requests.put_nowait((action, arg, reply))
+        return await reply
+
+    async def session(self) -> ClientSession:
+        """The slot's live session, connecting it first if needed."""
+        return await self._ask("open")
+
+    async def reset(self, stale: ClientSession) -> ClientSession:
+        """Reconnect the slot if it still holds `stale` (others may have reset it already)."""
+        return await self._ask("reset", stale)
+
+    async def close(self) -> None:
+        if self._owner is None or self._owner.done():
+            return
+        await self._ask("close")
+        await self._owner
+
+
+# The slot and session most recently handed out in this task, for _SlotSessionManager.close().
+_handed_out: ContextVar[Optional[Tuple[_SessionSlot, ClientSession]]] = ContextVar("mcp_handed_out", default=None)
+
+
+class _SlotSessionManager:
+    """The session manager an MCPTool sees.
+
+    ``create_session()`` hands out pooled sessions round-robin. ``close()``
+    (what ADK calls after a ``ClosedResourceError``) reconnects only the slot
+    whose session this task was using, instead of tearing down the pool.
+    """
+
+    def __init__(self, pool: "MCPSessionPool"):
+        self._pool = pool
+
+    async def create_session(self, headers: Optional[dict] = None) -> ClientSession:
+        # Pooled sessions are shared, so per-call headers (newer ADKs pass them) cannot apply.
+        slot = self._pool.next_slot()
+        session = await slot.session()
+        _handed_out.set((slot, session))
+        return session
+
+    async def close(self) -> None:
+        handed_out = _handed_out.get()
+        if handed_out is not None:
+            slot, session = handed_out
+            await slot.reset(session)
+
+
+class MCPSessionPool:
+    """A fixed set of session slots, handed out round-robin."""
+
+    def __init__(self, connection_params: Any, size: int, errlog: TextIO = sys.stderr):
+        self._slots = [_SessionSlot(connection_params, errlog) for _ in range(max(1, size))]
+        self._next = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def next_slot(self) -> _SessionSlot:
+        return self._slots[next(self._next) % len(self._slots)]
+
+    def session_manager(self) -> _SlotSessionManager:
+        """A manager for one MCPTool (see `_SlotSessionManager`)."""
+        return _SlotSessionManager(self)
+
+    async def create_session(self) -> ClientSession:
+        """Return a live session from the next pool slot (connecting it if needed)."""
+        return await self.next_slot().session()
+
+    async def warm(self) -> int:
+        """Start every slot's owner task and open its session; returns how many succeeded.
+
+        Called from the server lifespan; the owner tasks then run until `close()`.
+        """
+        for slot in self._slots:
+            slot.start()
+        ready = 0
+        for result in await asyncio.gather(*(slot.session() for slot in self._slots), return_exceptions=True):
+            if isinstance(result, Exception):
+                logger.warning("MCP session warm-up failed: %s", result)
+            else:
+                ready += 1
+        return ready
+
+    async def close(self) -> None:
+        for slot in self._slots:
+            try:
+                await slot.close()
+            except Exception as e:
+                logger.debug("Error closing MCP session: %s", e)
+
+
+class PooledMCPToolset(BaseToolset):
+    """MCP toolset backed by an `MCPSessionPool` and a cached tool list."""
+
+    def __init__(
+        self,
+        *,
+        connection_params: Any,
+        pool_size: int = PAYSTABL_MCP_POOL_SIZE,
+        tools_ttl: float = PAYSTABL_MCP_TOOLS_TTL,
+        errlog: TextIO = sys.stderr,
+    ):
+        super().__init__()
+        self._pool = MCPSessionPool(connection_params, pool_size, errlog)
+        self._tools_ttl = tools_ttl
+        self._tools: Optional[List[MCPTool]] = None
+        self._tools_at = 0.0
+        self._tools_lock: Optional[asyncio.Lock] = None
+
+    def invalidate_tools(self) -> None:
+        """Drop the cached `tools/list` result; the next `get_tools()` refetches it."""
+        self._tools = None
+
+    def _tools_fresh(self) -> bool:
+        if self._tools is None:
+            return False
+        return self._tools_ttl <= 0 or time.monotonic() - self._tools_at < self._tools_ttl
+
+    async def _load_tools(self) -> List[MCPTool]:
+        if self._tools_fresh():
+            return self._tools
+        if self._tools_lock is None:
+            self._tools_lock = asyncio.Lock()
+        async with self._tools_lock:
+            if not self._tools_fresh():
+                session = await self._pool.create_session()
+                result = await session.list_tools()
+                self._tools = [
+                    MCPTool(mcp_tool=tool, mcp_session_manager=self._pool.session_manager())
+                    for tool in result.tools
+                ]
+                self._tools_at = time.monotonic()
+                logger.info("Cached %d PayStabl MCP tools", len(self._tools))
+            return self._tools
+
+    async def warm(self) -> None:
+        """Open all pooled sessions and prefetch the tool list."""
+        ready = await self._pool.warm()
+        if not ready:
+            raise ConnectionError("no MCP session could be established")
+        logger.info("Warmed %d/%d PayStabl MCP sessions", ready, len(self._pool))
+        await self._load_tools()
+
+    async def get_tools(
+        self, readonly_context: Optional[ReadonlyContext] = None
+    ) -> List[BaseTool]:
+        return [
+            tool for tool in await self._load_tools()
+            if self._is_tool_selected(tool, readonly_context)
+        ]
+
+    async def call_tool(self, name: str, arguments: dict) -> dict:
+        """Call an MCP tool directly (outside an LLM turn); returns the dumped result."""
+        slot = self._pool.next_slot()
+        session = await slot.session()
+        try:
+            result = await session.call_tool(name, arguments=arguments)
+        except anyio.ClosedResourceError:
+            session = await slot.reset(session)
+            result = await session.call_tool(name, arguments=arguments)
+        return result.model_dump(mode="json", exclude_none=True)
+
+    async def close(self) -> None:
+        await self._pool.close()
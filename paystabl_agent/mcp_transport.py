@@ -0,0 +1,169 @@
+# paystabl_agent/mcp_transport.py
+"""Connection options for the PayStabl MCP toolset.
+
+``http``  - in-process streamable-HTTP MCP client. One pooled, keep-alive
+            httpx connection per session, concurrent in-flight requests.
+``stdio`` - the legacy ``node stdio_bridge.js`` subprocess.
+``auto``  - ``http`` first, falling back to the bridge if the HTTP session
+            cannot be established (default).
+
+Either transport is served through a ``PooledMCPToolset`` (see mcp_pool.py).
+"""
+import asyncio
+import logging
+import os
+from typing import Awaitable, Callable, List, Optional
+
+import httpx
+
+from google.adk.agents.readonly_context import ReadonlyContext
+from google.adk.tools.base_tool import BaseTool
+from google.adk.tools.base_toolset import BaseToolset
+from google.adk.tools.mcp_tool.mcp_session_manager import StreamableHTTPServerParams
+from google.adk.tools.mcp_tool.mcp_toolset import StdioServerParameters
+
+from mcp_pool import PooledMCPToolset
+
+logger = logging.getLogger(__name__)
+
+PAYSTABL_MCP_URL = os.getenv("PAYSTABL_MCP_URL", "http://localhost:3000/mcp")
+PAYSTABL_AGENT_TOKEN = os.getenv("PAYSTABL_AGENT_TOKEN", "")
+PAYSTABL_MCP_TRANSPORT = os.getenv("PAYSTABL_MCP_TRANSPORT", "auto").lower()
+PAYSTABL_MCP_TIMEOUT = float(os.getenv("PAYSTABL_MCP_TIMEOUT", "30"))
+
+
+def stdio_bridge_params() -> StdioServerParameters:
+    """Parameters for the Node stdio bridge (one axios POST per JSON-RPC line)."""
+    return StdioServerParameters(
+        command="node",
+        args=["stdio_bridge.js"],
+        env={
+            "MCP_HTTP_URL": PAYSTABL_MCP_URL,
+            "MCP_HTTP_TIMEOUT_MS": str(int(PAYSTABL_MCP_TIMEOUT * 1000)),
+            **({"MCP_BEARER": f"Bearer {PAYSTABL_AGENT_TOKEN}"} if PAYSTABL_AGENT_TOKEN else {})
+        },
+    )
+
+
+def http_params() -> StreamableHTTPServerParams:
+    """Parameters for the in-process streamable-HTTP MCP client."""
+    return StreamableHTTPServerParams(
+        url=PAYSTABL_MCP_URL,
+        headers={"Authorization": f"Bearer {PAYSTABL_AGENT_TOKEN}"} if PAYSTABL_AGENT_TOKEN else None,
+        timeout=PAYSTABL_MCP_TIMEOUT,
+    )
+
+
+async def probe_streamable_http(url: str = PAYSTABL_MCP_URL, timeout: float = 5.0) -> bool:
+    """True if `url` answers an MCP `initialize` the way the streamable-HTTP client expects."""
+    headers = {"Accept": "application/json, text/event-stream"}
+    if PAYSTABL_AGENT_TOKEN:
+        headers["Authorization"] = f"Bearer {PAYSTABL_AGENT_TOKEN}"
+    body = {
+        "jsonrpc": "2.0",
+        "id": "probe",
+        "method": "initialize",
+        "params": {
+            "protocolVersion": "2025-03-26",
+            "capabilities": {},
+            "clientInfo": {"name": "paystabl-agent-probe", "version": "0"},
+        },
+    }
+    try:
+        async with httpx.AsyncClient(timeout=timeout) as client:
+            r = await client.post(url, json=body, headers=headers)
+    except httpx.HTTPError as e:
+        logger.info("MCP HTTP probe of %s failed: %s", url, e)
+        return False
+    content_type = r.headers.get("content-type", "")
+    return r.is_success and (
+        content_type.startswith("application/json") or content_type.startswith("text/event-stream")
+    )
+
+
+def _spurious_cancel() -> bool:
+    """The MCP HTTP client reports connection failures as CancelledError; tell those
+    apart from a real cancellation of the calling task (Python 3.11+)."""
+    task = asyncio.current_task()
+    cancelling = getattr(task, "cancelling", None)
+    return cancelling is not None and cancelling() == 0
+
+
+class FallbackMCPToolset(BaseToolset):
+    """Uses the primary toolset until it fails to connect, then the fallback for good."""
+
+    def __init__(
+        self,
+        primary: BaseToolset,
+        fallback: BaseToolset,
+        probe: Optional[Callable[[], Awaitable[bool]]] = None,
+    ):
+        super().__init__()
+        self._primary = primary
+        self._fallback = fallback
+        self._probe = probe
+        self._active: BaseToolset = primary
+
+    async def _switch_to_fallback(self, reason: object) -> None:
+        logger.warning(
+            "PayStabl MCP over HTTP unavailable (%s); falling back to the stdio bridge", reason
+        )
+        self._active = self._fallback
+        await self._close_quietly(self._primary)
+
+    async def _guarded(self, action: Callable[[BaseToolset], Awaitable]):
+        """Run `action` on the primary (falling back on failure), else on the fallback."""
+        if self._active is self._primary and self._probe is not None:
+            probe, self._probe = self._probe, None
+            if not await probe():
+                await self._switch_to_fallback("probe failed")
+        if self._active is self._primary:
+            try:
+                return await action(self._primary)
+            except asyncio.CancelledError as e:
+                if not _spurious_cancel():
+                    raise
+                await self._switch_to_fallback(e)
+            except Exception as e:
+                await self._switch_to_fallback(e)
+        return await action(self._fallback)
+
+    async def warm(self) -> None:
+        await self._guarded(lambda toolset: toolset.warm())
+
+    def invalidate_tools(self) -> None:
+        self._active.invalidate_tools()
+
+    async def get_tools(
+        self, readonly_context: Optional[ReadonlyContext] = None
+    ) -> List[BaseTool]:
+        return await self._guarded(lambda toolset: toolset.get_tools(readonly_context))
+
+    async def call_tool(self, name: str, arguments: dict) -> dict:
+        return await self._guarded(lambda toolset: toolset.call_tool(name, arguments))
+
+    @staticmethod
+    async def _close_quietly(toolset: BaseToolset) -> None:
+        try:
+            await toolset.close()
+        except Exception as e:
+            logger.debug("Error closing MCP toolset: %s", e)
+
+    async def close(self) -> None:
+        await self._close_quietly(self._primary)
+        await self._close_quietly(self._fallback)
+
+
+def create_paystabl_toolset(transport: str = PAYSTABL_MCP_TRANSPORT) -> BaseToolset:
+    """Build the PayStabl MCP toolset for the configured transport."""
+    if transport == "stdio":
+        return PooledMCPToolset(connection_params=stdio_bridge_params())
+    if transport == "http":
+        return PooledMCPToolset(connection_params=http_params())
+    if transport != "auto":
+        raise ValueError(f"Unknown PAYSTABL_MCP_TRANSPORT: {transport!r}")
+    return FallbackMCPToolset(
+        primary=PooledMCPToolset(connection_params=http_params()),
+        fallback=PooledMCPToolset(connection_params=stdio_bridge_params()),
+        probe=probe_streamable_http,
+    )
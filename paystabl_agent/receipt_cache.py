@@ -0,0 +1,203 @@
+# paystabl_agent/receipt_cache.py
+"""Reuse of x402 payment proofs while the provider still honours them.
+
+``pay_x402_api`` settles a new payment on every call. When its result carries
+the proof it sent (the ``X-PAYMENT`` header value) and a validity window,
+the proof is cached per (resource URL, payer). A later ``pay_x402_api`` for
+the same pair first replays the proof with a plain GET. If the provider
+answers 2xx, that body is the tool result and no payment is made. If it
+answers 402, the receipt is dropped and the tool pays as usual.
+
+Proof and expiry are read from the tool result's ``structuredContent`` /
+``_meta`` (or a JSON text block):
+
+* proof: ``payment`` / ``xPayment`` / ``paymentHeader`` (the ``X-PAYMENT`` value);
+* expiry: ``expiresAt`` / ``validUntil`` (unix seconds), else
+  ``paymentRequirements.maxTimeoutSeconds`` (or ``accepts[0]``) from the 402
+  response, counted from the time of payment.
+
+Results without a proof are never cached, so servers that do not report one
+behave exactly as before.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+import httpx
+from google.adk.tools.base_tool import BaseTool
+from google.adk.tools.tool_context import ToolContext
+
+from agent_common import deadline
+from agent_common.metrics import cache_requests_total
+
+from mcp_transport import PAYSTABL_AGENT_TOKEN
+
+logger = logging.getLogger(__name__)
+
+PAY_TOOL = "pay_x402_api"
+PAYSTABL_RECEIPT_REUSE = os.getenv("PAYSTABL_RECEIPT_REUSE", "true").lower() not in ("0", "false", "no")
+PAYSTABL_RECEIPT_MAX = int(os.getenv("PAYSTABL_RECEIPT_MAX", "4096"))
+# Safety margin: a receipt is not replayed in the last few seconds of its window.
+PAYSTABL_RECEIPT_MARGIN = float(os.getenv("PAYSTABL_RECEIPT_MARGIN", "5"))
+PAYSTABL_REPLAY_TIMEOUT = float(os.getenv("PAYSTABL_REPLAY_TIMEOUT", "30"))
+
+_PROOF_KEYS = ("payment", "xPayment", "x_payment", "paymentHeader", "payment_header")
+_EXPIRY_KEYS = ("expiresAt", "expires_at", "validUntil", "valid_until")
+
+
+@dataclass
+class Receipt:
+    url: str
+    payment: str
+    expires_at: float
+
+
+def _normalize_url(url: str) -> str:
+    parts = urlsplit(url.strip())
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or "/", parts.query, ""))
+
+
+def payer_id(args: Dict[str, Any]) -> str:
+    """Stable, non-secret id of the paying wallet token."""
+    token = args.get("agent_token") or PAYSTABL_AGENT_TOKEN or ""
+    return hashlib.sha256(token.encode()).hexdigest()[:16]  # never keep the token itself
+
+
+def _as_dict(tool_response: Any) -> Optional[dict]:
+    if hasattr(tool_response, "model_dump"):
+        tool_response = tool_response.model_dump(mode="json", by_alias=True, exclude_none=True)
+    return tool_response if isinstance(tool_response, dict) else None
+
+
+def _receipt_info(response: dict) -> Optional[dict]:
+    """The dict in a tool result that names the payment proof, if any."""
+    candidates = [response.get("structuredContent"), response.get("_meta"), response.get("meta")]
+    for block in response.get("content") or []:
+        text = block.get("text") if isinstance(block, dict) else None
+        if text and text.lstrip().startswith("{") and len(text) < 64 * 1024:
+            try:
+                candidates.append(json.loads(text))
+            except ValueError:
+                pass
+    for info in candidates:
+        if isinstance(info, dict) and any(info.get(k) for k in _PROOF_KEYS):
+            return info
+    return None
+
+
+def _expiry(info: dict, paid_at: float) -> Optional[float]:
+    for key in _EXPIRY_KEYS:
+        if info.get(key):
+            return float(info[key])
+    requirements = info.get("paymentRequirements") or info.get("requirements")
+    if isinstance(requirements, dict) and isinstance(requirements.get("accepts"), list) and requirements["accepts"]:
+        requirements = requirements["accepts"][0]
+    if isinstance(requirements, list) and requirements:
+        requirements = requirements[0]
+    if isinstance(requirements, dict) and requirements.get("maxTimeoutSeconds"):
+        return paid_at + float(requirements["maxTimeoutSeconds"])
+    return None
+
+
+class ReceiptCache:
+    """Payment proofs by (normalized URL, payer), with per-receipt expiry."""
+
+    def __init__(self, max_entries: int = PAYSTABL_RECEIPT_MAX, margin: float = PAYSTABL_RECEIPT_MARGIN):
+        self.max_entries = max_entries
+        self.margin = margin
+        self._receipts: "OrderedDict[tuple, Receipt]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._client: Optional[httpx.AsyncClient] = None
+        self.replays = 0
+        self.rejected = 0
+
+    def get(self, url: str, payer: str) -> Optional[Receipt]:
+        key = (_normalize_url(url), payer)
+        with self._lock:
+            receipt = self._receipts.get(key)
+            if receipt is not None and receipt.expires_at - self.margin <= time.time():
+                del self._receipts[key]
+                receipt = None
+            cache_requests_total.inc(cache="receipt", result="miss" if receipt is None else "hit")
+            return receipt
+
+    def put(self, url: str, payer: str, payment: str, expires_at: float) -> None:
+        if expires_at - self.margin <= time.time():
+            return
+        key = (_normalize_url(url), payer)
+        with self._lock:
+            self._receipts[key] = Receipt(url=url, payment=payment, expires_at=expires_at)
+            self._receipts.move_to_end(key)
+            while len(self._receipts) > self.max_entries:
+                self._receipts.popitem(last=False)
+
+    def invalidate(self, url: str, payer: str) -> None:
+        with self._lock:
+            self._receipts.pop((_normalize_url(url), payer), None)
+
+    def _http(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=PAYSTABL_REPLAY_TIMEOUT, follow_redirects=True)
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+
+    # ---- ADK tool callbacks ------------------------------------------------
+
+    async def replay(self, tool: BaseTool, args: Dict[str, Any], tool_context: ToolContext) -> Optional[dict]:
+        """before_tool_callback: answer `pay_x402_api` with a still-valid proof instead of paying."""
+        if tool.name != PAY_TOOL or not args.get("url"):
+            return None
+        url, payer = args["url"], payer_id(args)
+        receipt = self.get(url, payer)
+        if receipt is None:
+            return None
+        try:
+            r = await self._http().get(
+                url, headers={"X-PAYMENT": receipt.payment},
+                timeout=deadline.timeout(PAYSTABL_REPLAY_TIMEOUT, "receipt replay"),
+            )
+        except httpx.HTTPError as e:
+            logger.info("receipt replay for %s failed (%s); paying instead", url, e)
+            return None
+        if not r.is_success:
+            # 402: the provider no longer honours the proof.
+            self.rejected += 1
+            self.invalidate(url, payer)
+            logger.info("receipt for %s rejected with %s; paying again", url, r.status_code)
+            return None
+        self.replays += 1
+        logger.debug("replayed receipt for %s (valid %.0fs more)", url, receipt.expires_at - time.time())
+        return {"content": [{"type": "text", "text": r.text}], "isError": False}
+
+    def capture(self, tool: BaseTool, args: Dict[str, Any], tool_context: ToolContext, tool_response: Any) -> None:
+        """after_tool_callback: remember the proof a successful `pay_x402_api` used."""
+        if tool.name != PAY_TOOL or not args.get("url"):
+            return None
+        response = _as_dict(tool_response)
+        if response is None or response.get("isError"):
+            return None
+        info = _receipt_info(response)
+        if info is None:
+            return None
+        payment = next(info[k] for k in _PROOF_KEYS if info.get(k))
+        expires_at = _expiry(info, time.time())
+        if isinstance(payment, str) and expires_at is not None:
+            self.put(args["url"], payer_id(args), payment, expires_at)
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"receipts": len(self._receipts), "replays": self.replays, "rejected": self.rejected}
+
+
+receipt_cache = ReceiptCache()
@@ -0,0 +1,94 @@
+# paystabl_agent/server.py
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+
+from a2a.server.apps import A2AStarletteApplication
+from a2a.server.request_handlers import DefaultRequestHandler
+from a2a.types import AgentCapabilities, AgentCard, AgentSkill
+from agent import create_agent, shutdown, warm_up
+from agent_executor import PayStablAgentExecutor
+from dotenv import load_dotenv
+from google.adk.memory.in_memory_memory_service import InMemoryMemoryService
+from google.adk.runners import Runner
+from ledger_cache import ledger_cache
+from agent_common.blob_store import blob_store
+from agent_common.metrics import add_metrics_route
+from agent_common.sqlite_store import create_stores
+
+load_dotenv()
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def create_app():
+    """Builds the PayStabl A2A Starlette app (uvicorn app factory; one instance per worker)."""
+    host = os.getenv("PAYSTABL_HOST", "localhost")
+    port = int(os.getenv("PAYSTABL_PORT", "10002"))
+    # A bind address like 0.0.0.0 is not reachable; PAYSTABL_PUBLIC_URL is what callers use.
+    public_url = os.getenv("PAYSTABL_PUBLIC_URL") or f"http://{'localhost' if host in ('0.0.0.0', '::', '') else host}:{port}/"
+    capabilities = AgentCapabilities(streaming=True)
+
+    # Core capability: pay x402 endpoints
+    skill = AgentSkill(
+        id="pay_402",
+        name="Pay x402 Endpoint",
+        description=(
+            "Pays a 402-paywalled URL using stablecoins and returns the provider's result. "
+            "Inputs: { url, agent_token }."
+        ),
+        tags=["payments", "stablecoin", "x402", "agents"],
+        examples=["Pay for this URL and return the JSON: url: https://proxy402.com/rZ0Or4VKA9?vin=JHMGE8H58DC009182"],
+    )
+
+    agent_card = AgentCard(
+        name="PayStabl Agent",
+        description="An agent that executes payments for AI agents (x402 URLs, direct transfers, balances).",
+        url=public_url,
+        version="1.0.0",
+        defaultInputModes=["text/plain", "application/json"],
+        defaultOutputModes=["text/plain", "application/json"],
+        capabilities=capabilities,
+        skills=[skill],
+    )
+
+    # AGENT_STORE=sqlite keeps tasks/sessions/artifacts in paystabl_agent.db (see agent_common/sqlite_store.py).
+    stores = create_stores(default_db="paystabl_agent.db")
+    adk_agent = create_agent()
+    runner = Runner(
+        app_name=agent_card.name,
+        agent=adk_agent,
+        artifact_service=stores.artifact_service,
+        session_service=stores.session_service,
+        memory_service=InMemoryMemoryService(),
+    )
+
+    agent_executor = PayStablAgentExecutor(runner)
+
+    request_handler = DefaultRequestHandler(
+        agent_executor=agent_executor,
+        task_store=stores.task_store,
+    )
+
+    server = A2AStarletteApplication(
+        agent_card=agent_card,
+        http_handler=request_handler,
+    )
+
+    @asynccontextmanager
+    async def lifespan(app):
+        # Warm MCP sessions in the serving event loop, before the first payment.
+        await warm_up(adk_agent)
+        compaction = asyncio.create_task(stores.compaction_loop())
+        ledger_refresh = asyncio.create_task(ledger_cache.refresh_loop())
+        blob_gc = asyncio.create_task(blob_store.gc_loop())
+        yield
+        compaction.cancel()
+        ledger_refresh.cancel()
+        blob_gc.cancel()
+        await shutdown(adk_agent)
+        stores.close()
+
+    return add_metrics_route(server.build(lifespan=lifespan))
@@ -4,6 +4,7 @@ import axios from "axios";
 
 const MCP_HTTP_URL = process.env.MCP_HTTP_URL || "http://localhost:3000/mcp";
 const MCP_BEARER   = process.env.MCP_BEARER || "";
+const MCP_HTTP_TIMEOUT_MS = Number(process.env.MCP_HTTP_TIMEOUT_MS || 30000);
 
 const rl = readline.createInterface({ input: process.stdin, crlfDelay: Infinity });
 const write = (o) => process.stdout.write(JSON.stringify(o) + "\n");
@@ -17,7 +18,7 @@ rl.on("line", async (line) => {
         "Content-Type": "application/json",
         ...(MCP_BEARER ? { Authorization: `Bearer ${MCP_BEARER}` } : {})
       },
-      timeout: 30000
+      timeout: MCP_HTTP_TIMEOUT_MS
     });
     write(res.data);
   } catch (err) {
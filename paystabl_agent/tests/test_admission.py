@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+
+from admission import AdmissionController, AdmissionRejected, priority_of
+
+
+def test_priority_of():
+    assert priority_of({"priority": "batch"}) == "batch"
+    assert priority_of({"priority": "urgent"}) == "interactive"
+    assert priority_of(None) == "interactive"
+
+
+def test_interactive_waiters_go_before_batch():
+    async def run():
+        admission = AdmissionController(max_in_flight=1, max_queue=10, queue_timeout=5)
+        order = []
+
+        async def task(name, priority):
+            async with admission.slot(priority):
+                order.append(name)
+                await asyncio.sleep(0.01)
+
+        async with admission.slot():
+            waiters = [asyncio.create_task(task("batch", "batch")), asyncio.create_task(task("first", "interactive"))]
+            await asyncio.sleep(0.01)
+            waiters.append(asyncio.create_task(task("second", "interactive")))
+            await asyncio.sleep(0.01)
+        await asyncio.gather(*waiters)
+        return order, admission.stats()
+
+    order, stats = asyncio.run(run())
+    assert order == ["first", "second", "batch"]
+    assert stats == {"in_flight": 0, "queued": 0, "admitted": 4, "rejected": 0}
+
+
+def test_rejects_when_the_queue_is_full():
+    async def run():
+        admission = AdmissionController(max_in_flight=1, max_queue=1, queue_timeout=5)
+        async with admission.slot():
+            queued = asyncio.create_task(admission._acquire("interactive"))
+            await asyncio.sleep(0)
+            with pytest.raises(AdmissionRejected, match="queue full"):
+                await admission._acquire("interactive")
+            queued.cancel()
+        await asyncio.gather(queued, return_exceptions=True)
+        return admission.stats()
+
+    assert asyncio.run(run())["in_flight"] == 0
+
+
+def test_rejects_after_the_queue_timeout():
+    async def run():
+        admission = AdmissionController(max_in_flight=1, queue_timeout=0.01)
+        async with admission.slot():
+            with pytest.raises(AdmissionRejected, match="no slot"):
+                async with admission.slot():
+                    pass
+        return admission.stats()
+
+    assert asyncio.run(run()) == {"in_flight": 0, "queued": 0, "admitted": 1, "rejected": 1}
+
+
+def test_cancelled_waiter_does_not_keep_a_slot_it_was_just_handed():
+    async def run():
+        admission = AdmissionController(max_in_flight=1, queue_timeout=5)
+
+        async def task():
+            async with admission.slot():
+                await asyncio.sleep(5)
+
+        async with admission.slot():
+            waiter = asyncio.create_task(task())
+            await asyncio.sleep(0)
+        # The release handed the slot to `waiter`; cancel it before it resumes. Python 3.11's
+        # wait_for may still return the slot then, so cancel again inside the block.
+        while not waiter.done():
+            waiter.cancel()
+            await asyncio.sleep(0)
+        return admission.stats()
+
+    stats = asyncio.run(run())
+    assert stats["in_flight"] == 0 and stats["queued"] == 0
@@ -0,0 +1,106 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from ledger_cache import LedgerCache
+
+BALANCE = SimpleNamespace(name="get_balance")
+HISTORY = SimpleNamespace(name="get_payment_history")
+PAY = SimpleNamespace(name="pay_address")
+
+
+def ctx(call_id):
+    return SimpleNamespace(function_call_id=call_id)
+
+
+def result(value):
+    return {"content": [{"type": "text", "text": json.dumps(value)}], "isError": False}
+
+
+class FakeToolset:
+    def __init__(self, value):
+        self.value = value
+        self.calls = []
+
+    async def call_tool(self, name, arguments):
+        self.calls.append((name, arguments))
+        await asyncio.sleep(0.01)
+        return result(self.value)
+
+
+def test_read_is_served_after_it_is_recorded():
+    cache = LedgerCache(ttl=60)
+    assert cache.serve(BALANCE, {}, ctx("1")) is None
+    cache.record(BALANCE, {}, ctx("1"), result({"balance": 5}))
+    served = cache.serve(BALANCE, {}, ctx("2"))
+    assert served == result({"balance": 5})
+    served["content"].clear()  # later callbacks may edit the response in place
+    assert cache.serve(BALANCE, {}, ctx("3")) == result({"balance": 5})
+    assert cache.stats()["hits"] == 2
+
+
+def test_payment_invalidates_only_the_payer():
+    cache = LedgerCache(ttl=60)
+    for call_id, args in (("1", {}), ("2", {"agent_token": "other"})):
+        cache.serve(BALANCE, args, ctx(call_id))
+        cache.record(BALANCE, args, ctx(call_id), result({"balance": 5}))
+    cache.record(PAY, {"to": "x", "amount": 1}, ctx("3"), result({"ok": True}))
+    assert cache.serve(BALANCE, {}, ctx("4")) is None
+    assert cache.serve(BALANCE, {"agent_token": "other"}, ctx("5")) is not None
+
+
+def test_read_in_flight_during_a_payment_is_not_stored():
+    cache = LedgerCache(ttl=60)
+    cache.serve(BALANCE, {}, ctx("read"))
+    cache.record(PAY, {"to": "x", "amount": 1}, ctx("pay"), result({"ok": True}))
+    cache.record(BALANCE, {}, ctx("read"), result({"balance": 5}))  # the pre-payment balance
+    assert cache.serve(BALANCE, {}, ctx("again")) is None
+
+
+def test_errors_are_not_cached():
+    cache = LedgerCache(ttl=60)
+    cache.serve(BALANCE, {}, ctx("1"))
+    cache.record(BALANCE, {}, ctx("1"), {"content": [], "isError": True})
+    assert cache.stats()["entries"] == 0
+
+
+def test_payment_refreshes_entries_still_being_read():
+    async def run():
+        cache = LedgerCache(ttl=60, keep_warm=300)
+        toolset = FakeToolset({"balance": 4})
+        cache.bind(toolset)
+        cache.serve(BALANCE, {}, ctx("1"))
+        cache.record(BALANCE, {}, ctx("1"), result({"balance": 5}))
+        cache.record(PAY, {"to": "x", "amount": 1}, ctx("2"), result({"ok": True}))
+        await asyncio.sleep(0.05)
+        return cache, toolset
+
+    cache, toolset = asyncio.run(run())
+    assert toolset.calls == [("get_balance", {})]
+    assert cache.serve(BALANCE, {}, ctx("3")) == result({"balance": 4})
+
+
+def test_concurrent_fetches_share_one_call():
+    async def run():
+        cache = LedgerCache(ttl=60)
+        toolset = FakeToolset({"balance": 5})
+        cache.bind(toolset)
+        results = await asyncio.gather(*(cache.read("get_balance", {}) for _ in range(5)))
+        return results, toolset
+
+    results, toolset = asyncio.run(run())
+    assert len(toolset.calls) == 1 and all(r == result({"balance": 5}) for r in results)
+
+
+def test_history_pages_slice_one_cached_read():
+    async def run():
+        cache = LedgerCache(ttl=60)
+        toolset = FakeToolset({"payments": list(range(5))})
+        cache.bind(toolset)
+        pages = [await cache.history_page(0, 2), await cache.history_page(4, 2)]
+        return pages, toolset
+
+    (first, last), toolset = asyncio.run(run())
+    assert first == {"items": [0, 1], "offset": 0, "limit": 2, "total": 5, "next_offset": 2}
+    assert last["items"] == [4] and last["next_offset"] is None
+    assert len(toolset.calls) == 1
@@ -0,0 +1,105 @@
+import asyncio
+
+import anyio
+import pytest
+
+import mcp_pool
+from mcp_pool import MCPSessionPool, PooledMCPToolset
+
+
+class FakeResult:
+    def __init__(self, session):
+        self.session = session
+
+    def model_dump(self, **kwargs):
+        return {"session": self.session}
+
+
+class FakeSession:
+    def __init__(self, name):
+        self.name = name
+        self.closed = False
+
+    async def call_tool(self, tool, arguments=None):
+        if self.closed:
+            raise anyio.ClosedResourceError()
+        return FakeResult(self.name)
+
+
+class FakeManager:
+    """Records the task that opens and closes each session, like the anyio cancel scopes care about."""
+    instances = []
+
+    def __init__(self, connection_params=None, errlog=None):
+        self.session = None
+        self.opened = 0
+        self.open_tasks = []
+        self.close_tasks = []
+        FakeManager.instances.append(self)
+
+    async def create_session(self):  # google-adk 1.2.1 takes no headers
+        if self.session is None:
+            self.opened += 1
+            self.session = FakeSession(f"{id(self)}:{self.opened}")
+            self.open_tasks.append(asyncio.current_task())
+        return self.session
+
+    async def close(self):
+        if self.session is not None:
+            self.session.closed = True
+            self.session = None
+            self.close_tasks.append(asyncio.current_task())
+
+
+@pytest.fixture
+def managers(monkeypatch):
+    FakeManager.instances = []
+    monkeypatch.setattr(mcp_pool, "MCPSessionManager", FakeManager)
+    return FakeManager.instances
+
+
+def test_sessions_open_and_close_in_their_owner_task(managers):
+    async def run():
+        pool = MCPSessionPool(None, 3)
+        assert await pool.warm() == 3
+
+        async def request():
+            return await pool.create_session()
+
+        await asyncio.gather(*(asyncio.create_task(request()) for _ in range(6)))
+        await pool.close()
+
+    asyncio.run(run())
+    for manager in managers:
+        assert manager.opened == 1
+        assert manager.open_tasks == manager.close_tasks  # same task entered and exited
+
+
+def test_tool_close_resets_only_its_own_slot(managers):
+    async def run():
+        pool = MCPSessionPool(None, 2)
+        await pool.warm()
+        tool_manager = pool.session_manager()
+        first = await tool_manager.create_session()
+        first.closed = True  # the server dropped this one
+        await tool_manager.close()  # what ADK does after ClosedResourceError
+        await tool_manager.close()  # a second reset of the same stale session is a no-op
+        await pool.close()
+
+    asyncio.run(run())
+    assert sorted(m.opened for m in managers) == [1, 2]
+    for manager in managers:
+        assert set(manager.open_tasks) == set(manager.close_tasks)
+        assert all(task is manager.open_tasks[0] for task in manager.open_tasks + manager.close_tasks)
+
+
+def test_call_tool_reconnects_a_dropped_session(managers):
+    async def run():
+        toolset = PooledMCPToolset(connection_params=None, pool_size=1)
+        await toolset._pool.warm()
+        managers[0].session.closed = True
+        result = await toolset.call_tool("get_balance", {})
+        await toolset.close()
+        return result
+
+    assert asyncio.run(run()) == {"session": f"{id(managers[0])}:2"}
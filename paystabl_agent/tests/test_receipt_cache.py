@@ -0,0 +1,86 @@
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from receipt_cache import PAY_TOOL, ReceiptCache, payer_id
+
+URL = "https://proxy402.com/rZ0Or4VKA9?vin=JHMGE8H58DC009182"
+PAY = SimpleNamespace(name=PAY_TOOL)
+
+
+def paid_result(**info):
+    return {"content": [{"type": "text", "text": "<report>"}], "structuredContent": info, "isError": False}
+
+
+@pytest.fixture
+def cache():
+    return ReceiptCache(margin=5)
+
+
+def serve(cache, status):
+    seen = []
+
+    def handler(request):
+        seen.append(request.headers.get("X-PAYMENT"))
+        return httpx.Response(status, text="<report again>")
+
+    cache._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return seen
+
+
+def test_capture_reads_the_proof_and_its_window(cache):
+    cache.capture(PAY, {"url": URL}, None, paid_result(payment="proof-1", expiresAt=time.time() + 60))
+    cache.capture(PAY, {"url": URL.replace("vin=J", "vin=1")}, None,
+                  paid_result(xPayment="proof-2", paymentRequirements={"accepts": [{"maxTimeoutSeconds": 60}]}))
+    assert cache.get(URL, payer_id({})).payment == "proof-1"
+    assert cache.get(URL.replace("vin=J", "vin=1"), payer_id({})).payment == "proof-2"
+
+
+@pytest.mark.parametrize("response", [
+    paid_result(),  # no proof
+    paid_result(payment="proof"),  # no validity window
+    paid_result(payment="proof", expiresAt=time.time() + 1),  # inside the safety margin
+    {**paid_result(payment="proof", expiresAt=time.time() + 60), "isError": True},
+])
+def test_capture_skips_results_it_cannot_reuse(cache, response):
+    cache.capture(PAY, {"url": URL}, None, response)
+    assert cache.stats()["receipts"] == 0
+
+
+def test_receipts_are_per_payer(cache):
+    cache.capture(PAY, {"url": URL, "agent_token": "wallet-a"}, None, paid_result(payment="p", expiresAt=time.time() + 60))
+    assert cache.get(URL, payer_id({"agent_token": "wallet-a"})) is not None
+    assert cache.get(URL, payer_id({"agent_token": "wallet-b"})) is None
+
+
+def test_replay_answers_without_paying(cache):
+    seen = serve(cache, 200)
+    cache.put(URL, payer_id({}), "proof-1", time.time() + 60)
+    result = asyncio.run(cache.replay(PAY, {"url": URL}, None))
+    assert result == {"content": [{"type": "text", "text": "<report again>"}], "isError": False}
+    assert seen == ["proof-1"] and cache.stats()["replays"] == 1
+
+
+def test_rejected_receipt_is_dropped_and_the_tool_pays(cache):
+    serve(cache, 402)
+    cache.put(URL, payer_id({}), "proof-1", time.time() + 60)
+    assert asyncio.run(cache.replay(PAY, {"url": URL}, None)) is None
+    assert cache.stats() == {"receipts": 0, "replays": 0, "rejected": 1}
+
+
+def test_replay_ignores_other_tools_and_unknown_urls(cache):
+    seen = serve(cache, 200)
+    cache.put(URL, payer_id({}), "proof-1", time.time() + 60)
+    assert asyncio.run(cache.replay(SimpleNamespace(name="get_balance"), {"url": URL}, None)) is None
+    assert asyncio.run(cache.replay(PAY, {"url": "https://other.example/r"}, None)) is None
+    assert seen == []
+
+
+def test_proof_in_a_json_text_block(cache):
+    info = {"payment": "proof-3", "validUntil": time.time() + 60}
+    cache.capture(PAY, {"url": URL}, None, {"content": [{"type": "text", "text": json.dumps(info)}]})
+    assert cache.get(URL, payer_id({})).payment == "proof-3"